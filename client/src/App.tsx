@@ -39,19 +39,63 @@ function AppContent() {
     }
   }, []);
 
-  // Fetch guests from database
+  const streamOpen = useRef(false);
+
+  const fetchGuests = async () => {
+    try {
+      // no-cache: revalidate with the ETag, so an unchanged list is a 304
+      const response = await fetch('https://darius-birthday-party.onrender.com/api/guests?attending=yes&fields=id,name,attending,submitted_at', { cache: 'no-cache' });
+      const data = await response.json();
+      setGuests(data.filter((guest: Guest) => guest.attending === 'yes'));
+    } catch (error) {
+      console.error('Error fetching guests:', error);
+    }
+  };
+
+  // Live guest list: one snapshot, then changes pushed by the server
   useEffect(() => {
-    const fetchGuests = async () => {
-      try {
-        const response = await fetch('https://darius-birthday-party.onrender.com/api/guests');
-        const data = await response.json();
-        setGuests(data.filter((guest: Guest) => guest.attending === 'yes'));
-      } catch (error) {
-        console.error('Error fetching guests:', error);
+    if (typeof EventSource === 'undefined') {
+      fetchGuests();
+      return;
+    }
+
+    let pollTimer: ReturnType<typeof setInterval> | undefined;
+    const source = new EventSource('https://darius-birthday-party.onrender.com/api/guests/stream?attending=yes&fields=id,name,attending,submitted_at');
+    source.onopen = () => {
+      streamOpen.current = true;
+    };
+    source.onerror = () => {
+      streamOpen.current = false;
+      // The browser reconnects on its own after a dropped stream and gets a
+      // fresh snapshot, but gives up on a refused one (503: the server has
+      // no room for more streams): poll instead
+      if (source.readyState === EventSource.CLOSED && pollTimer === undefined) {
+        fetchGuests();
+        pollTimer = setInterval(fetchGuests, 30000);
       }
     };
+    source.addEventListener('snapshot', (event) => {
+      setGuests(JSON.parse((event as MessageEvent).data));
+    });
+    source.addEventListener('add', (event) => {
+      const guest: Guest = JSON.parse((event as MessageEvent).data);
+      setGuests((current) => [guest, ...current.filter((g) => g.id !== guest.id)]);
+    });
+    source.addEventListener('update', (event) => {
+      const changes: Partial<Guest> & { id: number } = JSON.parse((event as MessageEvent).data);
+      setGuests((current) => current.map((g) => (g.id === changes.id ? { ...g, ...changes } : g)));
+    });
+    source.addEventListener('delete', (event) => {
+      const { id } = JSON.parse((event as MessageEvent).data);
+      setGuests((current) => current.filter((g) => g.id !== id));
+    });
+    source.addEventListener('clear', () => setGuests([]));
 
-    fetchGuests();
+    return () => {
+      streamOpen.current = false;
+      source.close();
+      clearInterval(pollTimer);
+    };
   }, []);
 
   // Page fade-in effect
@@ -132,12 +176,9 @@ function AppContent() {
   };
 
   const handleAddGuest = async () => {
-    try {
-      const response = await fetch('https://darius-birthday-party.onrender.com/api/guests');
-      const data = await response.json();
-      setGuests(data.filter((guest: Guest) => guest.attending === 'yes'));
-    } catch (error) {
-      console.error('Error refreshing guests:', error);
+    // The stream delivers the new guest; refetch only when it is down
+    if (!streamOpen.current) {
+      await fetchGuests();
     }
   };
 
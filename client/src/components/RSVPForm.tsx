@@ -46,37 +46,11 @@ export const RSVPForm: React.FC<RSVPFormProps> = ({
     return urlParams.get('admin') === 'darius' || isAdmin;
   };
 
-  // Fetch current guests list
-  const fetchGuests = async () => {
-    try {
-      const response = await fetch('https://darius-birthday-party.onrender.com/api/guests');
-      if (response.ok) {
-        const guestData = await response.json();
-        const attendingGuests = guestData.filter((guest: Guest) => guest.attending === 'yes');
-        setApiGuests(attendingGuests);
-        
-        // Show guest list ONLY if admin mode is active
-        if (attendingGuests.length > 0 && isAdminMode()) {
-          setShowGuestList(true);
-        }
-      }
-    } catch (error) {
-      console.error('Error fetching guests:', error);
-    }
-  };
-
-  // Load guests on component mount
+  // The guest list comes from the parent, which keeps it live
   useEffect(() => {
-    fetchGuests();
-  }, []);
-
-  // Update local state when props change
-  useEffect(() => {
-    if (guests && guests.length > 0) {
-      setApiGuests(guests);
-      // Only show guest list in admin mode
-      setShowGuestList(isAdminMode());
-    }
+    setApiGuests(guests);
+    // Only show guest list in admin mode
+    setShowGuestList(guests.length > 0 && isAdminMode());
   }, [guests]);
 
   const handleSubmit = async () => {
@@ -124,9 +98,6 @@ export const RSVPForm: React.FC<RSVPFormProps> = ({
           setShowGuestList(true);
         }
         
-        // Refresh the guests list
-        await fetchGuests();
-        
         // Call parent callback
         if (onAddGuest) {
           onAddGuest();
@@ -1,51 +1,457 @@
+import atexit
+import base64
+import bisect
+import csv
+import dataclasses
+import functools
+import gzip
+import hashlib
+import io
+import json
+import logging
+import logging.handlers
+import math
 import os
+import queue
+import random
+import re
 import secrets
-import string
+import sqlite3
 import threading
-from datetime import datetime, timezone
+import time
+import zlib
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+from html import escape
+from itertools import chain
 
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request
+from flask import Blueprint, Flask, current_app, g, has_request_context, jsonify, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-from flask_mail import Mail, Message
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from werkzeug.middleware.proxy_fix import ProxyFix
 
-# Load environment variables
-load_dotenv()
-
-# Create Flask app
-app = Flask(__name__)
-
-# Configuration
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
-
-# Enhanced database configuration with PostgreSQL support
-database_url = os.getenv('DATABASE_URL')
-if database_url and database_url.startswith('postgres://'):
-    database_url = database_url.replace('postgres://', 'postgresql://', 1)
-app.config['SQLALCHEMY_DATABASE_URI'] = database_url or 'sqlite:///birthday_party.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Email configuration
-app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
-app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
-app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'True').lower() == 'true'
-app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
-app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
-app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
-
-# Initialize extensions
-db = SQLAlchemy(app)
-mail = Mail(app)
-CORS(app, 
-     origins=[
-         'http://localhost:5173',
-         'https://darius-birthday-party-frontend.onrender.com',
-         'https://dariussantiago.eu',
-         'https://www.dariussantiago.eu'
-     ],
-     allow_headers=['Content-Type', 'Authorization'],
-     methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+try:
+    import brotli  # optional: br response and snapshot encoding next to gzip
+except ImportError:
+    brotli = None
+
+try:
+    import orjson  # optional: faster JSON encoding (JSON_ENCODER)
+except ImportError:
+    orjson = None
+
+class LazyMail:
+    """Flask-Mail, imported and configured for the current app when the first
+    message is built or sent rather than in create_app(): most cold starts
+    serve requests that never email anyone."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def state(self):
+        """The current app's Flask-Mail state, created on first use"""
+        app = current_app._get_current_object()
+        state = app.extensions.get('mail')
+        if state is None:
+            with self._lock:
+                state = app.extensions.get('mail')
+                if state is None:
+                    from flask_mail import Mail
+                    state = Mail().init_app(app)
+        return state
+
+    def message(self, **kwargs):
+        """A flask_mail.Message; its sender defaults to MAIL_DEFAULT_SENDER"""
+        from flask_mail import Message
+        self.state()
+        return Message(**kwargs)
+
+    def send(self, message):
+        self.state().send(message)
+
+    def connect(self):
+        return self.state().connect()
+
+# db is bound to the app in create_app(); mail binds itself on first use
+db = SQLAlchemy()
+mail = LazyMail()
+api = Blueprint('api', __name__)
+logger = logging.getLogger('party')
+
+def load_config(app):
+    """Read settings from the environment into app.config"""
+    load_dotenv()
+
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
+
+    # Enhanced database configuration with PostgreSQL support
+    database_url = os.getenv('DATABASE_URL')
+    if database_url and database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url or 'sqlite:///birthday_party.db'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Schema bootstrap (tables, the default party, missing aggregates) in every
+    # create_app(). False leaves it to `python migrate.py`, run once per deploy,
+    # so workers start without touching the database.
+    app.config['DB_BOOTSTRAP_ON_STARTUP'] = os.getenv('DB_BOOTSTRAP_ON_STARTUP', 'True').lower() == 'true'
+    # Per-worker party caches: metadata for PARTY_CACHE_TTL seconds, aggregates for
+    # PARTY_STATS_CACHE_TTL (dropped on commit in this worker, so only other
+    # workers' writes are seen late), at most PARTY_CACHE_SIZE parties each
+    app.config['PARTY_CACHE_TTL'] = float(os.getenv('PARTY_CACHE_TTL', os.getenv('ACTIVE_PARTY_CACHE_TTL', 30)))
+    app.config['PARTY_STATS_CACHE_TTL'] = float(os.getenv('PARTY_STATS_CACHE_TTL', 5))
+    app.config['PARTY_CACHE_SIZE'] = int(os.getenv('PARTY_CACHE_SIZE', 10000))
+    # Per-worker LRU of encoded /api/rsvp/<code> answers; 0 entries disables it
+    app.config['CONFIRMATION_CACHE_TTL'] = float(os.getenv('CONFIRMATION_CACHE_TTL', 30))
+    app.config['CONFIRMATION_CACHE_SIZE'] = int(os.getenv('CONFIRMATION_CACHE_SIZE', 10000))
+    # Rows per executemany in /api/guests/bulk, and rows fetched at a time by the
+    # streamed listings (/api/guests, /api/guests/export, /api/debug/all-guests)
+    app.config['BULK_IMPORT_BATCH_SIZE'] = int(os.getenv('BULK_IMPORT_BATCH_SIZE', 1000))
+    app.config['STREAM_BATCH_SIZE'] = int(os.getenv('STREAM_BATCH_SIZE', 1000))
+
+    # Confirmation code routes: a Bloom filter of issued codes answers misses
+    # after an id range catch-up instead of a code lookup, and each client IP
+    # gets a token bucket of RATE_LIMIT_PER_MINUTE requests (bursts of
+    # RATE_LIMIT_BURST; 0 = no limit).
+    # RATE_LIMIT_STORAGE_URL=redis://... shares the buckets between workers.
+    app.config['CODE_FILTER_ENABLED'] = os.getenv('CODE_FILTER_ENABLED', 'True').lower() == 'true'
+    app.config['CODE_FILTER_ERROR_RATE'] = float(os.getenv('CODE_FILTER_ERROR_RATE', 0.001))
+    app.config['RATE_LIMIT_PER_MINUTE'] = float(os.getenv('RATE_LIMIT_PER_MINUTE', 60))
+    app.config['RATE_LIMIT_BURST'] = int(os.getenv('RATE_LIMIT_BURST', 20))
+    app.config['RATE_LIMIT_STORAGE_URL'] = os.getenv('RATE_LIMIT_STORAGE_URL', 'memory://')
+    # Number of reverse proxies in front of the app (1 on Render), so request.remote_addr
+    # is the client's address taken from X-Forwarded-For
+    app.config['PROXY_FIX_X_FOR'] = int(os.getenv('PROXY_FIX_X_FOR', 0))
+
+    # /api/guests/stream (Server-Sent Events). Each open stream holds a request
+    # thread under gthread, so gunicorn.conf.py lowers the cap to half the
+    # threads there; GUNICORN_WORKER_CLASS=gevent (with PostgreSQL) or the ASGI
+    # app hold thousands of subscribers per worker.
+    app.config['GUEST_STREAM_BUFFER'] = int(os.getenv('GUEST_STREAM_BUFFER', 100))
+    app.config['GUEST_STREAM_HEARTBEAT'] = float(os.getenv('GUEST_STREAM_HEARTBEAT', 15))
+    app.config['GUEST_STREAM_POLL_SECONDS'] = float(os.getenv('GUEST_STREAM_POLL_SECONDS', 2))
+    app.config['GUEST_STREAM_MAX_SUBSCRIBERS'] = int(os.getenv('GUEST_STREAM_MAX_SUBSCRIBERS', 5000))
+
+    # Precompressed full guest lists for /api/guests: at most GUEST_SNAPSHOT_PARTIES
+    # parties per worker (0 = off) of up to GUEST_SNAPSHOT_MAX_ROWS RSVPs, rebuilt
+    # in the background at most every GUEST_SNAPSHOT_DELAY seconds after a change
+    app.config['GUEST_SNAPSHOT_PARTIES'] = int(os.getenv('GUEST_SNAPSHOT_PARTIES', 32))
+    app.config['GUEST_SNAPSHOT_MAX_ROWS'] = int(os.getenv('GUEST_SNAPSHOT_MAX_ROWS', 250000))
+    app.config['GUEST_SNAPSHOT_DELAY'] = float(os.getenv('GUEST_SNAPSHOT_DELAY', 1))
+
+    # JSON responses are encoded with orjson when it is installed (JSON_ENCODER=json
+    # forces the json module). Responses of at least COMPRESS_MIN_SIZE bytes, and
+    # streamed listings, are gzip (or br) compressed at COMPRESS_LEVEL (0 = off)
+    # for clients that accept it.
+    app.config['JSON_ENCODER'] = os.getenv('JSON_ENCODER', 'orjson').lower()
+    app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    app.config['COMPRESS_LEVEL'] = int(os.getenv('COMPRESS_LEVEL', 6))
+
+    # Instrumentation: warn when one SQL statement runs this many times in a request (0 = off)
+    app.config['N_PLUS_ONE_THRESHOLD'] = int(os.getenv('N_PLUS_ONE_THRESHOLD', 0))
+
+    # Email configuration
+    app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 587))
+    app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS', 'True').lower() == 'true'
+    app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
+    app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
+    app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
+    # Fake transport: Flask-Mail builds messages but never opens an SMTP connection
+    app.config['MAIL_SUPPRESS_SEND'] = os.getenv('MAIL_SUPPRESS_SEND', 'False').lower() == 'true'
+
+    # Per-party notification_email. POST /api/parties needs no login, so a party
+    # may only send its RSVP notifications (subject and guest names chosen by
+    # whoever made it) to these addresses or @domains, comma separated; none
+    # by default, and NOTIFICATION_EMAIL gets them instead
+    app.config['PARTY_NOTIFICATION_EMAILS'] = {
+        entry.strip().lower() for entry in os.getenv('PARTY_NOTIFICATION_EMAILS', '').split(',') if entry.strip()
+    }
+
+    # Email outbox worker pool
+    app.config['EMAIL_WORKERS'] = int(os.getenv('EMAIL_WORKERS', 2))
+    app.config['EMAIL_BATCH_SIZE'] = int(os.getenv('EMAIL_BATCH_SIZE', 20))
+    app.config['EMAIL_MAX_ATTEMPTS'] = int(os.getenv('EMAIL_MAX_ATTEMPTS', 5))
+    app.config['EMAIL_RETRY_BASE_SECONDS'] = float(os.getenv('EMAIL_RETRY_BASE_SECONDS', 30))
+    app.config['EMAIL_POLL_INTERVAL'] = float(os.getenv('EMAIL_POLL_INTERVAL', 5))
+
+    # Guest notifications: 0 sends one email per confirmation, otherwise confirmations
+    # are collected for this many seconds and sent as one digest
+    app.config['NOTIFICATION_DIGEST_SECONDS'] = float(os.getenv('NOTIFICATION_DIGEST_SECONDS', 0))
+    app.config['NOTIFICATION_GUEST_LIST_LIMIT'] = int(os.getenv('NOTIFICATION_GUEST_LIST_LIMIT', 200))
+
+    # Logging: JSON lines written by a background QueueListener so request threads
+    # never block on stdout. LOG_ROUTE_LEVELS / LOG_SAMPLE_RATES take comma separated
+    # endpoint=value pairs, e.g. "get_guests=WARNING" or "get_guests=0.1".
+    app.config['LOG_LEVEL'] = os.getenv('LOG_LEVEL', 'INFO').upper()
+    app.config['LOG_ROUTE_LEVELS'] = os.getenv('LOG_ROUTE_LEVELS', '')
+    app.config['LOG_SAMPLE_RATES'] = os.getenv('LOG_SAMPLE_RATES', '')
+
+    # Connection pooling. PostgreSQL gets an explicit QueuePool; keep pool_size at
+    # least GUNICORN_THREADS so every request thread can hold a connection.
+    # SQLite waits up to SQLITE_BUSY_TIMEOUT seconds on a locked database and is
+    # switched to WAL in _tune_sqlite_connection.
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+            'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+            'pool_pre_ping': True
+        }
+    else:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'connect_args': {'timeout': float(os.getenv('SQLITE_BUSY_TIMEOUT', 5))}
+        }
+
+@event.listens_for(Engine, 'connect')
+def _tune_sqlite_connection(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers run alongside the single writer; NORMAL is durable in WAL mode
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+EMAIL_PATTERN = re.compile(r'([\w.+-])[\w.+-]*@([\w-]+\.[\w.-]+)')
+PHONE_PATTERN = re.compile(r'\+?\d[\d\s().-]{7,}\d')
+LOG_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+def redact(value):
+    """Mask email addresses and phone numbers in a log value"""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if not isinstance(value, str):
+        return value
+    value = EMAIL_PATTERN.sub(r'\1***@\2', value)
+    return PHONE_PATTERN.sub(
+        lambda m: m.group(0) if sum(c.isdigit() for c in m.group(0)) < 9 else '[phone]', value)
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': redact(record.getMessage())
+        }
+        for key, value in vars(record).items():
+            if key not in LOG_RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = redact(value)
+        exc_text = self.formatException(record.exc_info) if record.exc_info else record.exc_text
+        if exc_text:
+            entry['exc'] = redact(exc_text)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+def current_endpoint():
+    """View name of the current request without the blueprint prefix"""
+    return request.endpoint.rpartition('.')[2] if request.endpoint else None
+
+def parse_route_settings(setting, convert):
+    routes = {}
+    for item in filter(None, (part.strip() for part in setting.split(','))):
+        endpoint, _, value = item.partition('=')
+        routes[endpoint.strip()] = convert(value.strip())
+    return routes
+
+class RouteFilter(logging.Filter):
+    """Per-endpoint level threshold and sampling, applied before a record is queued.
+    Warnings and errors are never sampled out."""
+
+    def __init__(self, default_level, route_levels, sample_rates):
+        super().__init__()
+        self.default_level = default_level
+        self.route_levels = route_levels
+        self.sample_rates = sample_rates
+
+    def filter(self, record):
+        if not hasattr(record, 'endpoint'):
+            record.endpoint = current_endpoint() if has_request_context() else None
+        if record.levelno < self.route_levels.get(record.endpoint, self.default_level):
+            return False
+        if record.levelno < logging.WARNING:
+            rate = self.sample_rates.get(record.endpoint)
+            if rate is not None and random.random() >= rate:
+                return False
+        return True
+
+class LocalQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that keeps the record's extra fields and traceback for the
+    JSON formatter; the stdlib version flattens everything into `msg`."""
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+_log_listener = None
+
+def configure_logging(app):
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler()
+    output.setFormatter(JsonFormatter())
+    listener = logging.handlers.QueueListener(log_queue, output)
+
+    queue_handler = LocalQueueHandler(log_queue)
+    queue_handler.addFilter(RouteFilter(
+        logging.getLevelName(app.config['LOG_LEVEL']),
+        parse_route_settings(app.config['LOG_ROUTE_LEVELS'], logging.getLevelName),
+        parse_route_settings(app.config['LOG_SAMPLE_RATES'], float)
+    ))
+
+    logger.setLevel(logging.DEBUG)  # RouteFilter decides
+    logger.handlers = [queue_handler]
+    logger.propagate = False
+
+    listener.start()
+    if _log_listener is None:
+        atexit.register(lambda: _log_listener.stop())
+    _log_listener = listener
+
+# JSON encoding and response compression
+NON_ASCII_PATTERN = re.compile(r'[^\x00-\x7e]')  # what json escapes with ensure_ascii, DEL included
+
+@functools.lru_cache(maxsize=4096)
+def _escape_char(char):
+    code = ord(char)
+    if code > 0xFFFF:
+        code -= 0x10000
+        return '\\u{:04x}\\u{:04x}'.format(0xD800 | code >> 10, 0xDC00 | code & 0x3FF)
+    return '\\u{:04x}'.format(code)
+
+def _has_non_finite_float(obj):
+    """Whether a JSON payload holds NaN or an infinity anywhere"""
+    pending = [obj]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, float):
+            if not math.isfinite(item):
+                return True
+        elif isinstance(item, dict):
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            pending.extend(item)
+        elif dataclasses.is_dataclass(item) and not isinstance(item, type):
+            pending.extend(vars(item).values())
+    return False
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's DefaultJSONProvider, encoding with orjson when it is installed.
+
+    The output is the json module's: sorted keys, compact out of debug mode,
+    default() for datetimes, dataclasses and the rest, non-ASCII characters
+    escaped while ensure_ascii is set. Only float exponents are spelled
+    differently (1e16 for 1e+16, the same number). json encodes what orjson
+    refuses or would write differently: integers beyond 64 bits, dicts with
+    non-str keys (orjson sorts them as strings), non-finite floats (orjson
+    writes null for NaN and Infinity) and short outputs that need escaping.
+    Parsing stays with json.
+    """
+
+    ESCAPE_MIN_SIZE = 4096
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.backend = 'orjson' if orjson is not None and app.config.get('JSON_ENCODER') != 'json' else 'json'
+        self.encode_compact = self.compact_encoder()
+
+    def compact_encoder(self):
+        """encode(obj) -> str: what jsonify writes, without the trailing newline"""
+        encode_json = json.JSONEncoder(ensure_ascii=self.ensure_ascii, sort_keys=self.sort_keys,
+                                       separators=(',', ':'), default=self.default).encode
+        if self.backend == 'json':
+            return encode_json
+        # No OPT_NON_STR_KEYS: a non-str key makes orjson raise and json encode
+        option = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+                  | (orjson.OPT_SORT_KEYS if self.sort_keys else 0))
+        default, ensure_ascii = self.default, self.ensure_ascii
+
+        def encode(obj):
+            try:
+                text = orjson.dumps(obj, default=default, option=option).decode()
+            except orjson.JSONEncodeError:
+                return encode_json(obj)
+            if 'null' in text and _has_non_finite_float(obj):  # orjson wrote NaN or Infinity as null
+                return encode_json(obj)
+            if ensure_ascii and (not text.isascii() or '\x7f' in text):
+                if len(text) < self.ESCAPE_MIN_SIZE:
+                    return encode_json(obj)  # cheaper than escaping a short text
+                return NON_ASCII_PATTERN.sub(lambda match: _escape_char(match.group()), text)
+            return text
+        return encode
+
+    def dumps(self, obj, **kwargs):
+        if kwargs == {'separators': (',', ':')}:  # response() out of debug mode
+            return self.encode_compact(obj)
+        return super().dumps(obj, **kwargs)
+
+COMPRESS_ENCODINGS = ('br', 'gzip') if brotli else ('gzip',)
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/html'}
+BROTLI_QUALITY = 4  # per response; higher qualities cost far more CPU than they save in bytes
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, level, mtime=0)
+
+def compress_chunks(chunks, encoding, level):
+    """Compress a streamed body as it is sent"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        feed, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+        feed, finish = compressor.compress, compressor.flush
+    try:
+        for chunk in chunks:
+            data = feed(chunk.encode() if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+@api.after_app_request
+def _compress_response(response):
+    """gzip/br responses of COMPRESS_MIN_SIZE bytes or more, and streamed
+    listings, when the client accepts it. Responses that already have a
+    Content-Encoding (the guest list snapshots) are left alone."""
+    level = current_app.config['COMPRESS_LEVEL']
+    if (level <= 0 or response.mimetype not in COMPRESSIBLE_MIMETYPES or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or response.status_code not in (200, 201)
+            or request.method == 'HEAD'):
+        return response
+    if not response.is_streamed and response.calculate_content_length() < current_app.config['COMPRESS_MIN_SIZE']:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(COMPRESS_ENCODINGS)
+    if not encoding:
+        return response
+    if response.is_streamed:
+        response.response = compress_chunks(response.response, encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(compress(response.get_data(), encoding, level))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak)  # one ETag per representation
+    return response
 
 # Models
 class Party(db.Model):
@@ -62,6 +468,7 @@ class Party(db.Model):
     rsvp_deadline = db.Column(db.DateTime, default=lambda: datetime(2024, 7, 25, 23, 59))
     contact_email = db.Column(db.String(120), default="festa@exemplo.com")
     contact_phone = db.Column(db.String(20), default="+351 123 456 789")
+    notification_email = db.Column(db.String(120))  # RSVP notifications; NOTIFICATION_EMAIL when unset
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     @property
@@ -89,6 +496,65 @@ class Party(db.Model):
             'contact_phone': self.contact_phone
         }
 
+class ConfirmationCodeGenerator:
+    """Confirmation codes: 40 random bits from a single token_bytes call, written
+    as 8 Crockford base32 characters plus a Luhn mod 32 check character.
+
+    normalize() rejects mistyped or made-up codes without a database query; it
+    also accepts the 8 character [A-Z0-9] codes issued before the check
+    character existed. Another generator can be plugged in by replacing
+    app.extensions['confirmation_codes'] with an object that has the same
+    generate() and normalize() methods.
+    """
+    ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+    RANDOM_BYTES = 5
+    LENGTH = 8
+    # Crockford decoding: case-insensitive, O reads as 0 and I/L as 1; hyphens are ignored
+    READ_AS = str.maketrans('OIL', '011', '-')
+    LEGACY_CODE = re.compile(r'[A-Z0-9]{8}')
+
+    def __init__(self):
+        self.values = {char: value for value, char in enumerate(self.ALPHABET)}
+
+    def generate(self):
+        return self.encode(int.from_bytes(secrets.token_bytes(self.RANDOM_BYTES), 'big'))
+
+    def encode(self, number):
+        """Code for a 40 bit number; generate() feeds it random bits"""
+        chars = []
+        for _ in range(self.LENGTH):
+            number, value = divmod(number, 32)
+            chars.append(self.ALPHABET[value])
+        body = ''.join(reversed(chars))
+        return body + self.ALPHABET[self.check_value(body)]
+
+    def check_value(self, body):
+        """Luhn mod 32: catches any single mistyped character and adjacent swaps"""
+        total = 0
+        factor = 2
+        for char in reversed(body):
+            addend = factor * self.values[char]
+            total += addend // 32 + addend % 32
+            factor = 3 - factor
+        return -total % 32
+
+    def normalize(self, code):
+        """Canonical form of code, or None if it cannot be a code we issued"""
+        if self.LEGACY_CODE.fullmatch(code):
+            return code
+        code = code.upper().translate(self.READ_AS)
+        if len(code) != self.LENGTH + 1 or any(char not in self.values for char in code):
+            return None
+        if self.values[code[-1]] != self.check_value(code[:-1]):
+            return None
+        return code
+
+def generate_confirmation_code():
+    return current_app.extensions['confirmation_codes'].generate()
+
+def normalize_confirmation_code(code):
+    return current_app.extensions['confirmation_codes'].normalize(code)
+
 class RSVP(db.Model):
     __tablename__ = 'rsvps'
     
@@ -106,10 +572,22 @@ class RSVP(db.Model):
     
     party = db.relationship('Party', backref='rsvps')
     
+    __table_args__ = (
+        # One RSVP per email and party, case-insensitive; also serves the duplicate lookup
+        db.Index('uq_rsvps_party_email', party_id, db.func.lower(email), unique=True),
+        # Guest lists and notifications: filter by party/attending, newest first
+        db.Index('ix_rsvps_party_attending_submitted', party_id, attending, submitted_at),
+        # Unfiltered guest lists and cursors: one party's RSVPs in (submitted_at, id) order
+        db.Index('ix_rsvps_party_submitted', party_id, submitted_at, id),
+        # Ids are never reused on SQLite either: the code filter catches up and
+        # notification digests select by "id above the last one seen"
+        {'sqlite_autoincrement': True},
+    )
+    
     def __init__(self, **kwargs):
         super(RSVP, self).__init__(**kwargs)
         if not self.confirmation_code:
-            self.confirmation_code = ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8))
+            self.confirmation_code = generate_confirmation_code()
 
     def to_dict(self):
         return {
@@ -125,241 +603,2287 @@ class RSVP(db.Model):
             'submitted_at': self.submitted_at.isoformat() if self.submitted_at else None
         }
 
-# Email functions
-def send_async_email(app, msg):
-    """Send email asynchronously"""
-    with app.app_context():
+class PartyCounter(db.Model):
+    """Per-party RSVP aggregates, maintained in the same transaction as the RSVP writes"""
+    __tablename__ = 'party_counters'
+
+    party_id = db.Column(db.Integer, db.ForeignKey('parties.id'), primary_key=True)
+    guests_version = db.Column(db.Integer, nullable=False, default=0)
+    total_rsvps = db.Column(db.Integer, nullable=False, default=0)
+    total_attending = db.Column(db.Integer, nullable=False, default=0)  # sum of number_of_guests for 'yes'
+    attending_yes = db.Column(db.Integer, nullable=False, default=0)
+    attending_no = db.Column(db.Integer, nullable=False, default=0)
+    attending_maybe = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'total_rsvps': self.total_rsvps,
+            'total_attending': self.total_attending,
+            'by_status': {
+                'yes': self.attending_yes,
+                'no': self.attending_no,
+                'maybe': self.attending_maybe
+            }
+        }
+
+def utcnow():
+    """Naive UTC timestamp, comparable with what SQLite and PostgreSQL hand back"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class EmailOutbox(db.Model):
+    """Emails waiting to be delivered by the outbox workers"""
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    party_id = db.Column(db.Integer, db.ForeignKey('parties.id'))
+    subject = db.Column(db.String(300), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)  # comma separated
+    body = db.Column(db.Text)
+    html = db.Column(db.Text)
+    kind = db.Column(db.String(10), nullable=False, default='message')  # 'message' or 'digest'
+    status = db.Column(db.String(10), nullable=False, default='pending')  # 'pending', 'sending', 'sent', 'skipped', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    sent_at = db.Column(db.DateTime)
+    digest_after_id = db.Column(db.Integer)  # digests list 'yes' RSVPs with a greater id
+
+    __table_args__ = (
+        # Due emails per party (the workers take turns between parties) and open digests
+        db.Index('ix_email_outbox_party_status_due', party_id, status, next_attempt_at),
+    )
+
+    def to_message(self):
+        return mail.message(
+            subject=self.subject,
+            recipients=self.recipients.split(','),
+            body=self.body,
+            html=self.html
+        )
+
+# Per-party caches
+class PartyCache:
+    """Process-local, per-party copies of what `loader(party_id)` returns,
+    reloaded after `ttl` seconds.
+
+    Entries live in `shards` maps, each behind its own lock, so loads for
+    different parties rarely wait on each other; hits take no lock at all.
+    At most `max_size` parties are held in total, the longest-loaded entry of
+    a full shard making room. Parties are cached as PartyRow values, not
+    bound to any session, so reading them never issues SQL.
+    """
+
+    def __init__(self, loader, ttl, max_size=1024, shards=16):
+        self.loader = loader
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Reentrant: a load can flush or commit, and those invalidate entries
+        self._shards = [(OrderedDict(), threading.RLock()) for _ in range(shards)]
+        self.max_size = max_size
+
+    def _shard(self, key):
+        return self._shards[hash(key) % len(self._shards)]
+
+    def peek(self, key):
+        """Cached value if it is still fresh, else None; never loads"""
+        entry = self._shard(key)[0].get(key)
+        if entry is not None and time.monotonic() < entry[1]:
+            self.hits += 1
+            return entry[0]
+        return None
+
+    def get(self, key):
+        value = self.peek(key)
+        if value is not None:
+            return value
+        with self._shard(key)[1]:
+            return self._store(key, self.loader(key))
+
+    def put(self, key, value):
+        """Store a value loaded by the caller (asgi.py loads with its own session)"""
+        with self._shard(key)[1]:
+            return self._store(key, value)
+
+    def _store(self, key, value):
+        entries = self._shard(key)[0]
+        self.misses += 1
+        entries.pop(key, None)
+        if value is None:
+            return None
+        entries[key] = (value, time.monotonic() + self.ttl)
+        while len(entries) > max(1, self.max_size // len(self._shards)):
+            entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key):
+        entries, lock = self._shard(key)
+        with lock:
+            entries.pop(key, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else None,
+            'ttl_seconds': self.ttl,
+            'cached': sum(len(entries) for entries, _ in self._shards),
+            'max_size': self.max_size
+        }
+
+class PartyRow:
+    """A party's columns as plain attributes, read with a Core select.
+
+    What the read-only routes and the party caches hold instead of Party
+    objects: no identity map, no instrumented attributes, nothing to detach,
+    and safe to share between requests. Party's is_rsvp_open and to_dict()
+    work on it unchanged.
+    """
+    __slots__ = tuple(column.key for column in Party.__table__.columns)
+
+    is_rsvp_open = Party.is_rsvp_open
+    to_dict = Party.to_dict
+
+    def __init__(self, *values):
+        for key, value in zip(self.__slots__, values):
+            setattr(self, key, value)
+
+def party_rows_query():
+    """SELECT of every parties column, in PartyRow's order"""
+    return db.select(*Party.__table__.columns)
+
+def party_query(party_id):
+    """The party's row; party_id None means the default (first active) party"""
+    if party_id is None:
+        return party_rows_query().where(Party.is_active.is_(True)).order_by(Party.id).limit(1)
+    return party_rows_query().where(Party.id == party_id)
+
+def load_party(party_id):
+    row = db.session.execute(party_query(party_id)).first()
+    return PartyRow(*row) if row else None
+
+def load_party_stats(party_id):
+    return get_party_counter(party_id).to_dict()
+
+# ttl and max_size set from config in create_app()
+party_cache = PartyCache(load_party, ttl=30)
+party_stats_cache = PartyCache(load_party_stats, ttl=5)
+
+def get_active_party():
+    return party_cache.get(None)
+
+def get_cached_party(party_id):
+    return party_cache.get(party_id)
+
+def get_cached_party_stats(party_id):
+    """Aggregates as PartyCounter.to_dict(); dropped after every commit that changes them"""
+    return party_stats_cache.get(party_id)
+
+class ConfirmationCache:
+    """Process-local LRU of the "rsvp" block of /api/rsvp/<code>, already
+    JSON-encoded, by confirmation code.
+
+    Entries are (party_id, encoded RSVP) as of the party's guests_version;
+    the "party" block comes from party_cache, so a confirmation page refresh
+    runs one primary key query for the current version. Every write to a
+    party's RSVPs, in any worker, bumps that version, which turns the
+    party's entries into misses. A worker also drops the entry right away
+    when it changes or deletes the RSVP; `ttl` bounds how long an entry is
+    kept at all.
+    """
+
+    def __init__(self, ttl, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def party_of(self, code):
+        """party_id of the cached entry, whose guests_version get() needs; None if not cached"""
+        with self._lock:
+            entry = self._entries.get(code)
+        return entry[0] if entry is not None else None
+
+    def get(self, code, version):
+        """(party_id, encoded RSVP) if cached at guests_version `version`, or None"""
+        with self._lock:
+            entry = self._entries.get(code)
+            if entry is None or entry[2] != version or time.monotonic() >= entry[3]:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(code)
+            self.hits += 1
+            return entry[:2]
+
+    def put(self, code, party_id, version, encoded):
+        if self.max_size > 0:
+            with self._lock:
+                self._entries[code] = (party_id, encoded, version, time.monotonic() + self.ttl)
+                self._entries.move_to_end(code)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return party_id, encoded
+
+    def invalidate(self, codes=(), party_id=None):
+        """Drop these codes, and every entry of party_id when given"""
+        with self._lock:
+            for code in codes:
+                self._entries.pop(code, None)
+            if party_id is not None:
+                for code in [code for code, entry in self._entries.items() if entry[0] == party_id]:
+                    del self._entries[code]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else None,
+            'ttl_seconds': self.ttl,
+            'cached': len(self._entries),
+            'max_size': self.max_size
+        }
+
+# ttl and max_size set from config in create_app()
+confirmation_cache = ConfirmationCache(ttl=30)
+
+def mark_stale_confirmations(codes=(), party_id=None, session=None):
+    """Drop cached confirmations rewritten by a Core statement, now and again
+    when the transaction ends (ORM changes to RSVPs are caught on flush)"""
+    session = session or db.session
+    stale = session.info.setdefault('stale_confirmations', ([], set()))
+    stale[0].extend(codes)
+    if party_id is not None:
+        stale[1].add(party_id)
+    confirmation_cache.invalidate(codes, party_id)
+
+@api.url_value_preprocessor
+def _pull_party_id(endpoint, values):
+    if values and 'party_id' in values:
+        g.party_id = values.pop('party_id')
+
+def request_party_id():
+    """party_id from a /api/parties/<party_id>/... URL, None on the unscoped routes"""
+    return g.get('party_id')
+
+def scope_to_request_party(query):
+    """Limit an RSVP query to the URL's party on the /api/parties/<party_id>/ routes"""
+    party_id = request_party_id()
+    return query if party_id is None else query.filter(RSVP.party_id == party_id)
+
+def get_request_party():
+    """The party a request addresses: the one in its URL, or the default party"""
+    party_id = request_party_id()
+    return get_active_party() if party_id is None else get_cached_party(party_id)
+
+class IssuedCodeFilter:
+    """Bloom filter of the confirmation codes in the rsvps table.
+
+    A code the filter has never seen was never issued, so a lookup for a
+    random or mistyped code is answered with a 404 without looking the code
+    up. The filter is built on first use. Codes committed by this process are
+    added right away; codes committed by other workers are picked up on every
+    miss, before the 404, by a catch-up query for ids above the last one seen
+    (an index range scan that returns nothing for a guessed code), so the
+    filter is current whenever it rejects a code. Concurrent misses share one
+    catch-up, and the rate limiter bounds the rest.
+
+    Ids are never reused (rsvps is AUTOINCREMENT on SQLite), but PostgreSQL
+    transactions can commit out of id order: ids below the highest one seen
+    that are not in the table yet are kept as gaps and re-read by each
+    catch-up until they show up or GAP_SECONDS pass (a rolled back insert or
+    a deleted row never shows up). Deleted codes stay in the filter, costing
+    only the query a lookup would have made anyway, until enough of them
+    pile up to trigger a rebuild.
+    """
+    MIN_CAPACITY = 10000
+    # Ids missing just below the highest one when the filter is built are
+    # treated as gaps too: their transactions may still be committing
+    REBUILD_GAP_WINDOW = 1000
+    GAP_SECONDS = 60.0
+
+    def __init__(self, error_rate=0.001):
+        self.error_rate = error_rate
+        self.enabled = True
+        self.capacity = 0
+        self.count = 0
+        self.removed = 0
+        self.rejected = 0
+        self.passed = 0
+        self.rebuilds = 0
+        self.catch_ups = 0
+        self._bits = None
+        self._size = 0
+        self._hashes = 0
+        self._max_id = 0
+        self._gaps = {}  # id -> time.monotonic() when it was first missed
+        self._caught_up_at = 0.0  # when the last catch-up query started
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _positions(code, size, hashes):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(code.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % size for i in range(hashes)]
+
+    def _set(self, code):
+        # Called with the lock held
+        bits = self._bits
+        for position in self._positions(code, self._size, self._hashes):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def _test(self, code):
+        """False only if the current filter has certainly never seen the code"""
+        # The bit array and its geometry are replaced together under the lock
+        with self._lock:
+            bits, size, hashes = self._bits, self._size, self._hashes
+        if bits is None:
+            return True  # dropped for a rebuild: let the lookup ask the database
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(code, size, hashes))
+
+    def _track_gaps(self, seen, first, last, now):
+        """Ids from first to last that are not in `seen` become gaps"""
+        for rsvp_id in range(first, last + 1):
+            if rsvp_id not in seen:
+                self._gaps.setdefault(rsvp_id, now)
+
+    def rebuild(self):
+        """Load every issued code, sized for twice the current number of RSVPs"""
+        with self._lock:
+            started = time.monotonic()
+            count, max_id = db.session.execute(db.select(db.func.count(RSVP.id), db.func.max(RSVP.id))).one()
+            max_id = max_id or 0
+            self.capacity = max(2 * count, self.MIN_CAPACITY)
+            self._size = math.ceil(-self.capacity * math.log(self.error_rate) / math.log(2) ** 2)
+            self._hashes = max(1, round(self._size / self.capacity * math.log(2)))
+            self._bits = bytearray((self._size + 7) // 8)
+            recent, window_start = set(), max_id - self.REBUILD_GAP_WINDOW
+            rows = db.select(RSVP.id, RSVP.confirmation_code).execution_options(yield_per=10000)
+            for batch in db.session.execute(rows).partitions():
+                for rsvp_id, code in batch:
+                    if code:
+                        self._set(code)
+                    if rsvp_id > window_start:
+                        recent.add(rsvp_id)
+            self._gaps = {}
+            self._track_gaps(recent, max(window_start + 1, 1), max_id, started)
+            self.count, self.removed = count, 0
+            self._max_id, self._caught_up_at = max_id, started
+            self.rebuilds += 1
+
+    def _catch_up(self, missed_at):
+        """Add the codes committed since the last catch-up, unless one started after `missed_at`"""
+        with self._lock:
+            if self._caught_up_at > missed_at or self._bits is None:
+                return  # another thread's catch-up already saw what this miss needs
+            started = time.monotonic()
+            for gap, first_missed in list(self._gaps.items()):
+                if started - first_missed > self.GAP_SECONDS:
+                    del self._gaps[gap]
+            low = min(self._gaps, default=self._max_id + 1)
+            rows = db.session.execute(
+                db.select(RSVP.id, RSVP.confirmation_code).where(RSVP.id >= low)
+            ).all()
+            seen = set()
+            for rsvp_id, code in rows:
+                if rsvp_id > self._max_id or self._gaps.pop(rsvp_id, None) is not None:
+                    if code:
+                        self._set(code)
+                    self.count += 1
+                seen.add(rsvp_id)
+            top = max(seen, default=0)
+            if top > self._max_id:
+                self._track_gaps(seen, self._max_id + 1, top, started)
+                self._max_id = top
+            self._caught_up_at = started
+            self.catch_ups += 1
+
+    def add(self, codes):
+        """Record codes committed by this process"""
+        with self._lock:
+            if self._bits is None:
+                return
+            for code in codes:
+                self._set(code)
+                self.count += 1
+            if self.count > self.capacity:
+                self._bits = None  # over capacity: rebuild larger on next use
+
+    def discard(self, count=1):
+        """Note deleted RSVPs; their codes stay in the filter until the next rebuild"""
+        with self._lock:
+            self.removed += count
+            if self._bits is not None and self.removed > max(self.count // 4, self.MIN_CAPACITY // 4):
+                self._bits = None
+
+    def might_contain(self, code):
+        """False only if the code was certainly never issued"""
+        if not self.enabled:
+            return True
+        missed_at = time.monotonic()
+        if self._bits is None:
+            self.rebuild()
+        if self._test(code):
+            self.passed += 1
+            return True
+        self._catch_up(missed_at)
+        if self._test(code):
+            self.passed += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'codes': self.count,
+            'capacity': self.capacity,
+            'removed_since_rebuild': self.removed,
+            'size_bytes': len(self._bits) if self._bits is not None else 0,
+            'hashes': self._hashes,
+            'rejected': self.rejected,
+            'passed': self.passed,
+            'rebuilds': self.rebuilds,
+            'catch_ups': self.catch_ups,
+            'gaps': len(self._gaps)
+        }
+
+issued_codes = IssuedCodeFilter()  # configured in create_app()
+
+class MemoryTokenBuckets:
+    """Token buckets in this process; the least recently seen clients are dropped beyond max_clients"""
+
+    def __init__(self, max_clients=100000):
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - stamp) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+class RedisTokenBuckets:
+    """Token buckets in Redis, shared by every worker (needs the redis package)"""
+
+    SCRIPT = """
+    local now = redis.call('TIME')
+    now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+    local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+    local tokens = tonumber(bucket[1]) or burst
+    local stamp = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + (now - stamp) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'stamp', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url):
         try:
-            mail.send(msg)
-            print(f"✅ Email enviado com sucesso!")
-        except Exception as e:
-            print(f"❌ Falha ao enviar email: {e}")
+            import redis
+        except ImportError:
+            raise RuntimeError('RATE_LIMIT_STORAGE_URL uses Redis: pip install redis')
+        self._script = redis.Redis.from_url(url).register_script(self.SCRIPT)
 
-def send_notification_email(new_guest_name, all_guests):
-    """Send notification email with updated guest list"""
-    notification_email = os.getenv('NOTIFICATION_EMAIL')
-    
-    if not notification_email:
-        print("⚠️ Email de notificação não configurado")
+    def take(self, key, rate, burst):
+        allowed, tokens = self._script(keys=[f'party:ratelimit:{key}'], args=[rate, burst])
+        return bool(allowed), float(tokens)
+
+class RateLimiter:
+    """Per-client token bucket for the confirmation code routes"""
+
+    def __init__(self):
+        self.rate = 0.0
+        self.burst = 0
+        self.backend = None
+        self.allowed = 0
+        self.limited = 0
+        self.backend_errors = 0
+
+    def init_app(self, app):
+        self.rate = app.config['RATE_LIMIT_PER_MINUTE'] / 60
+        self.burst = app.config['RATE_LIMIT_BURST']
+        url = app.config['RATE_LIMIT_STORAGE_URL']
+        self.backend = RedisTokenBuckets(url) if url.startswith(('redis://', 'rediss://')) else MemoryTokenBuckets()
+
+    def take(self, key):
+        """Return (allowed, retry_after_seconds)"""
+        if not self.rate:
+            return True, 0
+        try:
+            allowed, tokens = self.backend.take(key, self.rate, self.burst)
+        except Exception:
+            # A shared backend that is down must not take the routes with it
+            self.backend_errors += 1
+            logger.warning("Rate limiter backend unavailable", exc_info=True)
+            return True, 0
+        if allowed:
+            self.allowed += 1
+            return True, 0
+        self.limited += 1
+        return False, (1 - tokens) / self.rate
+
+    def stats(self):
+        return {
+            'requests_per_minute': self.rate * 60,
+            'burst': self.burst,
+            'backend': type(self.backend).__name__ if self.backend else None,
+            'allowed': self.allowed,
+            'limited': self.limited,
+            'backend_errors': self.backend_errors
+        }
+
+rate_limiter = RateLimiter()
+
+def rate_limited(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        allowed, retry_after = rate_limiter.take(request.remote_addr or 'unknown')
+        if not allowed:
+            response = jsonify({'error': 'Demasiados pedidos, tente novamente mais tarde'})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(math.ceil(retry_after))
+            return response
+        return view(*args, **kwargs)
+    return wrapper
+
+@event.listens_for(Session, 'after_flush')
+def _mark_party_writes(session, flush_context):
+    written = {obj.id for obj in (*session.new, *session.dirty, *session.deleted) if isinstance(obj, Party)}
+    if written:
+        session.info.setdefault('stale_parties', set()).update(written)
+        for party_id in (None, *written):
+            party_cache.invalidate(party_id)
+    codes = [obj.confirmation_code for obj in (*session.dirty, *session.deleted) if isinstance(obj, RSVP)]
+    if codes:
+        mark_stale_confirmations(codes, session=session)
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _invalidate_party_cache(session):
+    written = session.info.pop('stale_parties', None)
+    if written:
+        for party_id in (None, *written):
+            party_cache.invalidate(party_id)
+    stale = session.info.pop('stale_confirmations', None)
+    if stale:
+        codes, parties = stale
+        confirmation_cache.invalidate(codes)
+        for party_id in parties:
+            confirmation_cache.invalidate(party_id=party_id)
+
+# Guest list helpers
+GUEST_FIELDS = ('id', 'name', 'email', 'phone', 'attending', 'number_of_guests',
+                'dietary_restrictions', 'message', 'confirmation_code', 'submitted_at')
+GUEST_PAGE_MAX = 500
+
+def rebuild_party_counter(party_id, session=None):
+    """Recompute a party's aggregates from the rsvps table (one grouped scan).
+
+    `session` defaults to db.session; asgi.py passes its own through run_sync.
+    """
+    session = session or db.session
+    counter = session.get(PartyCounter, party_id)
+    if counter is None:
+        counter = PartyCounter(party_id=party_id, guests_version=0)
+        session.add(counter)
+    counter.guests_version = (counter.guests_version or 0) + 1
+    counter.total_rsvps = counter.total_attending = 0
+    counter.attending_yes = counter.attending_no = counter.attending_maybe = 0
+
+    rows = session.execute(
+        db.select(RSVP.attending, db.func.count(RSVP.id), db.func.coalesce(db.func.sum(RSVP.number_of_guests), 0))
+        .where(RSVP.party_id == party_id)
+        .group_by(RSVP.attending)
+    ).all()
+    for attending, count, guests in rows:
+        counter.total_rsvps += count
+        if attending in ('yes', 'no', 'maybe'):
+            setattr(counter, f'attending_{attending}', count)
+        if attending == 'yes':
+            counter.total_attending = guests
+    return counter
+
+def guest_list_update(party_id, rsvp_delta=0, attending=None, number_of_guests=0, reset=False):
+    """UPDATE ... RETURNING guests_version for touch_guest_list (arguments as there)"""
+    values = {'guests_version': PartyCounter.guests_version + 1}
+    if reset:
+        values.update(total_rsvps=0, total_attending=0, attending_yes=0, attending_no=0, attending_maybe=0)
+    elif rsvp_delta:
+        values['total_rsvps'] = PartyCounter.total_rsvps + rsvp_delta
+        if attending in ('yes', 'no', 'maybe'):
+            column = f'attending_{attending}'
+            values[column] = getattr(PartyCounter, column) + rsvp_delta
+        if attending == 'yes':
+            values['total_attending'] = PartyCounter.total_attending + rsvp_delta * (number_of_guests or 0)
+    return (db.update(PartyCounter).where(PartyCounter.party_id == party_id).values(**values)
+            .returning(PartyCounter.guests_version))
+
+def touch_guest_list(party_id, rsvp_delta=0, attending=None, number_of_guests=0, reset=False, session=None):
+    """Bump the party's guest list version and adjust its aggregates inside the
+    current transaction. rsvp_delta is +1 for an added RSVP and -1 for a removed one;
+    reset zeroes every aggregate after the party's RSVPs were all deleted."""
+    session = session or db.session
+    version = session.execute(
+        guest_list_update(party_id, rsvp_delta, attending, number_of_guests, reset)
+    ).scalar()
+    if version is None:
+        # No counter row yet: the rebuild sees the pending change through autoflush
+        version = rebuild_party_counter(party_id, session).guests_version
+    note_guest_list_version(party_id, version, session)
+
+def note_guest_list_version(party_id, version, session=None):
+    """Remember the version this transaction wrote, for guest_events once it commits"""
+    versions = (session or db.session).info.setdefault('guest_list_versions', {})
+    versions[party_id] = max(version, versions.get(party_id, 0))
+
+def get_party_counter(party_id, session=None):
+    session = session or db.session
+    counter = session.get(PartyCounter, party_id)
+    if counter is None:
+        counter = rebuild_party_counter(party_id, session)
+        session.commit()
+    return counter
+
+def get_guest_list_version(party_id):
+    version = db.session.execute(
+        db.select(PartyCounter.guests_version).where(PartyCounter.party_id == party_id)
+    ).scalar()
+    return version or 0
+
+def upsert(table, dialect=None):
+    """INSERT supporting ON CONFLICT for the session's (or the named) database: PostgreSQL or SQLite"""
+    dialect = dialect or db.session.get_bind().dialect.name
+    # Imported here: the engine has already loaded its own dialect, and importing
+    # the PostgreSQL one at startup is a noticeable share of a SQLite cold start
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+CONFIRMATION_CODE_ATTEMPTS = 3
+
+def rsvp_upsert(values, dialect=None):
+    """INSERT ... ON CONFLICT (party, email) DO UPDATE ... RETURNING id, confirmation_code"""
+    return upsert(RSVP, dialect).values(**values).on_conflict_do_update(
+        index_elements=[RSVP.party_id, db.func.lower(RSVP.email)],
+        set_={'email': RSVP.email}
+    ).returning(RSVP.id, RSVP.confirmation_code)
+
+def insert_rsvp(values, session=None):
+    """Insert an RSVP unless the party already has one for this email.
+
+    Returns (id, confirmation_code, created). A single INSERT ... ON CONFLICT
+    DO UPDATE ... RETURNING on both PostgreSQL and SQLite: on a conflict the
+    no-op update hands back the existing row, so no SELECT is needed.
+    """
+    session = session or db.session
+    for attempt in range(CONFIRMATION_CODE_ATTEMPTS):
+        try:
+            rsvp_id, confirmation_code = session.execute(rsvp_upsert(values, session.get_bind().dialect.name)).one()
+        except IntegrityError:
+            # The generated code is taken (the email conflict is handled above).
+            # Nothing else was written yet, so roll back and draw a new one.
+            session.rollback()
+            if attempt == CONFIRMATION_CODE_ATTEMPTS - 1:
+                raise
+            logger.warning("Confirmation code collision, retrying", extra={'attempt': attempt + 1})
+            values['confirmation_code'] = generate_confirmation_code()
+            continue
+        return rsvp_id, confirmation_code, confirmation_code == values['confirmation_code']
+
+def guest_spots_update(party_id, number_of_guests):
+    """Conditional UPDATE ... RETURNING guests_version adding a 'yes' RSVP if it fits"""
+    max_guests = db.select(Party.max_guests).where(Party.id == party_id).scalar_subquery()
+    new_total = PartyCounter.total_attending + number_of_guests
+    return (
+        db.update(PartyCounter)
+        .where(PartyCounter.party_id == party_id, new_total <= db.func.coalesce(max_guests, new_total))
+        .values(
+            guests_version=PartyCounter.guests_version + 1,
+            total_rsvps=PartyCounter.total_rsvps + 1,
+            attending_yes=PartyCounter.attending_yes + 1,
+            total_attending=new_total
+        )
+        .returning(PartyCounter.guests_version)
+    )
+
+def reserve_guest_spots(party_id, number_of_guests, session=None):
+    """Count a new 'yes' RSVP in party_counters if it fits within max_guests.
+
+    The capacity check and the increment are one conditional UPDATE, so the
+    counter row lock serializes concurrent submits. Returns False when full.
+    """
+    session = session or db.session
+    version = session.execute(guest_spots_update(party_id, number_of_guests)).scalar()
+    if version is not None:
+        note_guest_list_version(party_id, version, session)
+        return True
+
+    has_counter = session.execute(
+        db.select(PartyCounter.party_id).where(PartyCounter.party_id == party_id)
+    ).scalar()
+    if has_counter:
+        return False
+    # No counter row yet: the rebuild already includes the new RSVP
+    counter = rebuild_party_counter(party_id, session)
+    session.flush()
+    note_guest_list_version(party_id, counter.guests_version, session)
+    limit = session.execute(db.select(Party.max_guests).where(Party.id == party_id)).scalar()
+    return limit is None or counter.total_attending <= limit
+
+def encode_guest_cursor(submitted_at, guest_id):
+    raw = f"{submitted_at.isoformat() if submitted_at else ''}|{guest_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_guest_cursor(cursor):
+    """Return (submitted_at, id) from a cursor, or None if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        submitted_at, guest_id = raw.rsplit('|', 1)
+        return (datetime.fromisoformat(submitted_at) if submitted_at else None), int(guest_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def rsvp_lookup_query(confirmation_code):
+    """One RSVP as a Core row: GUEST_FIELDS, then party_id and the party's
+    guests_version, read in the same statement for confirmation_cache"""
+    guests_version = db.select(PartyCounter.guests_version).where(
+        PartyCounter.party_id == RSVP.party_id
+    ).scalar_subquery()
+    return (db.select(*(getattr(RSVP, f) for f in GUEST_FIELDS), RSVP.party_id,
+                      db.func.coalesce(guests_version, 0).label('guests_version'))
+            .where(RSVP.confirmation_code == confirmation_code))
+
+def serialize_guest_row(row, fields):
+    """Dict of the first len(fields) columns of row; queries select `fields` first"""
+    return {field: value.isoformat() if isinstance(value, datetime) else value for field, value in zip(fields, row)}
+
+def confirmation_response(party, encoded_rsvp):
+    """get_rsvp's {"party": ..., "rsvp": ...} around an already encoded RSVP,
+    byte for byte what jsonify would return"""
+    body = f'{{"party":{compact_json_encoder()(party.to_dict())},"rsvp":{encoded_rsvp}}}\n'
+    return current_app.response_class(body, mimetype=current_app.json.mimetype)
+
+def compact_json_encoder():
+    """encode() with the app's JSON settings and jsonify's compact separators"""
+    return current_app.json.encode_compact
+
+def parse_guest_fields():
+    """fields= from the query string: (fields, unknown field names)"""
+    fields = tuple(f.strip() for f in request.args.get('fields', '').split(',') if f.strip()) or GUEST_FIELDS
+    return fields, [f for f in fields if f not in GUEST_FIELDS]
+
+def guest_list_query(party_id, fields, attending=None):
+    """Guests newest first; `fields` first, then id and submitted_at for cursors"""
+    columns = [getattr(RSVP, f) for f in dict.fromkeys(fields + ('id', 'submitted_at'))]
+    query = db.select(*columns).where(RSVP.party_id == party_id)
+    if attending:
+        query = query.where(RSVP.attending == attending)
+    return query.order_by(RSVP.submitted_at.desc(), RSVP.id.desc())
+
+def encode_guest_rows(query, fields):
+    """Yield (row count, JSON-encoded guests) per STREAM_BATCH_SIZE rows.
+
+    yield_per keeps only one batch of rows in memory (a server-side cursor on
+    PostgreSQL); each batch is encoded in one call, every row exactly once,
+    as comma separated array items without the brackets.
+    """
+    encode = compact_json_encoder()
+    query = query.execution_options(yield_per=current_app.config['STREAM_BATCH_SIZE'])
+    for rows in db.session.execute(query).partitions():
+        yield len(rows), encode([serialize_guest_row(row, fields) for row in rows])[1:-1]
+
+def json_array_chunks(batches):
+    """Chunks of one JSON array from encode_guest_rows batches"""
+    yield '['
+    separator = ''
+    for count, encoded in batches:
+        if count:
+            yield separator + encoded
+            separator = ','
+    yield ']'
+
+def stream_json(chunks, status=200):
+    """Streaming application/json response (jsonify's compact output and trailing newline)"""
+    def generate():
+        yield from chunks
+        yield '\n'
+    return current_app.response_class(stream_with_context(generate()), status=status, mimetype='application/json')
+
+BULK_REQUIRED_FIELDS = ('name', 'email', 'attending')
+BULK_TEXT_FIELDS = ('name', 'email', 'phone', 'attending', 'dietary_restrictions', 'message',
+                    'confirmation_code', 'submitted_at')
+
+def read_bulk_rows(stream, content_type):
+    """Yield (line, row) from a CSV or NDJSON upload without buffering the body"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if content_type == 'text/csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
         return
-    
+    for line, raw in enumerate(text, 1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError:
+            yield line, None
+            continue
+        yield line, row if isinstance(row, dict) else None
+
+def validate_bulk_row(row, party_id):
+    """Return the insert values for an uploaded guest row; ValueError says what is wrong"""
+    if row is None:
+        raise ValueError('Linha inválida')
+    # NDJSON values can be numbers, lists or objects; CSV values are always text
+    not_text = [f for f in BULK_TEXT_FIELDS if row.get(f) is not None and not isinstance(row[f], str)]
+    if not_text:
+        raise ValueError(f'Campos devem ser texto: {", ".join(not_text)}')
+    missing = [f for f in BULK_REQUIRED_FIELDS if not row.get(f)]
+    if missing:
+        raise ValueError(f'Campos obrigatórios em falta: {", ".join(missing)}')
+    if row['attending'] not in ('yes', 'no', 'maybe'):
+        raise ValueError(f'Valor de attending inválido: {row["attending"]}')
     try:
-        subject = f"🎉 Novo Convidado: {new_guest_name} - Festa do Darius"
-        
-        # Create HTML email content
-        html_body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 20px; border-radius: 10px; color: white; text-align: center;">
-                <h1>🎉 Festa de Aniversário do Darius!</h1>
-                <h2>{new_guest_name} confirmou presença!</h2>
-            </div>
-            
-            <div style="padding: 20px;">
-                <h3 style="color: #667eea;">📝 Lista Atualizada de Convidados ({len(all_guests)} pessoas):</h3>
-                <div style="background-color: #f8f9fa; padding: 15px; border-radius: 8px; border-left: 4px solid #667eea;">
-                    <ul style="list-style: none; padding: 0;">
+        number_of_guests = int(row.get('number_of_guests') or 1)
+    except (TypeError, ValueError, OverflowError):
+        number_of_guests = 0
+    if number_of_guests < 1:
+        raise ValueError('Número de convidados inválido')
+    values = {
+        'party_id': party_id,
+        'name': row['name'],
+        'email': row['email'],
+        'phone': row.get('phone') or '',
+        'attending': row['attending'],
+        'number_of_guests': number_of_guests,
+        'dietary_restrictions': row.get('dietary_restrictions') or '',
+        'message': row.get('message') or '',
+        'confirmation_code': generate_confirmation_code(),
+        'submitted_at': utcnow()
+    }
+    if row.get('confirmation_code'):
+        values['confirmation_code'] = normalize_confirmation_code(row['confirmation_code'])
+        if values['confirmation_code'] is None:
+            raise ValueError(f'Código de confirmação inválido: {row["confirmation_code"]}')
+    if row.get('submitted_at'):
+        try:
+            values['submitted_at'] = datetime.fromisoformat(row['submitted_at'])
+        except (TypeError, ValueError):
+            raise ValueError(f'Data inválida: {row["submitted_at"]}')
+    return values
+
+def insert_bulk_batch(party_id, batch):
+    """Insert one batch of (line, values) with a single executemany.
+
+    Rows that hit an existing email or confirmation code are skipped by ON
+    CONFLICT DO NOTHING; returns the lines that were not inserted. Unlike
+    POST /api/rsvp this does not check max_guests: an import records guests
+    who already said yes, so a full party gets them all and shows as over
+    capacity rather than losing rows.
+    """
+    inserted = set(db.session.execute(
+        upsert(RSVP.__table__).on_conflict_do_nothing().returning(RSVP.confirmation_code),
+        [values for _, values in batch]
+    ).scalars())
+
+    added = Counter()
+    skipped = []
+    for line, values in batch:
+        if values['confirmation_code'] in inserted:
+            added[values['attending'], values['number_of_guests']] += 1
+        else:
+            skipped.append(line)
+    for (attending, number_of_guests), count in added.items():
+        touch_guest_list(party_id, count, attending, number_of_guests)
+    if added:
+        queue_guest_event(party_id, 'snapshot')
+    db.session.commit()
+    issued_codes.add(inserted)
+    return skipped
+
+# Email functions
+class EmailQueue:
+    """Bounded pool of worker threads draining the email_outbox table.
+
+    Each worker claims up to `batch_size` due rows and sends them over a single
+    SMTP connection. A claim is a lease: rows stay in 'sending' with
+    next_attempt_at pushed into the future, so a crashed worker's rows are
+    retried once the lease runs out. Failures back off exponentially until
+    `max_attempts`, after which the row is marked 'failed'.
+    """
+
+    LEASE_SECONDS = 120
+    MAX_BACKOFF_SECONDS = 3600
+
+    def __init__(self):
+        self.app = None
+        self.workers = 0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._started_pid = None
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config['EMAIL_WORKERS']
+        self.batch_size = app.config['EMAIL_BATCH_SIZE']
+        self.max_attempts = app.config['EMAIL_MAX_ATTEMPTS']
+        self.retry_base = app.config['EMAIL_RETRY_BASE_SECONDS']
+        self.poll_interval = app.config['EMAIL_POLL_INTERVAL']
+
+    def start(self):
+        """Start the worker threads once per process (safe to call on every request)"""
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            for i in range(self.workers):
+                threading.Thread(target=self._run, name=f'email-worker-{i}', daemon=True).start()
+            self._started_pid = os.getpid()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def enqueue(self, msg, party_id=None, session=None):
+        """Add `msg` to the outbox in the current transaction; it is sent after commit"""
+        session = session or db.session
+        session.add(EmailOutbox(
+            party_id=party_id,
+            subject=msg.subject,
+            recipients=','.join(msg.recipients),
+            body=msg.body,
+            html=msg.html
+        ))
+        session.info['email_enqueued'] = True
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    while self.drain_once():
+                        pass
+            except Exception:
+                logger.exception("Erro no worker de email")
+
+    @staticmethod
+    def due_emails(now, limit):
+        """Ids of up to `limit` due outbox rows.
+
+        Parties take turns: every party's oldest due email comes before any
+        party's second one, so one party's backlog cannot delay the others.
         """
+        due = db.select(
+            EmailOutbox.id, EmailOutbox.next_attempt_at,
+            db.func.row_number().over(partition_by=EmailOutbox.party_id,
+                                      order_by=EmailOutbox.next_attempt_at).label('turn')
+        ).where(EmailOutbox.status.in_(('pending', 'sending')), EmailOutbox.next_attempt_at <= now).subquery()
+        return db.select(due.c.id).order_by(due.c.turn, due.c.next_attempt_at).limit(limit)
+
+    @classmethod
+    def claim_email(cls, outbox_id, now):
+        """Conditional update so two workers (or processes) never claim the same row"""
+        return (
+            db.update(EmailOutbox)
+            .where(EmailOutbox.id == outbox_id,
+                   EmailOutbox.status.in_(('pending', 'sending')),
+                   EmailOutbox.next_attempt_at <= now)
+            .values(status='sending', next_attempt_at=now + timedelta(seconds=cls.LEASE_SECONDS),
+                    attempts=EmailOutbox.attempts + 1)
+        )
+
+    def _claim(self):
+        now = utcnow()
+        candidates = db.session.execute(self.due_emails(now, self.batch_size)).scalars().all()
+
+        claimed = []
+        for outbox_id in candidates:
+            won = db.session.execute(self.claim_email(outbox_id, now)).rowcount
+            if won:
+                claimed.append(outbox_id)
+        db.session.commit()
+        if not claimed:
+            return []
+        return db.session.execute(
+            db.select(EmailOutbox).where(EmailOutbox.id.in_(claimed))
+        ).scalars().all()
+
+    def drain_once(self):
+        """Send one batch; returns the number of rows that were claimed"""
+        batch = self._claim()
+        if not batch:
+            return 0
+
+        for item in batch:
+            # Digests are rendered once, on their first claim; retries resend the same content
+            if item.kind == 'digest' and item.body is None and not render_notification_digest(item):
+                item.status = 'skipped'
+
+        try:
+            with mail.connect() as connection:
+                for item in batch:
+                    if item.status != 'sending':
+                        continue
+                    try:
+                        connection.send(item.to_message())
+                        self._mark_sent(item)
+                    except Exception as e:
+                        self._mark_failed(item, e)
+        except Exception as e:
+            # Could not open the SMTP connection: retry everything not yet sent
+            for item in batch:
+                if item.status == 'sending':
+                    self._mark_failed(item, e)
+
+        db.session.commit()
+        return len(batch)
+
+    def _mark_sent(self, item):
+        item.status = 'sent'
+        item.sent_at = utcnow()
+        item.last_error = None
+        latency = (item.sent_at - item.created_at).total_seconds()
+        with self._lock:
+            self.sent += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def _mark_failed(self, item, error):
+        item.last_error = str(error)[:1000]
+        if item.attempts >= self.max_attempts:
+            item.status = 'failed'
+            with self._lock:
+                self.failed += 1
+            logger.error("Email falhou definitivamente", extra={'outbox_id': item.id, 'attempts': item.attempts, 'error': str(error)})
+            return
+        backoff = min(self.retry_base * 2 ** (item.attempts - 1), self.MAX_BACKOFF_SECONDS)
+        item.status = 'pending'
+        item.next_attempt_at = utcnow() + timedelta(seconds=backoff)
+        with self._lock:
+            self.retried += 1
+        logger.warning("Email falhou, nova tentativa agendada", extra={
+            'outbox_id': item.id, 'attempts': item.attempts, 'retry_in_seconds': backoff, 'error': str(error)
+        })
+
+    def stats(self):
+        depth = dict(db.session.execute(
+            db.select(EmailOutbox.status, db.func.count(EmailOutbox.id))
+            .where(EmailOutbox.status.in_(('pending', 'sending', 'failed')))
+            .group_by(EmailOutbox.status)
+        ).all())
+        return {
+            'queue_depth': depth.get('pending', 0) + depth.get('sending', 0),
+            'in_flight': depth.get('sending', 0),
+            'dead_letters': depth.get('failed', 0),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retried': self.retried,
+            'latency_avg_seconds': round(self.latency_total / self.sent, 3) if self.sent else None,
+            'latency_max_seconds': round(self.latency_max, 3),
+            'workers': self.workers,
+            'running': self._started_pid == os.getpid()
+        }
+
+email_queue = EmailQueue()
+
+@event.listens_for(Session, 'after_commit')
+def _wake_email_queue(session):
+    if session.info.pop('email_enqueued', False):
+        email_queue.wake()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_email_flag(session):
+    session.info.pop('email_enqueued', None)
+
+@api.before_app_request
+def _start_email_queue():
+    email_queue.start()
+
+class GuestSubscriber:
+    __slots__ = ('party_id', 'fields', 'attending', 'queue', 'overflowed')
+
+    def __init__(self, party_id, fields, attending, buffer_size):
+        self.party_id = party_id
+        self.fields = fields
+        self.attending = attending
+        self.queue = queue.Queue(maxsize=buffer_size)
+        self.overflowed = False
+
+class GuestEventBroker:
+    """In-process fan-out of guest list changes to /api/guests/stream.
+
+    Subscribers are grouped by (party, fields, attending) so every event is
+    encoded once per group, not once per subscriber. Each subscriber has a
+    bounded queue; one that falls `buffer_size` events behind is marked as
+    overflowed and its stream ends, and the browser reconnects for a fresh
+    snapshot, instead of blocking publishers or growing memory.
+
+    Events are published by the committing request (see queue_guest_event).
+    Changes committed by other worker processes are noticed by a watcher
+    thread that compares party_counters.guests_version with the last version
+    seen here every `poll_interval` seconds and sends affected groups a new
+    snapshot: one query per worker, however many subscribers there are.
+    """
+
+    CLOSE = object()
+
+    def __init__(self):
+        self.buffer_size = 100
+        self.heartbeat = 15.0
+        self.poll_interval = 2.0
+        self.max_subscribers = 5000
+        self.app = None
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+        self.snapshots = 0
+        self._groups = {}
+        self._count = 0
+        self._versions = {}
+        self._refresh = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._watcher_pid = None
+
+    def init_app(self, app):
+        self.app = app
+        self.buffer_size = app.config['GUEST_STREAM_BUFFER']
+        self.heartbeat = app.config['GUEST_STREAM_HEARTBEAT']
+        self.poll_interval = app.config['GUEST_STREAM_POLL_SECONDS']
+        self.max_subscribers = app.config['GUEST_STREAM_MAX_SUBSCRIBERS']
+
+    def subscribe(self, party_id, fields, attending):
+        """New subscriber, or None when this worker is at max_subscribers"""
+        subscriber = GuestSubscriber(party_id, fields, attending, self.buffer_size)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                return None
+            self._groups.setdefault(party_id, {}).setdefault((fields, attending), set()).add(subscriber)
+            self._count += 1
+            if self._watcher_pid != os.getpid():
+                self._watcher_pid = os.getpid()
+                threading.Thread(target=self._watch, name='guest-events', daemon=True).start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            groups = self._groups.get(subscriber.party_id, {})
+            key = (subscriber.fields, subscriber.attending)
+            group = groups.get(key)
+            if group is None or subscriber not in group:
+                return
+            group.discard(subscriber)
+            self._count -= 1
+            if not group:
+                del groups[key]
+            if not groups:
+                self._groups.pop(subscriber.party_id, None)
+
+    def observe(self, party_id, version):
+        """Record a guest list version this process already knows about"""
+        with self._lock:
+            self._versions[party_id] = max(version, self._versions.get(party_id, 0))
+
+    def next_message(self, subscriber):
+        """Next SSE message for a subscriber, None after `heartbeat` idle seconds or CLOSE"""
+        if subscriber.overflowed:
+            return self.CLOSE
+        try:
+            return subscriber.queue.get(timeout=self.heartbeat)
+        except queue.Empty:
+            return None
+
+    def _deliver(self, subscribers, message):
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+                self.delivered += 1
+            except queue.Full:
+                if not subscriber.overflowed:
+                    subscriber.overflowed = True
+                    self.overflows += 1
+
+    def publish(self, party_id, kind, data, attending=None):
+        """Send an add/update/delete/clear event; `data` holds serialized guest fields.
+
+        Groups filtered by attending only get events for guests with that
+        status; events without one (clear) go to every group.
+        """
+        with self._lock:
+            groups = [(key, list(subscribers)) for key, subscribers in self._groups.get(party_id, {}).items()]
+        if not groups:
+            return
+        self.published += 1
+        encode = compact_json_encoder()
+        for (fields, group_attending), subscribers in groups:
+            if group_attending and attending and attending != group_attending:
+                continue
+            payload = {key: value for key, value in data.items() if key == 'id' or key in fields}
+            self._deliver(subscribers, f'event: {kind}\ndata: {encode(payload)}\n\n')
+
+    def refresh(self, party_id):
+        """Have the watcher send every subscriber of the party a new snapshot"""
+        with self._lock:
+            self._refresh.add(party_id)
+        self._wakeup.set()
+
+    def _send_snapshots(self, party_id):
+        with self._lock:
+            groups = [(key, list(subscribers)) for key, subscribers in self._groups.get(party_id, {}).items()]
+        for (fields, attending), subscribers in groups:
+            query = guest_list_query(party_id, fields, attending)
+            body = ''.join(json_array_chunks(encode_guest_rows(query, fields)))
+            self._deliver(subscribers, f'event: snapshot\ndata: {body}\n\n')
+            self.snapshots += 1
+
+    def _watch(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self._lock:
+                parties = list(self._groups)
+                refresh, self._refresh = self._refresh, set()
+            if not parties:
+                continue
+            try:
+                with self.app.app_context():
+                    versions = db.session.execute(
+                        db.select(PartyCounter.party_id, PartyCounter.guests_version)
+                        .where(PartyCounter.party_id.in_(parties))
+                    ).all()
+                    with self._lock:
+                        for party_id, version in versions:
+                            known = self._versions.get(party_id)
+                            if known is not None and version > known:
+                                refresh.add(party_id)  # committed by another worker
+                            self._versions[party_id] = max(version, known or 0)
+                    for party_id in refresh & set(parties):
+                        self._send_snapshots(party_id)
+            except Exception:
+                logger.exception("Guest event watcher failed")
+
+    def stats(self):
+        with self._lock:
+            groups = sum(len(groups) for groups in self._groups.values())
+        return {
+            'subscribers': self._count,
+            'groups': groups,
+            'published': self.published,
+            'delivered': self.delivered,
+            'overflows': self.overflows,
+            'snapshots': self.snapshots
+        }
+
+guest_events = GuestEventBroker()
+
+class GuestListSnapshots:
+    """The default /api/guests answer (every field, no filter, no paging)
+    kept per party as gzip bytes, and brotli bytes when the brotli package is
+    installed, tagged with the guest list version they were built from.
+
+    A request whose party is still at that version gets the bytes as they
+    are: no query on rsvps, no encoding, no compression. Otherwise the list
+    is streamed as before and the party is queued for a rebuild. Rebuilds run
+    on one builder thread per process, queued when this worker commits a
+    change to a party that has a snapshot and when a request finds its
+    party's snapshot missing or stale (changed by another worker). The
+    builder waits `delay` seconds, or as long as its previous pass took, so
+    bursts of changes cost one rebuild and it never takes more than about
+    half a core. Parties with more than `max_rows` RSVPs are not kept; at
+    most `max_parties` snapshots are, the least recently served dropped first.
+    """
+
+    GZIP_LEVEL = 6
+    BROTLI_QUALITY = 5  # 11 is many times slower for a few percent smaller lists
+
+    def __init__(self):
+        self.max_parties = 32
+        self.max_rows = 250000
+        self.delay = 1.0
+        self.app = None
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.build_seconds = 0.0
+        self._snapshots = OrderedDict()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._builder_pid = None
+
+    def init_app(self, app):
+        self.app = app
+        self.max_parties = app.config['GUEST_SNAPSHOT_PARTIES']
+        self.max_rows = app.config['GUEST_SNAPSHOT_MAX_ROWS']
+        self.delay = app.config['GUEST_SNAPSHOT_DELAY']
+
+    def get(self, party_id, version):
+        """{encoding: bytes} of the party's list at `version`, or None (and a rebuild is queued)"""
+        if self.max_parties <= 0:
+            return None
+        with self._lock:
+            snapshot = self._snapshots.get(party_id)
+            if snapshot is not None and snapshot[0] == version:
+                self._snapshots.move_to_end(party_id)
+                self.hits += 1
+                return snapshot[1]
+            self.misses += 1
+        self.schedule(party_id)
+        return None
+
+    def changed(self, party_id):
+        """This worker committed a change to the party's guest list"""
+        if party_id in self._snapshots:
+            self.schedule(party_id)
+
+    def schedule(self, party_id):
+        with self._lock:
+            self._pending.add(party_id)
+            if self._builder_pid != os.getpid():
+                self._builder_pid = os.getpid()
+                threading.Thread(target=self._build_pending, name='guest-snapshots', daemon=True).start()
+        self._wakeup.set()
+
+    def _build_pending(self):
+        pause = self.delay
+        while True:
+            self._wakeup.wait()
+            time.sleep(pause)
+            with self._lock:
+                pending, self._pending = self._pending, set()
+                self._wakeup.clear()
+            started = time.perf_counter()
+            for party_id in pending:
+                try:
+                    with self.app.app_context():
+                        self.build(party_id)
+                except Exception:
+                    logger.exception("Guest list snapshot failed", extra={'party_id': party_id})
+            pause = max(self.delay, time.perf_counter() - started)
+
+    def build(self, party_id):
+        """Encode and compress the party's list; the version is read first, so
+        rows changed meanwhile only make the snapshot look stale, never current"""
+        counter = get_party_counter(party_id)
+        version = counter.guests_version
+        with self._lock:
+            snapshot = self._snapshots.get(party_id)
+            if snapshot is not None and snapshot[0] == version:
+                return
+        if counter.total_rsvps > self.max_rows:
+            self.discard(party_id)
+            return
+        started = time.perf_counter()
+        body = ''.join(json_array_chunks(encode_guest_rows(guest_list_query(party_id, GUEST_FIELDS), GUEST_FIELDS)))
+        body = (body + '\n').encode()
+        encoded = {'gzip': gzip.compress(body, self.GZIP_LEVEL, mtime=0)}
+        if brotli:
+            encoded['br'] = brotli.compress(body, quality=self.BROTLI_QUALITY)
+        del body
+        with self._lock:
+            self._snapshots[party_id] = (version, encoded)
+            self._snapshots.move_to_end(party_id)
+            while len(self._snapshots) > self.max_parties:
+                self._snapshots.popitem(last=False)
+            self.builds += 1
+            self.build_seconds += time.perf_counter() - started
+
+    def discard(self, party_id):
+        with self._lock:
+            self._snapshots.pop(party_id, None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        with self._lock:
+            cached_bytes = {encoding: sum(len(encoded[encoding]) for _, encoded in self._snapshots.values())
+                            for encoding in COMPRESS_ENCODINGS}
+            cached = len(self._snapshots)
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else None,
+            'cached': cached,
+            'max_size': self.max_parties,
+            'cached_bytes': cached_bytes,
+            'builds': self.builds,
+            'build_seconds_total': round(self.build_seconds, 3),
+            'encodings': list(COMPRESS_ENCODINGS)
+        }
+
+guest_snapshots = GuestListSnapshots()
+
+def queue_guest_event(party_id, kind, data=None, attending=None):
+    """Publish a guest list event once the current transaction commits.
+
+    kind is add, update, delete or clear; 'snapshot' asks for a new snapshot
+    to be sent instead, for changes too large to send row by row.
+    """
+    db.session.info.setdefault('guest_events', []).append((party_id, kind, data or {}, attending))
+
+@event.listens_for(Session, 'after_commit')
+def _publish_guest_events(session):
+    for party_id, version in session.info.pop('guest_list_versions', {}).items():
+        party_stats_cache.invalidate(party_id)
+        guest_events.observe(party_id, version)
+        guest_snapshots.changed(party_id)
+    for party_id, kind, data, attending in session.info.pop('guest_events', ()):
+        if kind == 'snapshot':
+            guest_events.refresh(party_id)
+        else:
+            guest_events.publish(party_id, kind, data, attending)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_guest_events(session):
+    session.info.pop('guest_list_versions', None)
+    session.info.pop('guest_events', None)
+
+PT_MONTHS = ('Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+             'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro')
+
+# Notification templates: str.format templates bound once at import, split at the
+# guest rows. A guest row is the constant pieces around its values; each body is
+# one list (head, row pieces and values, tail) joined once, so neither a per-row
+# string nor an intermediate string of all rows is built.
+NOTIFICATION_HTML_TEMPLATE = """
+    <html>
+    <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+        <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 20px; border-radius: 10px; color: white; text-align: center;">
+            <h1>🎉 {title}!</h1>
+            <h2>{headline}</h2>
+        </div>
         
-        for i, guest in enumerate(all_guests, 1):
-            guest_name = guest.get('name', 'Desconhecido')
-            submitted_time = guest.get('submitted_at', '')
-            html_body += f"""
-                        <li style="padding: 8px 0; border-bottom: 1px solid #eee;">
-                            <span style="font-weight: bold; color: #667eea;">#{i}</span> 
-                            🎈 {guest_name}
-                            <span style="color: #6c757d; font-size: 0.9em; margin-left: 10px;">
-                                ({submitted_time[:10] if submitted_time else 'Data desconhecida'})
-                            </span>
-                        </li>
-            """
-        
-        html_body += """
-                    </ul>
-                </div>
-                
-                <div style="margin-top: 30px; padding: 15px; background-color: #e8f4f8; border-radius: 8px;">
-                    <p style="margin: 0; color: #0c63e4;">
-                        <strong>🎊 Detalhes da Festa:</strong><br>
-                        📅 27 de Julho, 2024 às 17:00<br>
-                        📍 Urbanização Quinta do Eucalipto nº4, 8005-227 Faro<br>
-                        👥 Total de Convidados: """ + str(len(all_guests)) + """
-                    </p>
-                </div>
+        <div style="padding: 20px;">{new_guests}
+            <h3 style="color: #667eea;">📝 Lista Atualizada de Convidados ({total_guests} pessoas):</h3>
+            <div style="background-color: #f8f9fa; padding: 15px; border-radius: 8px; border-left: 4px solid #667eea;">
+                <ul style="list-style: none; padding: 0;">{guest_rows}{hidden_guests}
+                </ul>
             </div>
             
-            <div style="text-align: center; padding: 20px; color: #6c757d; font-size: 0.9em;">
-                <p>Esta notificação foi enviada automaticamente quando alguém confirmou presença na Festa de Aniversário do Darius.</p>
+            <div style="margin-top: 30px; padding: 15px; background-color: #e8f4f8; border-radius: 8px;">
+                <p style="margin: 0; color: #0c63e4;">
+                    <strong>🎊 Detalhes da Festa:</strong><br>
+                    📅 {party_date}<br>
+                    📍 {address}<br>
+                    👥 Total de Convidados: {total_guests}
+                </p>
             </div>
-        </body>
-        </html>
-        """
-        
-        # Create plain text version
-        text_body = f"""
-        🎉 Nova Confirmação de Presença!
-        
-        {new_guest_name} confirmou presença na festa!
-        
-        📝 Lista Atualizada de Convidados ({len(all_guests)} pessoas):
-        """
-        
-        for i, guest in enumerate(all_guests, 1):
-            guest_name = guest.get('name', 'Desconhecido')
-            text_body += f"\n#{i} 🎈 {guest_name}"
+        </div>
         
-        text_body += f"""
-        
-        🎊 Detalhes da Festa:
-        📅 27 de Julho, 2024 às 17:00
-        📍 Urbanização Quinta do Eucalipto nº4, 8005-227 Faro
-        👥 Total de Convidados: {len(all_guests)}
-        
-        Esta notificação foi enviada automaticamente quando alguém confirmou presença na Festa de Aniversário do Darius.
-        """
-        
-        msg = Message(
-            subject=subject,
-            recipients=[notification_email],
-            body=text_body,
-            html=html_body
-        )
-        
-        # Send email in background thread
-        thread = threading.Thread(target=send_async_email, args=(app, msg))
-        thread.start()
+        <div style="text-align: center; padding: 20px; color: #6c757d; font-size: 0.9em;">
+            <p>Esta notificação foi enviada automaticamente quando alguém confirmou presença na {title}.</p>
+        </div>
+    </body>
+    </html>
+"""
+NOTIFICATION_HTML_NEW_GUESTS = """
+            <h3 style="color: #667eea;">✨ Novas confirmações:</h3>
+            <ul>{}
+            </ul>""".format
+NOTIFICATION_HTML_HIDDEN = """
+                    <li style="padding: 8px 0; color: #6c757d;">... e mais {} convidados</li>""".format
+
+NOTIFICATION_TEXT_TEMPLATE = """
+    🎉 Nova Confirmação de Presença!
+    
+    {headline}
+    {new_guests}
+    📝 Lista Atualizada de Convidados ({total_guests} pessoas):
+    {guest_rows}{hidden_guests}
+    
+    🎊 Detalhes da Festa:
+    📅 {party_date}
+    📍 {address}
+    👥 Total de Convidados: {total_guests}
+    
+    Esta notificação foi enviada automaticamente quando alguém confirmou presença na {title}.
+"""
+NOTIFICATION_TEXT_NEW_GUESTS = """
+    ✨ Novas confirmações:{}
+""".format
+NOTIFICATION_TEXT_HIDDEN = "\n... e mais {} convidados".format
+NOTIFICATION_HTML_ROW = ("""
+                    <li style="padding: 8px 0; border-bottom: 1px solid #eee;">
+                        <span style="font-weight: bold; color: #667eea;">#""", """</span> 
+                        🎈 """, """
+                        <span style="color: #6c757d; font-size: 0.9em; margin-left: 10px;">
+                            (""", """)
+                        </span>
+                    </li>""")
+NOTIFICATION_TEXT_ROW = ("\n#", " 🎈 ")
+NOTIFICATION_HTML_HEAD, NOTIFICATION_HTML_TAIL = (
+    part.format for part in NOTIFICATION_HTML_TEMPLATE.split('{guest_rows}'))
+NOTIFICATION_TEXT_HEAD, NOTIFICATION_TEXT_TAIL = (
+    part.format for part in NOTIFICATION_TEXT_TEMPLATE.split('{guest_rows}'))
+
+def format_party_date(party):
+    """'27 de Julho, 2024 às 17:00'"""
+    if not party.date:
+        return 'Data a confirmar'
+    time_label = party.time or party.date.strftime('%H:%M')
+    return f"{party.date.day} de {PT_MONTHS[party.date.month - 1]}, {party.date.year} às {time_label}"
+
+def render_notification_bodies(party, new_guest_names, guests, total_guests):
+    """Render (text, html) notification bodies in a single pass over `guests`"""
+    if len(new_guest_names) == 1:
+        headline = f"{new_guest_names[0]} confirmou presença!"
+    else:
+        headline = f"{len(new_guest_names)} novos convidados confirmaram presença!"
+    hidden_guests = total_guests - len(guests)
+    fields = {
+        'title': party.title,
+        'party_date': format_party_date(party),
+        'address': party.address,
+        'total_guests': total_guests
+    }
+
+    html_fields = {key: escape(str(value)) if value is not None else '' for key, value in fields.items()}
+    text_parts = [NOTIFICATION_TEXT_HEAD(
+        headline=headline,
+        new_guests=NOTIFICATION_TEXT_NEW_GUESTS(''.join([f"\n    🎈 {name}" for name in new_guest_names]))
+        if len(new_guest_names) > 1 else '',
+        **fields
+    )]
+    html_parts = [NOTIFICATION_HTML_HEAD(
+        headline=escape(headline),
+        new_guests=NOTIFICATION_HTML_NEW_GUESTS(''.join([f"""
+                <li>🎈 {escape(name)}</li>""" for name in new_guest_names]))
+        if len(new_guest_names) > 1 else '',
+        **html_fields
+    )]
+
+    add_text, add_html = text_parts.extend, html_parts.extend
+    text_0, text_1 = NOTIFICATION_TEXT_ROW
+    html_0, html_1, html_2, html_3 = NOTIFICATION_HTML_ROW
+    for i, guest in enumerate(guests, 1):
+        name = guest.get('name') or 'Desconhecido'
+        submitted_at = guest.get('submitted_at')
+        number = str(i)
+        add_text((text_0, number, text_1, name))
+        add_html((html_0, number, html_1, escape(name), html_2,
+                  submitted_at[:10] if submitted_at else 'Data desconhecida', html_3))
+
+    text_parts.append(NOTIFICATION_TEXT_TAIL(
+        hidden_guests=NOTIFICATION_TEXT_HIDDEN(hidden_guests) if hidden_guests > 0 else '',
+        **fields
+    ))
+    html_parts.append(NOTIFICATION_HTML_TAIL(
+        hidden_guests=NOTIFICATION_HTML_HIDDEN(hidden_guests) if hidden_guests > 0 else '',
+        **html_fields
+    ))
+    text_body, html_body = ''.join(text_parts), ''.join(html_parts)
+    return text_body, html_body
+
+def notification_email_allowed(address):
+    """Whether a party may have its notifications sent to `address` (PARTY_NOTIFICATION_EMAILS)"""
+    if not isinstance(address, str) or '@' not in address:
+        return False
+    address = address.strip().lower()
+    allowed = current_app.config['PARTY_NOTIFICATION_EMAILS']
+    return address in allowed or address[address.rindex('@'):] in allowed
+
+def notification_recipient(party):
+    """Address that gets a party's RSVP notifications: its own if allowed, else NOTIFICATION_EMAIL"""
+    if party.notification_email and notification_email_allowed(party.notification_email):
+        return party.notification_email
+    return os.getenv('NOTIFICATION_EMAIL')
+
+def build_notification_email(party, new_guest_names, all_guests, total_guests):
+    """Build the notification Message for newly confirmed guests.
+
+    `all_guests` may be capped at NOTIFICATION_GUEST_LIST_LIMIT entries;
+    `total_guests` is the real number of confirmed RSVPs.
+    """
+    notification_email = notification_recipient(party)
+    
+    if not notification_email:
+        logger.warning("Email de notificação não configurado")
+        return None
+    
+    if len(new_guest_names) == 1:
+        subject = f"🎉 Novo Convidado: {new_guest_names[0]} - {party.title}"
+    else:
+        subject = f"🎉 {len(new_guest_names)} Novos Convidados - {party.title}"
+    text_body, html_body = render_notification_bodies(party, new_guest_names, all_guests, total_guests)
+    
+    return mail.message(
+        subject=subject,
+        recipients=[notification_email],
+        body=text_body,
+        html=html_body
+    )
+
+def load_notification_guests(party_id, limit=None, session=None):
+    """Return (newest confirmed guests up to `limit` or the configured cap, total confirmed)"""
+    session = session or db.session
+    limit = limit or current_app.config['NOTIFICATION_GUEST_LIST_LIMIT']
+    guests = session.execute(
+        db.select(RSVP.name, RSVP.submitted_at)
+        .where(RSVP.party_id == party_id, RSVP.attending == 'yes')
+        .order_by(RSVP.submitted_at.desc())
+        .limit(limit)
+    ).all()
+    total = session.execute(
+        db.select(PartyCounter.attending_yes).where(PartyCounter.party_id == party_id)
+    ).scalar()
+    guest_list = [{'name': name, 'submitted_at': submitted_at.isoformat() if submitted_at else None}
+                  for name, submitted_at in guests]
+    return guest_list, total or len(guest_list)
+
+def notify_guest_confirmed(party, rsvp_id, name, session=None):
+    """Queue the notification for a new 'yes' RSVP inside the current transaction"""
+    notification_email = notification_recipient(party)
+    if not notification_email:
+        logger.warning("Email de notificação não configurado")
+        return
+    
+    try:
+        window = current_app.config['NOTIFICATION_DIGEST_SECONDS']
+        if window > 0:
+            schedule_notification_digest(party.id, rsvp_id, notification_email, window, session)
+            return
         
-    except Exception as e:
-        print(f"❌ Erro ao criar email de notificação: {e}")
+        guest_list, total = load_notification_guests(party.id, session=session)
+        msg = build_notification_email(party, [name], guest_list, total)
+        if msg:
+            email_queue.enqueue(msg, party.id, session)
+    except Exception:
+        logger.exception("Erro ao criar email de notificação")
+
+def schedule_notification_digest(party_id, rsvp_id, notification_email, window, session=None):
+    """Open a digest window for the party unless one is already waiting to be sent"""
+    session = session or db.session
+    pending = session.execute(
+        db.select(EmailOutbox.id).where(
+            EmailOutbox.party_id == party_id,
+            EmailOutbox.kind == 'digest',
+            EmailOutbox.status == 'pending',
+            EmailOutbox.attempts == 0
+        ).limit(1)
+    ).scalar()
+    if pending:
+        return
+    
+    session.add(EmailOutbox(
+        party_id=party_id,
+        kind='digest',
+        subject='Resumo de novos convidados',
+        recipients=notification_email,
+        next_attempt_at=utcnow() + timedelta(seconds=window),
+        digest_after_id=rsvp_id - 1
+    ))
+    session.info['email_enqueued'] = True
+
+def render_notification_digest(item, limit=None, session=None):
+    """Fill in a digest row from the RSVPs confirmed since its window opened.
+
+    Returns False when nobody from the window is still confirmed.
+    """
+    session = session or db.session
+    rows = session.execute(
+        db.select(RSVP.id, RSVP.name).where(
+            RSVP.party_id == item.party_id,
+            RSVP.attending == 'yes',
+            RSVP.id > (item.digest_after_id or 0)
+        ).order_by(RSVP.id)
+    )
+    # One entry per guest, with its latest name, however often it changed in the window
+    new_guests = list({rsvp_id: name for rsvp_id, name in rows}.values())
+    if not new_guests:
+        return False
+    
+    guest_list, total = load_notification_guests(item.party_id, limit, session)
+    party = session.get(Party, item.party_id)
+    msg = build_notification_email(party, new_guests, guest_list, total)
+    if not msg:
+        return False
+    item.subject, item.body, item.html = msg.subject, msg.body, msg.html
+    return True
+
+# Instrumentation
+class Histogram:
+    """Prometheus-style histogram with fixed upper bounds"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+class RequestMetrics:
+    """Per-endpoint latency and SQL counters for this worker process"""
+
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.queries = {}
+        self.query_seconds = {}
+        self.responses = Counter()
+
+    def observe(self, endpoint, method, status, seconds, query_count, query_seconds):
+        key = (endpoint, method)
+        with self._lock:
+            if key not in self.latency:
+                self.latency[key] = Histogram(self.LATENCY_BUCKETS)
+                self.queries[key] = Histogram(self.QUERY_BUCKETS)
+                self.query_seconds[key] = 0.0
+            self.latency[key].observe(seconds)
+            self.queries[key].observe(query_count)
+            self.query_seconds[key] += query_seconds
+            self.responses[(endpoint, method, status)] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines += ['# HELP http_request_duration_seconds Request latency per endpoint',
+                      '# TYPE http_request_duration_seconds histogram']
+            for (endpoint, method), histogram in sorted(self.latency.items()):
+                lines += histogram.render('http_request_duration_seconds', f'endpoint="{endpoint}",method="{method}"')
+            lines += ['# HELP http_responses_total Responses per endpoint and status code',
+                      '# TYPE http_responses_total counter']
+            for (endpoint, method, status), count in sorted(self.responses.items()):
+                lines.append(f'http_responses_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+            lines += ['# HELP db_queries_per_request SQL statements issued per request',
+                      '# TYPE db_queries_per_request histogram']
+            for (endpoint, method), histogram in sorted(self.queries.items()):
+                lines += histogram.render('db_queries_per_request', f'endpoint="{endpoint}",method="{method}"')
+            lines += ['# HELP db_query_duration_seconds_total Time spent executing SQL per endpoint',
+                      '# TYPE db_query_duration_seconds_total counter']
+            for (endpoint, method), seconds in sorted(self.query_seconds.items()):
+                lines.append(f'db_query_duration_seconds_total{{endpoint="{endpoint}",method="{method}"}} {seconds:.6f}')
+        return lines
+
+request_metrics = RequestMetrics()
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if has_request_context() and 'query_count' in g:
+        g.query_count += 1
+        g.query_seconds += elapsed
+        if g.query_statements is not None:
+            g.query_statements[statement] += 1
+
+@api.before_app_request
+def _start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.query_count = 0
+    g.query_seconds = 0.0
+    g.query_statements = Counter() if current_app.config['N_PLUS_ONE_THRESHOLD'] else None
+
+@api.after_app_request
+def _record_request_metrics(response):
+    if 'request_start' not in g:
+        return response
+    endpoint = current_endpoint() or 'unmatched'
+    duration = time.perf_counter() - g.request_start
+    request_metrics.observe(endpoint, request.method, response.status_code,
+                            duration, g.query_count, g.query_seconds)
+    logger.info("request", extra={
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 2),
+        'queries': g.query_count
+    })
+
+    threshold = current_app.config['N_PLUS_ONE_THRESHOLD']
+    if threshold and g.query_statements:
+        statement, count = g.query_statements.most_common(1)[0]
+        if count >= threshold:
+            logger.warning("Possível N+1", extra={'endpoint': endpoint, 'repeats': count,
+                                                  'statement': ' '.join(statement.split())[:200]})
+    return response
 
 # Regular Routes
-@app.route('/api/health')
+@api.route('/api/health')
 def health_check():
     return jsonify({
         'status': 'OK',
         'message': 'API da Festa de Aniversário está funcionando',
         'version': '1.0.0',
         'email_configured': bool(os.getenv('MAIL_USERNAME')),
-        'database_type': 'PostgreSQL' if 'postgresql' in app.config['SQLALCHEMY_DATABASE_URI'] else 'SQLite'
+        'database_type': 'PostgreSQL' if 'postgresql' in current_app.config['SQLALCHEMY_DATABASE_URI'] else 'SQLite'
     })
 
-@app.route('/api/party', methods=['GET'])
+PARTY_FIELDS = ('title', 'description', 'date', 'time', 'address', 'max_guests', 'is_active',
+                'rsvp_deadline', 'contact_email', 'contact_phone', 'notification_email')
+PARTY_PAGE_MAX = 500
+
+@api.route('/api/parties', methods=['GET'])
+def list_parties():
+    """Parties by id, `limit` (default 100) at a time; the next page starts after X-Next-Cursor"""
+    limit = max(1, min(request.args.get('limit', 100, type=int), PARTY_PAGE_MAX))
+    query = party_rows_query().order_by(Party.id).limit(limit + 1)
+    after = request.args.get('cursor', type=int)
+    if after is not None:
+        query = query.where(Party.id > after)
+    if request.args.get('active') == 'true':
+        query = query.where(Party.is_active.is_(True))
+    parties = [PartyRow(*row) for row in db.session.execute(query)]
+
+    response = jsonify([party.to_dict() for party in parties[:limit]])
+    if len(parties) > limit:
+        response.headers['X-Next-Cursor'] = str(parties[limit - 1].id)
+    return response
+
+@api.route('/api/parties', methods=['POST'])
+def create_party():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('title'):
+        return jsonify({'error': 'Campos obrigatórios em falta'}), 400
+    unknown = sorted(set(data) - set(PARTY_FIELDS))
+    if unknown:
+        return jsonify({'error': f'Campos desconhecidos: {", ".join(unknown)}'}), 400
+    if data.get('notification_email') and not notification_email_allowed(data['notification_email']):
+        return jsonify({'error': 'Email de notificação não permitido'}), 400
+
+    values = dict(data)
+    try:
+        for field in ('date', 'rsvp_deadline'):
+            if values.get(field):
+                values[field] = datetime.fromisoformat(values[field])
+        if 'max_guests' in values:
+            values['max_guests'] = int(values['max_guests'])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Data ou número de convidados inválido'}), 400
+
+    party = Party(**values)
+    db.session.add(party)
+    db.session.flush()
+    rebuild_party_counter(party.id)
+    db.session.commit()
+    logger.info("Party created", extra={'party_id': party.id})
+    return jsonify(party.to_dict()), 201
+
+@api.route('/api/party', methods=['GET'])
+@api.route('/api/parties/<int:party_id>', methods=['GET'])
 def get_party():
-    party = Party.query.filter_by(is_active=True).first()
+    party = get_request_party()
     if not party:
+        if request_party_id() is not None:
+            return jsonify({'error': 'Festa não encontrada'}), 404
         party = Party()
         db.session.add(party)
         db.session.commit()
     return jsonify(party.to_dict())
 
-@app.route('/api/party/stats', methods=['GET'])
+@api.route('/api/party/stats', methods=['GET'])
+@api.route('/api/parties/<int:party_id>/stats', methods=['GET'])
 def get_party_stats():
-    party = Party.query.filter_by(is_active=True).first()
+    party = get_request_party()
     if not party:
         return jsonify({'error': 'Festa não encontrada'}), 404
     
-    total_rsvps = RSVP.query.filter_by(party_id=party.id).count()
-    attending = RSVP.query.filter_by(party_id=party.id, attending='yes').all()
-    total_attending = sum(r.number_of_guests for r in attending)
+    stats = get_cached_party_stats(party.id)
     
     return jsonify({
-        'total_rsvps': total_rsvps,
-        'total_attending': total_attending,
+        **stats,
         'max_guests': party.max_guests,
-        'available_spots': max(0, party.max_guests - total_attending),
+        'available_spots': max(0, party.max_guests - stats['total_attending']),
         'is_rsvp_open': party.is_rsvp_open
     })
 
-@app.route('/api/rsvp', methods=['POST'])
+@api.route('/api/rsvp', methods=['POST'])
+@api.route('/api/parties/<int:party_id>/rsvp', methods=['POST'])
 def submit_rsvp():
     try:
         data = request.get_json()
-        print(f"📝 New RSVP submission: {data}")
         
         # Validate required fields
         if not all(k in data for k in ['name', 'email', 'attending', 'number_of_guests']):
             return jsonify({'error': 'Campos obrigatórios em falta'}), 400
         
-        party = Party.query.filter_by(is_active=True).first()
+        try:
+            number_of_guests = int(data['number_of_guests'])
+        except (TypeError, ValueError):
+            number_of_guests = 0
+        if number_of_guests < 1:
+            return jsonify({'error': 'Número de convidados inválido'}), 400
+        
+        party = get_request_party()
         if not party:
             return jsonify({'error': 'Festa não encontrada'}), 404
         
-        # Check if already exists
-        existing = RSVP.query.filter_by(email=data['email'], party_id=party.id).first()
-        if existing:
-            print(f"⚠️ Duplicate RSVP attempt for email: {data['email']}")
+        # Insert, or get the existing RSVP back, in one statement guarded by uq_rsvps_party_email
+        values = {
+            'party_id': party.id,
+            'name': data['name'],
+            'email': data['email'],
+            'phone': data.get('phone', ''),
+            'attending': data['attending'],
+            'number_of_guests': number_of_guests,
+            'dietary_restrictions': data.get('dietary_restrictions', ''),
+            'message': data.get('message', ''),
+            'confirmation_code': generate_confirmation_code(),
+            'submitted_at': utcnow()
+        }
+        rsvp_id, confirmation_code, created = insert_rsvp(values)
+        if not created:
+            db.session.rollback()
+            logger.info("Duplicate RSVP attempt", extra={'confirmation_code': confirmation_code})
             return jsonify({
                 'error': 'Você já confirmou presença para esta festa',
-                'confirmation_code': existing.confirmation_code
+                'confirmation_code': confirmation_code
             }), 400
         
-        # Create RSVP
-        rsvp = RSVP(
-            party_id=party.id,
-            name=data['name'],
-            email=data['email'],
-            phone=data.get('phone', ''),
-            attending=data['attending'],
-            number_of_guests=data['number_of_guests'],
-            dietary_restrictions=data.get('dietary_restrictions', ''),
-            message=data.get('message', '')
-        )
+        if data['attending'] == 'yes':
+            # Conditional UPDATE on the party's counter row: only succeeds if the guests fit
+            if not reserve_guest_spots(party.id, number_of_guests):
+                db.session.rollback()
+                available = max(0, (party.max_guests or 0) - get_party_counter(party.id).total_attending)
+                return jsonify({
+                    'error': 'Não há lugares suficientes disponíveis',
+                    'available_spots': available
+                }), 409
+            # Queue notification email with updated guest list in the same transaction
+            notify_guest_confirmed(party, rsvp_id, data['name'])
+        else:
+            touch_guest_list(party.id, 1, data['attending'], number_of_guests)
+        queue_guest_event(party.id, 'add', serialize_guest_row(
+            [rsvp_id, *(values.get(field) for field in GUEST_FIELDS[1:])], GUEST_FIELDS
+        ), data['attending'])
         
-        db.session.add(rsvp)
         db.session.commit()
-        print(f"✅ RSVP saved successfully: {rsvp.name} - {rsvp.confirmation_code}")
-        
-        # Send notification email with updated guest list
-        if data['attending'] == 'yes':
-            all_guests = RSVP.query.filter_by(party_id=party.id, attending='yes').order_by(RSVP.submitted_at.desc()).all()
-            guest_list = [guest.to_dict() for guest in all_guests]
-            print(f"📧 Sending notification email for new guest: {data['name']}")
-            send_notification_email(data['name'], guest_list)
+        issued_codes.add([confirmation_code])
+        logger.info("RSVP saved", extra={'confirmation_code': confirmation_code, 'attending': data['attending'],
+                                          'number_of_guests': number_of_guests})
         
         return jsonify({
             'message': 'Presença confirmada com sucesso',
-            'confirmation_code': rsvp.confirmation_code
+            'confirmation_code': confirmation_code
         }), 201
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error submitting RSVP: {e}")
+        logger.exception("Error submitting RSVP")
         return jsonify({'error': f'Falha ao confirmar presença: {str(e)}'}), 500
 
-@app.route('/api/rsvp/<confirmation_code>', methods=['GET'])
+@api.route('/api/rsvp/<confirmation_code>', methods=['GET'])
+@api.route('/api/parties/<int:party_id>/rsvp/<confirmation_code>', methods=['GET'])
+@rate_limited
 def get_rsvp(confirmation_code):
-    rsvp = RSVP.query.filter_by(confirmation_code=confirmation_code).first()
-    if not rsvp:
+    confirmation_code = normalize_confirmation_code(confirmation_code)
+    if confirmation_code is None or not issued_codes.might_contain(confirmation_code):
         return jsonify({'error': 'Confirmação não encontrada'}), 404
-    return jsonify({
-        'rsvp': rsvp.to_dict(),
-        'party': rsvp.party.to_dict()
-    })
+    # A cached entry is only good at the guests_version it was cached at
+    party_id = confirmation_cache.party_of(confirmation_code)
+    version = get_guest_list_version(party_id) if party_id is not None else None
+    cached = confirmation_cache.get(confirmation_code, version)
+    if cached is None:
+        # Core row and the cached party: no RSVP object, no lazy load of rsvp.party
+        row = db.session.execute(scope_to_request_party(rsvp_lookup_query(confirmation_code))).first()
+        if not row:
+            return jsonify({'error': 'Confirmação não encontrada'}), 404
+        cached = confirmation_cache.put(confirmation_code, row.party_id, row.guests_version,
+                                        compact_json_encoder()(serialize_guest_row(row, GUEST_FIELDS)))
+    party_id, encoded_rsvp = cached
+    if request_party_id() not in (None, party_id):
+        return jsonify({'error': 'Confirmação não encontrada'}), 404
+    return confirmation_response(get_cached_party(party_id), encoded_rsvp)
 
-@app.route('/api/guests', methods=['GET'])
+@api.route('/api/guests', methods=['GET'])
+@api.route('/api/parties/<int:party_id>/guests', methods=['GET'])
 def get_guests():
-    party = Party.query.filter_by(is_active=True).first()
+    """List guests, newest first.
+
+    Optional query parameters:
+      fields    comma separated subset of GUEST_FIELDS (default: all)
+      attending only return guests with this attending status
+      limit     page size; enables keyset pagination, next page in X-Next-Cursor
+      cursor    value of X-Next-Cursor from the previous page
+    """
+    party = get_request_party()
     if not party:
         return jsonify({'error': 'Festa não encontrada'}), 404
-    
-    guests = RSVP.query.filter_by(party_id=party.id).order_by(RSVP.submitted_at.desc()).all()
-    print(f"📊 Retrieved {len(guests)} total guests from database")
-    
-    guest_data = [guest.to_dict() for guest in guests]
-    return jsonify(guest_data)
 
-@app.route('/api/clear-guests', methods=['DELETE'])
+    fields, unknown = parse_guest_fields()
+    if unknown:
+        return jsonify({'error': f'Campos desconhecidos: {", ".join(unknown)}'}), 400
+
+    attending = request.args.get('attending')
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit', type=int)
+    if limit is not None:
+        limit = max(1, min(limit, GUEST_PAGE_MAX))
+
+    # The version only changes when the party's guest list is written, so an
+    # unchanged list is answered without touching the rsvps table.
+    version = get_guest_list_version(party.id)
+    variant = f"{','.join(fields)}|{attending or ''}|{limit or ''}|{cursor or ''}"
+    etag = f"{party.id}-{version}-{hashlib.sha1(variant.encode()).hexdigest()[:12]}"
+    # Compressed snapshots carry their encoding in the ETag (<etag>-gzip)
+    for tag in (etag, *(f'{etag}-{encoding}' for encoding in COMPRESS_ENCODINGS)):
+        if tag in request.if_none_match:
+            response = current_app.response_class(status=304)
+            response.set_etag(tag)
+            return response
+
+    whole_list = fields == GUEST_FIELDS and not (attending or cursor or limit)
+    encoding = whole_list and request.accept_encodings.best_match(COMPRESS_ENCODINGS)
+    if encoding:
+        snapshot = guest_snapshots.get(party.id, version)
+        if snapshot is not None:
+            response = current_app.response_class(snapshot[encoding], mimetype='application/json')
+            response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            response.set_etag(f'{etag}-{encoding}')
+            return response
+
+    query = guest_list_query(party.id, fields, attending)
+    if cursor:
+        position = decode_guest_cursor(cursor)
+        if position is None:
+            return jsonify({'error': 'Cursor inválido'}), 400
+        submitted_at, guest_id = position
+        query = query.where(db.or_(
+            RSVP.submitted_at < submitted_at,
+            db.and_(RSVP.submitted_at == submitted_at, RSVP.id < guest_id)
+        ))
+
+    if limit is None:
+        # Whole list: stream it instead of building one payload
+        response = stream_json(json_array_chunks(encode_guest_rows(query, fields)))
+        response.set_etag(etag)
+        if whole_list:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_guest_cursor(rows[-1].submitted_at, rows[-1].id)
+
+    response = jsonify([serialize_guest_row(row, fields) for row in rows])
+    response.set_etag(etag)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@api.route('/api/guests/bulk', methods=['POST'])
+@api.route('/api/parties/<int:party_id>/guests/bulk', methods=['POST'])
+def import_guests():
+    """Import guests from a CSV (text/csv) or NDJSON (application/x-ndjson) body.
+
+    Columns/keys are the GUEST_FIELDS names; name, email and attending are
+    required. Rows are inserted in batches of BULK_IMPORT_BATCH_SIZE, each
+    committed on its own, and every rejected row is reported with its line.
+    max_guests is not enforced (see insert_bulk_batch).
+    """
+    party = get_request_party()
+    if not party:
+        return jsonify({'error': 'Festa não encontrada'}), 404
+    if request.mimetype not in ('text/csv', 'application/x-ndjson', 'application/jsonl'):
+        return jsonify({'error': 'Use text/csv ou application/x-ndjson'}), 415
+
+    batch_size = current_app.config['BULK_IMPORT_BATCH_SIZE']
+    inserted = 0
+    errors = []
+    batch = []
+    try:
+        for line, row in read_bulk_rows(request.stream, request.mimetype):
+            try:
+                batch.append((line, validate_bulk_row(row, party.id)))
+            except ValueError as e:
+                errors.append({'line': line, 'error': str(e)})
+            if len(batch) >= batch_size:
+                skipped = insert_bulk_batch(party.id, batch)
+                inserted += len(batch) - len(skipped)
+                errors.extend({'line': line, 'error': 'Email ou código de confirmação já existe'} for line in skipped)
+                batch = []
+        if batch:
+            skipped = insert_bulk_batch(party.id, batch)
+            inserted += len(batch) - len(skipped)
+            errors.extend({'line': line, 'error': 'Email ou código de confirmação já existe'} for line in skipped)
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Bulk import failed", extra={'inserted': inserted})
+        return jsonify({'error': f'Falha na importação: {str(e)}', 'inserted': inserted}), 500
+
+    errors.sort(key=lambda error: error['line'])
+    logger.info("Bulk import", extra={'inserted': inserted, 'rejected': len(errors)})
+    return jsonify({
+        'inserted': inserted,
+        'rejected': len(errors),
+        'errors': errors
+    }), 200
+
+@api.route('/api/guests/export', methods=['GET'])
+@api.route('/api/parties/<int:party_id>/guests/export', methods=['GET'])
+def export_guests():
+    """Stream every guest of the active party, oldest first.
+
+    format=csv (default) or ndjson; fields= as in /api/guests. Rows are fetched
+    STREAM_BATCH_SIZE at a time (a server-side cursor on PostgreSQL), so memory
+    stays flat however large the list is.
+    """
+    party = get_request_party()
+    if not party:
+        return jsonify({'error': 'Festa não encontrada'}), 404
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Formato inválido, use csv ou ndjson'}), 400
+    fields, unknown = parse_guest_fields()
+    if unknown:
+        return jsonify({'error': f'Campos desconhecidos: {", ".join(unknown)}'}), 400
+
+    query = (
+        db.select(*(getattr(RSVP, f) for f in fields))
+        .where(RSVP.party_id == party.id)
+        .order_by(RSVP.submitted_at, RSVP.id)
+        .execution_options(yield_per=current_app.config['STREAM_BATCH_SIZE'])
+    )
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if export_format == 'csv':
+            writer.writerow(fields)
+        for rows in db.session.execute(query).partitions():
+            if export_format == 'csv':
+                writer.writerows(
+                    [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+                )
+            else:
+                buffer.writelines(json.dumps(serialize_guest_row(row, fields), ensure_ascii=False) + '\n'
+                                  for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    response = current_app.response_class(
+        stream_with_context(generate()),
+        mimetype='text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=guests.{export_format}'
+    return response
+
+@api.route('/api/guests/stream', methods=['GET'])
+@api.route('/api/parties/<int:party_id>/guests/stream', methods=['GET'])
+def stream_guests():
+    """Live guest list as Server-Sent Events.
+
+    Takes the fields= and attending= parameters of /api/guests. The stream
+    opens with a `snapshot` event (the same array /api/guests returns) and
+    then carries `add`, `update` (id plus changed fields), `delete` (id) and
+    `clear` events; a later `snapshot` replaces the whole list. Events can
+    repeat a change the snapshot already includes, so clients apply them by id.
+    """
+    party = get_request_party()
+    if not party:
+        return jsonify({'error': 'Festa não encontrada'}), 404
+    fields, unknown = parse_guest_fields()
+    if unknown:
+        return jsonify({'error': f'Campos desconhecidos: {", ".join(unknown)}'}), 400
+    if 'id' not in fields:
+        fields = ('id',) + fields  # events are applied by id
+    attending = request.args.get('attending')
+
+    # Subscribe before reading the snapshot so no change falls in between
+    subscriber = guest_events.subscribe(party.id, fields, attending)
+    if subscriber is None:
+        response = jsonify({'error': 'Demasiadas ligações, tente novamente mais tarde'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    guest_events.observe(party.id, get_guest_list_version(party.id))
+    query = guest_list_query(party.id, fields, attending)
+    app = current_app._get_current_object()
+
+    def generate():
+        yield 'retry: 3000\n\n'
+        # Only the snapshot needs the app context; an idle stream holds no
+        # context and no database connection
+        with app.app_context():
+            yield 'event: snapshot\ndata: '
+            yield from json_array_chunks(encode_guest_rows(query, fields))
+        yield '\n\n'
+        while True:
+            message = guest_events.next_message(subscriber)
+            if message is guest_events.CLOSE:
+                return
+            yield message if message is not None else ': keepalive\n\n'
+
+    response = current_app.response_class(generate(), mimetype='text/event-stream')
+    # On close, not in the generator: a HEAD request or a client gone before the
+    # first read never starts the generator, but the server always closes the response
+    response.call_on_close(lambda: guest_events.unsubscribe(subscriber))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@api.route('/api/clear-guests', methods=['DELETE'])
+@api.route('/api/parties/<int:party_id>/clear-guests', methods=['DELETE'])
 def clear_guests():
     try:
-        party = Party.query.filter_by(is_active=True).first()
+        party = get_request_party()
         if not party:
             return jsonify({'error': 'Festa não encontrada'}), 404
         
         # Delete all RSVP records for this party
         deleted_count = RSVP.query.filter_by(party_id=party.id).delete()
+        mark_stale_confirmations(party_id=party.id)
+        touch_guest_list(party.id, reset=True)
+        queue_guest_event(party.id, 'clear')
         db.session.commit()
+        issued_codes.discard(deleted_count)
         
-        print(f"✅ {deleted_count} convidados removidos da lista")
+        logger.info("Lista de convidados limpa", extra={'deleted_count': deleted_count})
         return jsonify({
             'message': f'Lista de convidados limpa com sucesso. {deleted_count} registros removidos.',
             'deleted_count': deleted_count
@@ -367,10 +2891,10 @@ def clear_guests():
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Erro ao limpar lista: {e}")
+        logger.exception("Erro ao limpar lista")
         return jsonify({'error': f'Falha ao limpar lista de convidados: {str(e)}'}), 500
 
-@app.route('/api/test-email', methods=['GET'])
+@api.route('/api/test-email', methods=['GET'])
 def test_email():
     """Test email configuration"""
     try:
@@ -378,10 +2902,11 @@ def test_email():
         mail_username = os.getenv('MAIL_USERNAME')
         mail_password = os.getenv('MAIL_PASSWORD')
         
-        print(f"🔧 Testing email configuration:")
-        print(f"📧 MAIL_USERNAME: {mail_username}")
-        print(f"📧 NOTIFICATION_EMAIL: {notification_email}")
-        print(f"🔑 MAIL_PASSWORD: {'SET' if mail_password else 'NOT SET'}")
+        logger.info("Testing email configuration", extra={
+            'mail_username_set': bool(mail_username),
+            'notification_email_set': bool(notification_email),
+            'mail_password_set': bool(mail_password)
+        })
         
         if not notification_email:
             return jsonify({'error': 'NOTIFICATION_EMAIL not configured'}), 400
@@ -389,16 +2914,15 @@ def test_email():
         if not mail_username or not mail_password:
             return jsonify({'error': 'MAIL_USERNAME or MAIL_PASSWORD not configured'}), 400
             
-        msg = Message(
+        msg = mail.message(
             subject="🎉 Test Email from Birthday Party App",
             recipients=[notification_email],
             body="This is a test email from your birthday party app. If you receive this, email is working correctly!",
             sender=mail_username
         )
         
-        print(f"📤 Attempting to send test email to: {notification_email}")
         mail.send(msg)
-        print(f"✅ Test email sent successfully!")
+        logger.info("Test email sent")
         
         return jsonify({
             'message': 'Test email sent successfully',
@@ -408,15 +2932,20 @@ def test_email():
         
     except Exception as e:
         error_msg = f'Failed to send test email: {str(e)}'
-        print(f"❌ {error_msg}")
+        logger.exception("Failed to send test email")
         return jsonify({'error': error_msg}), 500
 
 # Individual guest management
-@app.route('/api/guest/<confirmation_code>', methods=['PUT'])
+@api.route('/api/guest/<confirmation_code>', methods=['PUT'])
+@api.route('/api/parties/<int:party_id>/guest/<confirmation_code>', methods=['PUT'])
+@rate_limited
 def update_guest(confirmation_code):
     """Update a specific guest's information"""
+    confirmation_code = normalize_confirmation_code(confirmation_code)
+    if confirmation_code is None or not issued_codes.might_contain(confirmation_code):
+        return jsonify({'error': 'Guest not found'}), 404
     try:
-        guest = RSVP.query.filter_by(confirmation_code=confirmation_code).first()
+        guest = scope_to_request_party(RSVP.query.filter_by(confirmation_code=confirmation_code)).first()
         if not guest:
             return jsonify({'error': 'Guest not found'}), 404
         
@@ -429,9 +2958,12 @@ def update_guest(confirmation_code):
         if 'phone' in data:
             guest.phone = data['phone']
         
+        touch_guest_list(guest.party_id)
+        queue_guest_event(guest.party_id, 'update', {'id': guest.id, 'name': guest.name, 'phone': guest.phone},
+                          guest.attending)
         db.session.commit()
         
-        print(f"✅ Guest updated: {old_name} → {guest.name}")
+        logger.info("Guest updated", extra={'confirmation_code': confirmation_code})
         return jsonify({
             'message': f'Guest updated successfully',
             'old_name': old_name,
@@ -441,22 +2973,30 @@ def update_guest(confirmation_code):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error updating guest: {e}")
+        logger.exception("Error updating guest")
         return jsonify({'error': f'Failed to update guest: {str(e)}'}), 500
 
-@app.route('/api/guest/<confirmation_code>', methods=['DELETE'])
+@api.route('/api/guest/<confirmation_code>', methods=['DELETE'])
+@api.route('/api/parties/<int:party_id>/guest/<confirmation_code>', methods=['DELETE'])
+@rate_limited
 def delete_guest(confirmation_code):
     """Delete a specific guest by confirmation code"""
+    confirmation_code = normalize_confirmation_code(confirmation_code)
+    if confirmation_code is None or not issued_codes.might_contain(confirmation_code):
+        return jsonify({'error': 'Guest not found'}), 404
     try:
-        guest = RSVP.query.filter_by(confirmation_code=confirmation_code).first()
+        guest = scope_to_request_party(RSVP.query.filter_by(confirmation_code=confirmation_code)).first()
         if not guest:
             return jsonify({'error': 'Guest not found'}), 404
         
         guest_name = guest.name
         db.session.delete(guest)
+        touch_guest_list(guest.party_id, -1, guest.attending, guest.number_of_guests)
+        queue_guest_event(guest.party_id, 'delete', {'id': guest.id}, guest.attending)
         db.session.commit()
+        issued_codes.discard()
         
-        print(f"✅ Guest deleted: {guest_name} - {confirmation_code}")
+        logger.info("Guest deleted", extra={'confirmation_code': confirmation_code})
         return jsonify({
             'message': f'Guest {guest_name} removed successfully',
             'deleted_guest': guest_name,
@@ -465,52 +3005,189 @@ def delete_guest(confirmation_code):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error deleting guest: {e}")
+        logger.exception("Error deleting guest")
         return jsonify({'error': f'Failed to delete guest: {str(e)}'}), 500
 
+GUEST_BATCH_MAX = 1000
+
+@api.route('/api/guests/batch', methods=['POST'])
+@api.route('/api/parties/<int:party_id>/guests/batch', methods=['POST'])
+@rate_limited
+def batch_update_guests():
+    """Update and delete many guests by confirmation code in one transaction.
+
+    Body: {"operations": [{"op": "update", "confirmation_code": "...", "name": "...", "phone": "..."},
+                          {"op": "delete", "confirmation_code": "..."}]}
+
+    All updates run as one UPDATE ... SET name = CASE confirmation_code ...
+    WHERE confirmation_code IN (...) and all deletes as one DELETE ... IN (...).
+    Every operation gets a result: updated, deleted, not_found or invalid.
+    """
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+    if len(operations) > GUEST_BATCH_MAX:
+        return jsonify({'error': f'At most {GUEST_BATCH_MAX} operations per batch'}), 400
+
+    results = []
+    updates = {}
+    deletes = {}
+    for index, item in enumerate(operations):
+        result = {'index': index}
+        results.append(result)
+        if not isinstance(item, dict) or item.get('op') not in ('update', 'delete'):
+            result.update(status='invalid', error='op must be update or delete')
+            continue
+        result['op'] = item['op']
+        code = normalize_confirmation_code(str(item.get('confirmation_code') or ''))
+        result['confirmation_code'] = code or item.get('confirmation_code')
+        if code is None or not issued_codes.might_contain(code):
+            result['status'] = 'not_found'
+        elif code in updates or code in deletes:
+            result.update(status='invalid', error='confirmation_code appears more than once')
+        elif item['op'] == 'delete':
+            deletes[code] = result
+        elif not ('name' in item or 'phone' in item):
+            result.update(status='invalid', error='nothing to update')
+        elif 'name' in item and not item['name']:
+            result.update(status='invalid', error='name cannot be empty')
+        else:
+            updates[code] = (result, item)
+
+    events = []
+    try:
+        codes = list(updates) + list(deletes)
+        found = {
+            row.confirmation_code: row for row in db.session.execute(
+                scope_to_request_party(
+                    db.select(RSVP.confirmation_code, RSVP.id, RSVP.party_id, RSVP.attending, RSVP.number_of_guests)
+                    .where(RSVP.confirmation_code.in_(codes))
+                )
+            )
+        } if codes else {}
+        for code in codes:
+            if code not in found:
+                (updates.pop(code)[0] if code in updates else deletes.pop(code))['status'] = 'not_found'
+
+        if updates:
+            values = {}
+            for column in ('name', 'phone'):
+                changes = {code: item[column] for code, (_, item) in updates.items() if column in item}
+                if changes:
+                    values[column] = db.case(changes, value=RSVP.confirmation_code, else_=getattr(RSVP, column))
+            db.session.execute(
+                db.update(RSVP).where(RSVP.confirmation_code.in_(list(updates))).values(**values),
+                execution_options={'synchronize_session': False}
+            )
+            mark_stale_confirmations(list(updates))
+            for party_id in {found[code].party_id for code in updates}:
+                touch_guest_list(party_id)
+            for code, (_, item) in updates.items():
+                guest = found[code]
+                changes = {column: item[column] for column in ('name', 'phone') if column in item}
+                events.append((guest.party_id, 'update', {'id': guest.id, **changes}, guest.attending))
+            for result, _ in updates.values():
+                result['status'] = 'updated'
+
+        if deletes:
+            db.session.execute(
+                db.delete(RSVP).where(RSVP.confirmation_code.in_(list(deletes))),
+                execution_options={'synchronize_session': False}
+            )
+            mark_stale_confirmations(list(deletes))
+            removed = Counter((found[code].party_id, found[code].attending, found[code].number_of_guests)
+                              for code in deletes)
+            for (party_id, attending, number_of_guests), count in removed.items():
+                touch_guest_list(party_id, -count, attending, number_of_guests)
+            for code in deletes:
+                guest = found[code]
+                events.append((guest.party_id, 'delete', {'id': guest.id}, guest.attending))
+            for result in deletes.values():
+                result['status'] = 'deleted'
+
+        # Large batches: one new snapshot instead of more events than the stream buffers hold
+        if len(events) > current_app.config['GUEST_STREAM_BUFFER'] // 2:
+            for party_id in {party_id for party_id, *_ in events}:
+                queue_guest_event(party_id, 'snapshot')
+        else:
+            for party_id, kind, data, attending in events:
+                queue_guest_event(party_id, kind, data, attending)
+        db.session.commit()
+        if deletes:
+            issued_codes.discard(len(deletes))
+
+    except Exception as e:
+        db.session.rollback()
+        logger.exception("Error in guest batch")
+        return jsonify({'error': f'Failed to apply batch: {str(e)}'}), 500
+
+    summary = Counter(result['status'] for result in results)
+    logger.info("Guest batch", extra={'operations': len(results), **summary})
+    return jsonify({'summary': dict(summary), 'results': results}), 200
+
 # DEBUG ENDPOINTS - New additions for troubleshooting
-@app.route('/api/debug/all-guests', methods=['GET'])
+@api.route('/api/debug/all-guests', methods=['GET'])
+@api.route('/api/parties/<int:party_id>/debug/all-guests', methods=['GET'])
 def get_all_guests_debug():
-    """Debug endpoint to see ALL guests regardless of attending status"""
+    """Debug endpoint to see ALL guests regardless of attending status.
+
+    Streamed: guests_by_status is read status by status through
+    ix_rsvps_party_attending_submitted and raw_guest_list in a second pass, so
+    no list of guests is ever held in memory. Keys come out in the sorted
+    order jsonify used, which lets the counts follow the lists they count.
+    """
     try:
-        party = Party.query.filter_by(is_active=True).first()
+        party = get_request_party()
         if not party:
             return jsonify({'error': 'Festa não encontrada'}), 404
-        
-        all_guests = RSVP.query.filter_by(party_id=party.id).order_by(RSVP.submitted_at.desc()).all()
-        
-        # Group guests by attending status
-        guests_by_status = {
-            'yes': [],
-            'no': [],
-            'maybe': []
-        }
-        
-        for guest in all_guests:
-            status = guest.attending if guest.attending in ['yes', 'no', 'maybe'] else 'unknown'
-            if status not in guests_by_status:
-                guests_by_status[status] = []
-            guests_by_status[status].append(guest.to_dict())
-        
-        print(f"🔍 Debug: Total guests in database: {len(all_guests)}")
-        print(f"🔍 Debug: Guests by status: {[(k, len(v)) for k, v in guests_by_status.items()]}")
-        
-        return jsonify({
-            'total_guests': len(all_guests),
-            'guests_by_status': guests_by_status,
-            'summary': {
-                'attending_yes': len(guests_by_status['yes']),
-                'attending_no': len(guests_by_status['no']),
-                'attending_maybe': len(guests_by_status['maybe'])
-            },
-            'raw_guest_list': [guest.to_dict() for guest in all_guests]
-        })
-        
     except Exception as e:
-        print(f"❌ Debug error: {e}")
+        logger.exception("Debug error")
         return jsonify({'error': f'Debug error: {str(e)}'}), 500
 
-@app.route('/api/debug/database-info', methods=['GET'])
+    def newest_first(*criteria):
+        return (
+            db.select(*(getattr(RSVP, f) for f in GUEST_FIELDS))
+            .where(RSVP.party_id == party.id, *criteria)
+            .order_by(RSVP.submitted_at.desc())
+        )
+
+    def counted(batches, counts, key):
+        for count, encoded in batches:
+            counts[key] += count
+            yield count, encoded
+
+    def generate():
+        counts = Counter()
+        yield '{"guests_by_status":{'
+        statuses = [
+            ('maybe', newest_first(RSVP.attending == 'maybe')),
+            ('no', newest_first(RSVP.attending == 'no')),
+            ('unknown', newest_first(RSVP.attending.not_in(('yes', 'no', 'maybe')))),
+            ('yes', newest_first(RSVP.attending == 'yes'))
+        ]
+        separator = ''
+        for status, query in statuses:
+            chunks = json_array_chunks(counted(encode_guest_rows(query, GUEST_FIELDS), counts, status))
+            if status == 'unknown':
+                # Only present when such guests exist
+                opening = next(chunks)
+                first = next(chunks)
+                if first == ']':
+                    continue
+                chunks = chain((opening, first), chunks)
+            yield f'{separator}"{status}":'
+            yield from chunks
+            separator = ','
+        yield '},"raw_guest_list":'
+        yield from json_array_chunks(counted(encode_guest_rows(newest_first(), GUEST_FIELDS), counts, 'total'))
+        yield (f',"summary":{{"attending_maybe":{counts["maybe"]},"attending_no":{counts["no"]},'
+               f'"attending_yes":{counts["yes"]}}},"total_guests":{counts["total"]}}}')
+        logger.debug("Debug guest listing", extra={'total_guests': counts['total'], 'by_status': dict(counts)})
+
+    return stream_json(generate())
+
+@api.route('/api/debug/database-info', methods=['GET'])
 def get_database_info():
     """Debug endpoint to check database status"""
     try:
@@ -522,16 +3199,16 @@ def get_database_info():
         rsvp_count = RSVP.query.count()
         
         # Get active party info
-        active_party = Party.query.filter_by(is_active=True).first()
+        active_party = get_active_party()
         
         # Database URL (hide sensitive info)
-        db_url = app.config['SQLALCHEMY_DATABASE_URI']
+        db_url = current_app.config['SQLALCHEMY_DATABASE_URI']
         if '@' in db_url:
             db_url_safe = db_url.split('@')[0].split('://')[0] + '://***@' + db_url.split('@')[1]
         else:
             db_url_safe = db_url
         
-        print(f"🔍 Database info - Tables: {tables}, Parties: {party_count}, RSVPs: {rsvp_count}")
+        logger.debug("Database info", extra={'tables': tables, 'parties': party_count, 'rsvps': rsvp_count})
         
         return jsonify({
             'database_url': db_url_safe,
@@ -550,14 +3227,15 @@ def get_database_info():
         })
         
     except Exception as e:
-        print(f"❌ Database debug error: {e}")
+        logger.exception("Database debug error")
         return jsonify({'error': f'Database debug error: {str(e)}'}), 500
 
-@app.route('/api/debug/test-insert', methods=['POST'])
+@api.route('/api/debug/test-insert', methods=['POST'])
+@api.route('/api/parties/<int:party_id>/debug/test-insert', methods=['POST'])
 def test_insert_guest():
     """Debug endpoint to test inserting a guest directly"""
     try:
-        party = Party.query.filter_by(is_active=True).first()
+        party = get_request_party()
         if not party:
             return jsonify({'error': 'Festa não encontrada'}), 404
         
@@ -573,9 +3251,16 @@ def test_insert_guest():
         )
         
         db.session.add(test_guest)
+        db.session.flush()
+        # Counted like POST /api/rsvp, within max_guests
+        if not reserve_guest_spots(party.id, test_guest.number_of_guests):
+            db.session.rollback()
+            return jsonify({'error': 'Não há lugares suficientes disponíveis'}), 409
+        queue_guest_event(party.id, 'add', test_guest.to_dict(), test_guest.attending)
         db.session.commit()
+        issued_codes.add([test_guest.confirmation_code])
         
-        print(f"✅ Debug: Test guest inserted successfully: {test_guest.confirmation_code}")
+        logger.debug("Debug test guest inserted", extra={'confirmation_code': test_guest.confirmation_code})
         
         # Verify it was saved
         saved_guest = RSVP.query.filter_by(confirmation_code=test_guest.confirmation_code).first()
@@ -588,36 +3273,159 @@ def test_insert_guest():
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Debug insert error: {e}")
+        logger.exception("Debug insert error")
         return jsonify({'error': f'Debug insert error: {str(e)}'}), 500
 
+@api.route('/api/debug/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Debug endpoint with hit/miss counters for the in-process caches"""
+    return jsonify({
+        'parties': party_cache.stats(),
+        'party_stats': party_stats_cache.stats(),
+        'confirmations': confirmation_cache.stats(),
+        'guest_snapshots': guest_snapshots.stats(),
+        'issued_codes': issued_codes.stats(),
+        'rate_limiter': rate_limiter.stats(),
+        'guest_stream': guest_events.stats()
+    })
+
+@api.route('/api/debug/email-queue', methods=['GET'])
+def get_email_queue_stats():
+    """Debug endpoint with outbox depth, delivery counters and latency"""
+    return jsonify(email_queue.stats())
+
+@api.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of this worker's metrics"""
+    lines = request_metrics.render()
+
+    lines += ['# TYPE party_cache_hits_total counter', '# TYPE party_cache_misses_total counter']
+    for name, cache in (('party', party_cache), ('party_stats', party_stats_cache),
+                        ('confirmations', confirmation_cache), ('guest_snapshots', guest_snapshots)):
+        stats = cache.stats()
+        lines += [f'party_cache_hits_total{{cache="{name}"}} {stats["hits"]}',
+                  f'party_cache_misses_total{{cache="{name}"}} {stats["misses"]}']
+
+    codes, limiter = issued_codes.stats(), rate_limiter.stats()
+    lines += ['# HELP code_filter_rejected_total Confirmation code lookups answered by the Bloom filter',
+              '# TYPE code_filter_rejected_total counter', f"code_filter_rejected_total {codes['rejected']}",
+              '# TYPE code_filter_passed_total counter', f"code_filter_passed_total {codes['passed']}",
+              '# TYPE rate_limited_total counter', f"rate_limited_total {limiter['limited']}"]
+
+    stream = guest_events.stats()
+    lines += ['# TYPE guest_stream_subscribers gauge', f"guest_stream_subscribers {stream['subscribers']}",
+              '# TYPE guest_stream_events_total counter', f"guest_stream_events_total {stream['published']}",
+              '# TYPE guest_stream_overflows_total counter', f"guest_stream_overflows_total {stream['overflows']}"]
+
+    queue = email_queue.stats()
+    lines += ['# HELP email_queue_depth Outbox emails waiting to be sent (all workers)',
+              '# TYPE email_queue_depth gauge', f"email_queue_depth {queue['queue_depth']}",
+              '# TYPE email_dead_letters gauge', f"email_dead_letters {queue['dead_letters']}",
+              '# TYPE email_sent_total counter', f"email_sent_total {queue['sent']}",
+              '# TYPE email_failed_total counter', f"email_failed_total {queue['failed']}",
+              '# TYPE email_retried_total counter', f"email_retried_total {queue['retried']}",
+              '# TYPE email_delivery_latency_seconds_max gauge',
+              f"email_delivery_latency_seconds_max {queue['latency_max_seconds']}"]
+
+    return current_app.response_class('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
 # Error handlers
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Rota não encontrada'}), 404
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return jsonify({'error': 'Erro interno do servidor'}), 500
 
-# Initialize database
-with app.app_context():
-    try:
-        db.create_all()
-        if not Party.query.first():
-            default_party = Party()
-            db.session.add(default_party)
-            db.session.commit()
-            print("✅ Festa padrão criada!")
-        else:
-            print("✅ Database initialized, existing party found")
-    except Exception as e:
-        print(f"❌ Database initialization error: {e}")
+# Application setup
+def ensure_default_party(session=None):
+    """Create the default party if there is none and aggregates for parties
+    that predate party_counters. Needs an app context and an up-to-date schema.
+
+    `session` defaults to db.session; asgi.py passes its own through run_sync.
+    """
+    session = session or db.session
+    if session.execute(db.select(Party.id).limit(1)).first() is None:
+        session.add(Party())
+        session.commit()
+        logger.info("Festa padrão criada")
+    else:
+        logger.info("Database initialized, existing party found")
+
+    # Backfill aggregates for parties that predate party_counters
+    missing = session.execute(
+        db.select(Party.id).where(~Party.id.in_(db.select(PartyCounter.party_id)))
+    ).scalars().all()
+    for party_id in missing:
+        rebuild_party_counter(party_id, session)
+    session.commit()
+
+def init_database(app):
+    """Create tables and apply pending migrations (migrate.py), then the
+    default party and any missing aggregates. A failed migration stops the app
+    from starting: its routes would fail on the old schema."""
+    from migrate import migrate  # migrate.py imports this module
+    with app.app_context():
+        try:
+            migrate()
+        except Exception as e:
+            logger.exception("Database migration failed")
+            raise RuntimeError(f'Database migration failed ({e}); fix it and run python migrate.py') from e
+        try:
+            ensure_default_party()
+        except Exception:
+            logger.exception("Database initialization error")
+
+def create_app(bootstrap=None):
+    """The Flask app. `bootstrap` runs init_database() here; by default it
+    follows DB_BOOTSTRAP_ON_STARTUP."""
+    app = Flask(__name__)
+    load_config(app)
+    configure_logging(app)
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
+    app.json = FastJSONProvider(app)
+    db.init_app(app)
+    CORS(app, 
+         origins=[
+             'http://localhost:5173',
+             'https://darius-birthday-party-frontend.onrender.com',
+             'https://dariussantiago.eu',
+             'https://www.dariussantiago.eu'
+         ],
+         allow_headers=['Content-Type', 'Authorization'],
+         expose_headers=['ETag', 'X-Next-Cursor'],
+         methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+    app.register_blueprint(api)
+    app.extensions['confirmation_codes'] = ConfirmationCodeGenerator()
+
+    party_cache.ttl = app.config['PARTY_CACHE_TTL']
+    party_stats_cache.ttl = app.config['PARTY_STATS_CACHE_TTL']
+    party_cache.max_size = party_stats_cache.max_size = app.config['PARTY_CACHE_SIZE']
+    confirmation_cache.ttl = app.config['CONFIRMATION_CACHE_TTL']
+    confirmation_cache.max_size = app.config['CONFIRMATION_CACHE_SIZE']
+    issued_codes.enabled = app.config['CODE_FILTER_ENABLED']
+    issued_codes.error_rate = app.config['CODE_FILTER_ERROR_RATE']
+    rate_limiter.init_app(app)
+    email_queue.init_app(app)
+    guest_events.init_app(app)
+    guest_snapshots.init_app(app)
+
+    if bootstrap is None:
+        bootstrap = app.config['DB_BOOTSTRAP_ON_STARTUP']
+    if bootstrap:
+        init_database(app)
+    return app
 
 if __name__ == '__main__':
+    app = create_app()
     port = int(os.getenv('PORT', 5000))
-    print(f"🚀 Iniciando servidor Flask na porta {port}")
-    print(f"📧 Email configurado: {bool(os.getenv('MAIL_USERNAME'))}")
-    print(f"🗄️ Database: {'PostgreSQL' if 'postgresql' in app.config['SQLALCHEMY_DATABASE_URI'] else 'SQLite'}")
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    logger.info("Iniciando servidor Flask", extra={
+        'port': port,
+        'email_configured': bool(os.getenv('MAIL_USERNAME')),
+        'database_type': 'PostgreSQL' if 'postgresql' in app.config['SQLALCHEMY_DATABASE_URI'] else 'SQLite'
+    })
+    app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,731 @@
+"""ASGI entry point: the party, RSVP and guest routes on asyncio.
+
+    pip install -r requirements-asgi.txt
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 2
+
+Same URLs, status codes and JSON bodies as the Flask app, served by Starlette
+with SQLAlchemy's asyncio extension (aiosqlite for SQLite, asyncpg for
+PostgreSQL) and aiosmtplib, so a request waiting on the database or on SMTP
+holds no thread. Models, SQL statements, the rate limiter, the party caches
+and the notification templates are the ones in app.py; the write helpers run
+unchanged on the async session through run_sync.
+
+Only the routes a guest's browser uses are served here. Bulk import/export,
+the batch endpoint, /api/guests/stream and the debug and metrics routes stay
+on the WSGI app (wsgi.py), which can run next to this one on the same
+database: every write still bumps the party's guests_version, so open guest
+streams pick it up. The issued code Bloom filter is not kept here; an
+unknown confirmation code costs one indexed lookup. Behind a proxy, pass
+uvicorn --proxy-headers --forwarded-allow-ips so rate limiting sees the
+client's address.
+"""
+import asyncio
+import functools
+import hashlib
+import logging
+import math
+import os
+from contextlib import asynccontextmanager, nullcontext
+from datetime import datetime
+from email.message import EmailMessage
+
+import aiosmtplib
+from flask import Flask
+from sqlalchemy import and_, delete, event, or_, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+from app import (
+    GUEST_FIELDS, GUEST_PAGE_MAX, PARTY_FIELDS, PARTY_PAGE_MAX, ConfirmationCodeGenerator, EmailOutbox, EmailQueue,
+    FastJSONProvider, Party, PartyCounter, PartyRow, RSVP, RedisTokenBuckets, configure_logging, confirmation_cache,
+    db, decode_guest_cursor, encode_guest_cursor, ensure_default_party, get_party_counter, guest_list_query,
+    insert_rsvp, load_config, mark_stale_confirmations, notification_email_allowed, notify_guest_confirmed,
+    party_cache, party_query, party_rows_query, party_stats_cache, rate_limiter, rebuild_party_counter,
+    render_notification_digest, reserve_guest_spots, rsvp_lookup_query, serialize_guest_row, touch_guest_list,
+    utcnow
+)
+from migrate import migrate
+
+logger = logging.getLogger('party')
+
+# Settings come from app.load_config; this Flask app is never served, it only
+# gives the shared helpers their current_app (config, Flask-Mail, code generator)
+flask_app = Flask('app')
+load_config(flask_app)
+flask_app.extensions['confirmation_codes'] = ConfirmationCodeGenerator()
+flask_app.json = FastJSONProvider(flask_app)
+settings = flask_app.config
+
+def async_database_url(config, instance_path):
+    """SQLALCHEMY_DATABASE_URI with an asyncio driver; relative SQLite paths
+    resolve against the instance folder, as Flask-SQLAlchemy does"""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        if url.database and url.database != ':memory:' and not os.path.isabs(url.database):
+            os.makedirs(instance_path, exist_ok=True)
+            url = url.set(database=os.path.join(instance_path, url.database))
+        return url.set(drivername='sqlite+aiosqlite')
+    if url.get_backend_name() == 'postgresql':
+        return url.set(drivername='postgresql+asyncpg')
+    return url
+
+engine = create_async_engine(async_database_url(settings, flask_app.instance_path),
+                             **settings['SQLALCHEMY_ENGINE_OPTIONS'])
+sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+@event.listens_for(engine.sync_engine, 'connect')
+def _tune_aiosqlite_connection(dbapi_connection, connection_record):
+    # app._tune_sqlite_connection only recognises sqlite3 connections
+    if engine.dialect.name != 'sqlite':
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+async def run_sync(session, fn, *args, **kwargs):
+    """Call an app.py helper with the async session's Session, inside the app context it expects"""
+    def call(sync_session):
+        with flask_app.app_context():
+            return fn(*args, session=sync_session, **kwargs)
+    return await session.run_sync(call)
+
+# Responses
+encode_json = flask_app.json.encode_compact  # orjson when installed, as in app.py
+
+class JSONResponse(Response):
+    """jsonify's output: sorted keys, compact, trailing newline"""
+    media_type = 'application/json'
+
+    def render(self, content):
+        return (encode_json(content) + '\n').encode()
+
+def error(message, status):
+    return JSONResponse({'error': message}, status)
+
+def query_int(request, name, default=None):
+    """request.args.get(name, type=int): `default` when missing or not an integer"""
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+async def read_json(request, silent=False):
+    """request.get_json(): the parsed body, or None when silent and it is not JSON"""
+    try:
+        return await request.json()
+    except ValueError:
+        if silent:
+            return None
+        raise
+
+def etag_matches(request, etag):
+    tags = {tag.strip().removeprefix('W/').strip('"') for tag in request.headers.get('if-none-match', '').split(',')}
+    return etag in tags or '*' in tags
+
+def client_address(request):
+    return request.client.host if request.client else 'unknown'
+
+def rate_limited(view):
+    @functools.wraps(view)
+    async def wrapper(request):
+        if isinstance(rate_limiter.backend, RedisTokenBuckets):
+            # A blocking Redis round trip: run it off the event loop
+            allowed, retry_after = await asyncio.to_thread(rate_limiter.take, client_address(request))
+        else:
+            allowed, retry_after = rate_limiter.take(client_address(request))
+        if not allowed:
+            response = error('Demasiados pedidos, tente novamente mais tarde', 429)
+            response.headers['Retry-After'] = str(math.ceil(retry_after))
+            return response
+        return await view(request)
+    return wrapper
+
+# Parties
+async def load_cached_party(session, party_id):
+    """party_cache entry for party_id (None: the default party), loaded with this session on a miss"""
+    party = party_cache.peek(party_id)
+    if party is not None:
+        return party
+    row = (await session.execute(party_query(party_id))).first()
+    return party_cache.put(party_id, PartyRow(*row) if row else None)
+
+async def load_cached_party_stats(session, party_id):
+    stats = party_stats_cache.peek(party_id)
+    if stats is None:
+        counter = await run_sync(session, get_party_counter, party_id)
+        stats = party_stats_cache.put(party_id, counter.to_dict())
+    return stats
+
+def request_party_id(request):
+    return request.path_params.get('party_id')
+
+async def get_request_party(session, request):
+    return await load_cached_party(session, request_party_id(request))
+
+def scope_to_request_party(query, request):
+    party_id = request_party_id(request)
+    return query if party_id is None else query.where(RSVP.party_id == party_id)
+
+def normalize_confirmation_code(code):
+    return flask_app.extensions['confirmation_codes'].normalize(code)
+
+async def find_guest(session, request, confirmation_code):
+    """The RSVP with this (normalized) code on the request's party, or None"""
+    confirmation_code = normalize_confirmation_code(confirmation_code)
+    if confirmation_code is None:
+        return None
+    return (await session.execute(
+        scope_to_request_party(select(RSVP).where(RSVP.confirmation_code == confirmation_code), request)
+    )).scalar()
+
+# Routes
+async def health_check(request):
+    return JSONResponse({
+        'status': 'OK',
+        'message': 'API da Festa de Aniversário está funcionando',
+        'version': '1.0.0',
+        'email_configured': bool(os.getenv('MAIL_USERNAME')),
+        'database_type': 'PostgreSQL' if 'postgresql' in settings['SQLALCHEMY_DATABASE_URI'] else 'SQLite'
+    })
+
+async def list_parties(request):
+    limit = max(1, min(query_int(request, 'limit', 100), PARTY_PAGE_MAX))
+    query = party_rows_query().order_by(Party.id).limit(limit + 1)
+    after = query_int(request, 'cursor')
+    if after is not None:
+        query = query.where(Party.id > after)
+    if request.query_params.get('active') == 'true':
+        query = query.where(Party.is_active.is_(True))
+    async with sessions() as session:
+        parties = [PartyRow(*row) for row in await session.execute(query)]
+
+    response = JSONResponse([party.to_dict() for party in parties[:limit]])
+    if len(parties) > limit:
+        response.headers['X-Next-Cursor'] = str(parties[limit - 1].id)
+    return response
+
+async def create_party(request):
+    data = await read_json(request, silent=True)
+    if not isinstance(data, dict) or not data.get('title'):
+        return error('Campos obrigatórios em falta', 400)
+    unknown = sorted(set(data) - set(PARTY_FIELDS))
+    if unknown:
+        return error(f'Campos desconhecidos: {", ".join(unknown)}', 400)
+    if data.get('notification_email'):
+        with flask_app.app_context():
+            allowed = notification_email_allowed(data['notification_email'])
+        if not allowed:
+            return error('Email de notificação não permitido', 400)
+
+    values = dict(data)
+    try:
+        for field in ('date', 'rsvp_deadline'):
+            if values.get(field):
+                values[field] = datetime.fromisoformat(values[field])
+        if 'max_guests' in values:
+            values['max_guests'] = int(values['max_guests'])
+    except (TypeError, ValueError):
+        return error('Data ou número de convidados inválido', 400)
+
+    async with sessions() as session:
+        party = Party(**values)
+        session.add(party)
+        await session.flush()
+        await run_sync(session, rebuild_party_counter, party.id)
+        await session.commit()
+    logger.info("Party created", extra={'party_id': party.id})
+    return JSONResponse(party.to_dict(), 201)
+
+async def get_party(request):
+    async with sessions() as session:
+        party = await get_request_party(session, request)
+        if not party:
+            if request_party_id(request) is not None:
+                return error('Festa não encontrada', 404)
+            party = Party()
+            session.add(party)
+            await session.commit()
+    return JSONResponse(party.to_dict())
+
+async def get_party_stats(request):
+    async with sessions() as session:
+        party = await get_request_party(session, request)
+        if not party:
+            return error('Festa não encontrada', 404)
+        stats = await load_cached_party_stats(session, party.id)
+
+    return JSONResponse({
+        **stats,
+        'max_guests': party.max_guests,
+        'available_spots': max(0, party.max_guests - stats['total_attending']),
+        'is_rsvp_open': party.is_rsvp_open
+    })
+
+async def submit_rsvp(request):
+    async with sessions() as session:
+        try:
+            data = await read_json(request)
+
+            # Validate required fields
+            if not all(k in data for k in ['name', 'email', 'attending', 'number_of_guests']):
+                return error('Campos obrigatórios em falta', 400)
+
+            try:
+                number_of_guests = int(data['number_of_guests'])
+            except (TypeError, ValueError):
+                number_of_guests = 0
+            if number_of_guests < 1:
+                return error('Número de convidados inválido', 400)
+
+            party = await get_request_party(session, request)
+            if not party:
+                return error('Festa não encontrada', 404)
+
+            values = {
+                'party_id': party.id,
+                'name': data['name'],
+                'email': data['email'],
+                'phone': data.get('phone', ''),
+                'attending': data['attending'],
+                'number_of_guests': number_of_guests,
+                'dietary_restrictions': data.get('dietary_restrictions', ''),
+                'message': data.get('message', ''),
+                'confirmation_code': flask_app.extensions['confirmation_codes'].generate(),
+                'submitted_at': utcnow()
+            }
+            rsvp_id, confirmation_code, created = await run_sync(session, insert_rsvp, values)
+            if not created:
+                await session.rollback()
+                logger.info("Duplicate RSVP attempt", extra={'confirmation_code': confirmation_code})
+                return JSONResponse({
+                    'error': 'Você já confirmou presença para esta festa',
+                    'confirmation_code': confirmation_code
+                }, 400)
+
+            if data['attending'] == 'yes':
+                if not await run_sync(session, reserve_guest_spots, party.id, number_of_guests):
+                    await session.rollback()
+                    counter = await run_sync(session, get_party_counter, party.id)
+                    return JSONResponse({
+                        'error': 'Não há lugares suficientes disponíveis',
+                        'available_spots': max(0, (party.max_guests or 0) - counter.total_attending)
+                    }, 409)
+                # The notification is an outbox row in the same transaction
+                await run_sync(session, notify_guest_confirmed, party, rsvp_id, data['name'])
+            else:
+                await run_sync(session, touch_guest_list, party.id, 1, data['attending'], number_of_guests)
+
+            await session.commit()
+            email_queue.wake()
+            logger.info("RSVP saved", extra={'confirmation_code': confirmation_code, 'attending': data['attending'],
+                                              'number_of_guests': number_of_guests})
+            return JSONResponse({
+                'message': 'Presença confirmada com sucesso',
+                'confirmation_code': confirmation_code
+            }, 201)
+
+        except Exception as e:
+            await session.rollback()
+            logger.exception("Error submitting RSVP")
+            return error(f'Falha ao confirmar presença: {str(e)}', 500)
+
+@rate_limited
+async def get_rsvp(request):
+    confirmation_code = normalize_confirmation_code(request.path_params['confirmation_code'])
+    if confirmation_code is None:
+        return error('Confirmação não encontrada', 404)
+    async with sessions() as session:
+        # A cached entry is only good at the guests_version it was cached at
+        party_id, version = confirmation_cache.party_of(confirmation_code), None
+        if party_id is not None:
+            version = (await session.execute(
+                select(PartyCounter.guests_version).where(PartyCounter.party_id == party_id)
+            )).scalar() or 0
+        cached = confirmation_cache.get(confirmation_code, version)
+        if cached is None:
+            row = (await session.execute(
+                scope_to_request_party(rsvp_lookup_query(confirmation_code), request)
+            )).first()
+            if not row:
+                return error('Confirmação não encontrada', 404)
+            cached = confirmation_cache.put(confirmation_code, row.party_id, row.guests_version,
+                                            encode_json(serialize_guest_row(row, GUEST_FIELDS)))
+        party = party_cache.peek(cached[0]) or await load_cached_party(session, cached[0])
+    party_id, encoded_rsvp = cached
+    if request_party_id(request) not in (None, party_id):
+        return error('Confirmação não encontrada', 404)
+    # app.confirmation_response: the cached RSVP block is not encoded again
+    body = f'{{"party":{encode_json(party.to_dict())},"rsvp":{encoded_rsvp}}}\n'
+    return Response(body, media_type='application/json')
+
+async def stream_guest_rows(query, fields):
+    """Chunks of the JSON array of guests, STREAM_BATCH_SIZE rows at a time"""
+    async with sessions() as session:
+        result = await session.stream(query.execution_options(yield_per=settings['STREAM_BATCH_SIZE']))
+        yield '['
+        separator = ''
+        async for rows in result.partitions():
+            if rows:
+                yield separator + encode_json([serialize_guest_row(row, fields) for row in rows])[1:-1]
+                separator = ','
+        yield ']\n'
+
+async def get_guests(request):
+    """List guests, newest first (query parameters as in app.get_guests)"""
+    async with sessions() as session:
+        party = await get_request_party(session, request)
+        if not party:
+            return error('Festa não encontrada', 404)
+
+        fields = tuple(f.strip() for f in request.query_params.get('fields', '').split(',') if f.strip()) \
+            or GUEST_FIELDS
+        unknown = [f for f in fields if f not in GUEST_FIELDS]
+        if unknown:
+            return error(f'Campos desconhecidos: {", ".join(unknown)}', 400)
+
+        attending = request.query_params.get('attending')
+        cursor = request.query_params.get('cursor')
+        limit = query_int(request, 'limit')
+        if limit is not None:
+            limit = max(1, min(limit, GUEST_PAGE_MAX))
+
+        version = (await session.execute(
+            select(PartyCounter.guests_version).where(PartyCounter.party_id == party.id)
+        )).scalar() or 0
+        variant = f"{','.join(fields)}|{attending or ''}|{limit or ''}|{cursor or ''}"
+        etag = f"{party.id}-{version}-{hashlib.sha1(variant.encode()).hexdigest()[:12]}"
+        headers = {'ETag': f'"{etag}"'}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+
+        query = guest_list_query(party.id, fields, attending)
+        if cursor:
+            position = decode_guest_cursor(cursor)
+            if position is None:
+                return error('Cursor inválido', 400)
+            submitted_at, guest_id = position
+            query = query.where(or_(
+                RSVP.submitted_at < submitted_at,
+                and_(RSVP.submitted_at == submitted_at, RSVP.id < guest_id)
+            ))
+
+        if limit is None:
+            # Whole list: streamed from its own session once this one is closed
+            return StreamingResponse(stream_guest_rows(query, fields), media_type='application/json',
+                                     headers=headers)
+
+        rows = (await session.execute(query.limit(limit + 1))).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers['X-Next-Cursor'] = encode_guest_cursor(rows[-1].submitted_at, rows[-1].id)
+    return JSONResponse([serialize_guest_row(row, fields) for row in rows], headers=headers)
+
+async def clear_guests(request):
+    async with sessions() as session:
+        try:
+            party = await get_request_party(session, request)
+            if not party:
+                return error('Festa não encontrada', 404)
+
+            deleted_count = (await session.execute(delete(RSVP).where(RSVP.party_id == party.id))).rowcount
+            mark_stale_confirmations(party_id=party.id, session=session.sync_session)
+            await run_sync(session, touch_guest_list, party.id, reset=True)
+            await session.commit()
+
+            logger.info("Lista de convidados limpa", extra={'deleted_count': deleted_count})
+            return JSONResponse({
+                'message': f'Lista de convidados limpa com sucesso. {deleted_count} registros removidos.',
+                'deleted_count': deleted_count
+            })
+
+        except Exception as e:
+            await session.rollback()
+            logger.exception("Erro ao limpar lista")
+            return error(f'Falha ao limpar lista de convidados: {str(e)}', 500)
+
+async def test_email(request):
+    """Test email configuration"""
+    try:
+        notification_email = os.getenv('NOTIFICATION_EMAIL')
+        mail_username = os.getenv('MAIL_USERNAME')
+        mail_password = os.getenv('MAIL_PASSWORD')
+
+        if not notification_email:
+            return error('NOTIFICATION_EMAIL not configured', 400)
+
+        if not mail_username or not mail_password:
+            return error('MAIL_USERNAME or MAIL_PASSWORD not configured', 400)
+
+        message = EmailMessage()
+        message['Subject'] = "🎉 Test Email from Birthday Party App"
+        message['From'] = mail_username
+        message['To'] = notification_email
+        message.set_content(
+            "This is a test email from your birthday party app. If you receive this, email is working correctly!")
+        async with email_queue.connect() as smtp:
+            if smtp is not None:
+                await smtp.send_message(message)
+        logger.info("Test email sent")
+
+        return JSONResponse({
+            'message': 'Test email sent successfully',
+            'sent_to': notification_email,
+            'from': mail_username
+        })
+
+    except Exception as e:
+        logger.exception("Failed to send test email")
+        return error(f'Failed to send test email: {str(e)}', 500)
+
+@rate_limited
+async def update_guest(request):
+    """Update a specific guest's information"""
+    async with sessions() as session:
+        try:
+            guest = await find_guest(session, request, request.path_params['confirmation_code'])
+            if not guest:
+                return error('Guest not found', 404)
+
+            data = await read_json(request)
+            old_name = guest.name
+            if 'name' in data:
+                guest.name = data['name']
+            if 'phone' in data:
+                guest.phone = data['phone']
+
+            await run_sync(session, touch_guest_list, guest.party_id)
+            await session.commit()
+
+            logger.info("Guest updated", extra={'confirmation_code': guest.confirmation_code})
+            return JSONResponse({
+                'message': 'Guest updated successfully',
+                'old_name': old_name,
+                'new_name': guest.name,
+                'confirmation_code': guest.confirmation_code
+            })
+
+        except Exception as e:
+            await session.rollback()
+            logger.exception("Error updating guest")
+            return error(f'Failed to update guest: {str(e)}', 500)
+
+@rate_limited
+async def delete_guest(request):
+    """Delete a specific guest by confirmation code"""
+    async with sessions() as session:
+        try:
+            guest = await find_guest(session, request, request.path_params['confirmation_code'])
+            if not guest:
+                return error('Guest not found', 404)
+
+            await session.delete(guest)
+            await run_sync(session, touch_guest_list, guest.party_id, -1, guest.attending, guest.number_of_guests)
+            await session.commit()
+
+            logger.info("Guest deleted", extra={'confirmation_code': guest.confirmation_code})
+            return JSONResponse({
+                'message': f'Guest {guest.name} removed successfully',
+                'deleted_guest': guest.name,
+                'confirmation_code': guest.confirmation_code
+            })
+
+        except Exception as e:
+            await session.rollback()
+            logger.exception("Error deleting guest")
+            return error(f'Failed to delete guest: {str(e)}', 500)
+
+# Email
+def outbox_message(item, sender):
+    """EmailMessage for an email_outbox row (EmailOutbox.to_message for aiosmtplib)"""
+    if not sender:
+        raise ValueError('The message does not specify a sender and a default sender has not been configured')
+    message = EmailMessage()
+    message['Subject'] = item.subject
+    message['From'] = sender
+    message['To'] = item.recipients
+    message.set_content(item.body or '')
+    if item.html:
+        message.add_alternative(item.html, subtype='html')
+    return message
+
+class AsyncEmailQueue(EmailQueue):
+    """EmailQueue on the event loop: EMAIL_WORKERS tasks instead of threads,
+    sending over aiosmtplib. Claims, leases, backoff and counters are
+    EmailQueue's, so this queue and the WSGI app's can drain one outbox."""
+
+    def init_app(self, app):
+        super().init_app(app)
+        self.sender = app.config['MAIL_DEFAULT_SENDER']
+        self.guest_list_limit = app.config['NOTIFICATION_GUEST_LIST_LIMIT']
+        self._tasks = []
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+        self._started_pid = os.getpid()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wake(self):
+        if self._tasks:
+            self._wakeup.set()
+
+    def connect(self):
+        """SMTP connection as an async context manager; None under MAIL_SUPPRESS_SEND"""
+        config = self.app.config
+        if config['MAIL_SUPPRESS_SEND']:
+            return nullcontext()
+        return aiosmtplib.SMTP(hostname=config['MAIL_SERVER'], port=config['MAIL_PORT'],
+                               start_tls=config['MAIL_USE_TLS'], username=config['MAIL_USERNAME'],
+                               password=config['MAIL_PASSWORD'])
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                while await self.drain_once():
+                    pass
+            except Exception:
+                logger.exception("Erro no worker de email")
+
+    async def _claim(self, session):
+        now = utcnow()
+        candidates = (await session.execute(self.due_emails(now, self.batch_size))).scalars().all()
+        claimed = []
+        for outbox_id in candidates:
+            if (await session.execute(self.claim_email(outbox_id, now))).rowcount:
+                claimed.append(outbox_id)
+        await session.commit()
+        if not claimed:
+            return []
+        return (await session.execute(select(EmailOutbox).where(EmailOutbox.id.in_(claimed)))).scalars().all()
+
+    async def drain_once(self):
+        """Send one batch; returns the number of rows that were claimed"""
+        async with sessions() as session:
+            batch = await self._claim(session)
+            if not batch:
+                return 0
+
+            for item in batch:
+                if item.kind == 'digest' and item.body is None and \
+                        not await run_sync(session, render_notification_digest, item, self.guest_list_limit):
+                    item.status = 'skipped'
+
+            pending = [item for item in batch if item.status == 'sending']
+            try:
+                async with self.connect() as smtp:
+                    for item in pending:
+                        try:
+                            message = outbox_message(item, self.sender)
+                            if smtp is not None:
+                                await smtp.send_message(message)
+                            self._mark_sent(item)
+                        except Exception as e:
+                            self._mark_failed(item, e)
+            except Exception as e:
+                # Could not open the SMTP connection: retry everything not yet sent
+                for item in pending:
+                    if item.status == 'sending':
+                        self._mark_failed(item, e)
+
+            await session.commit()
+            return len(batch)
+
+email_queue = AsyncEmailQueue()
+email_queue.init_app(flask_app)
+
+# Application
+async def not_found(request, exc):
+    return error('Rota não encontrada', 404)
+
+async def internal_error(request, exc):
+    return error('Erro interno do servidor', 500)
+
+def party_routes(path, endpoint, methods=('GET',)):
+    """The unscoped route and its /api/parties/<party_id>/ twin"""
+    return [Route(f'/api{path}', endpoint, methods=list(methods)),
+            Route(f'/api/parties/{{party_id:int}}{path}', endpoint, methods=list(methods))]
+
+@asynccontextmanager
+async def lifespan(app):
+    # Tables, pending migrations, the default party and missing counters, as
+    # app.init_database() does (unless DB_BOOTSTRAP_ON_STARTUP is off); a
+    # failed migration fails the startup
+    if settings['DB_BOOTSTRAP_ON_STARTUP']:
+        async with engine.connect() as connection:
+            await connection.run_sync(migrate)
+        async with sessions() as session:
+            await run_sync(session, ensure_default_party)
+    email_queue.start()
+    yield
+    await email_queue.stop()
+    await engine.dispose()
+
+def create_asgi_app():
+    configure_logging(flask_app)
+    party_cache.ttl = settings['PARTY_CACHE_TTL']
+    party_stats_cache.ttl = settings['PARTY_STATS_CACHE_TTL']
+    party_cache.max_size = party_stats_cache.max_size = settings['PARTY_CACHE_SIZE']
+    confirmation_cache.ttl = settings['CONFIRMATION_CACHE_TTL']
+    confirmation_cache.max_size = settings['CONFIRMATION_CACHE_SIZE']
+    rate_limiter.init_app(flask_app)
+
+    routes = [
+        Route('/api/health', health_check),
+        Route('/api/parties', list_parties, methods=['GET']),
+        Route('/api/parties', create_party, methods=['POST']),
+        Route('/api/party', get_party),
+        Route('/api/parties/{party_id:int}', get_party),
+        Route('/api/party/stats', get_party_stats),
+        Route('/api/parties/{party_id:int}/stats', get_party_stats),
+        *party_routes('/rsvp', submit_rsvp, ['POST']),
+        *party_routes('/rsvp/{confirmation_code}', get_rsvp),
+        *party_routes('/guests', get_guests),
+        *party_routes('/clear-guests', clear_guests, ['DELETE']),
+        Route('/api/test-email', test_email),
+        *party_routes('/guest/{confirmation_code}', update_guest, ['PUT']),
+        *party_routes('/guest/{confirmation_code}', delete_guest, ['DELETE']),
+    ]
+    middleware = []
+    if settings['COMPRESS_LEVEL'] > 0:
+        # gzip only, from COMPRESS_MIN_SIZE bytes; streamed responses are compressed as they are sent
+        middleware.append(Middleware(GZipMiddleware, minimum_size=settings['COMPRESS_MIN_SIZE'],
+                                     compresslevel=settings['COMPRESS_LEVEL']))
+    return Starlette(
+        routes=routes,
+        middleware=[*middleware, Middleware(
+            CORSMiddleware,
+            allow_origins=[
+                'http://localhost:5173',
+                'https://darius-birthday-party-frontend.onrender.com',
+                'https://dariussantiago.eu',
+                'https://www.dariussantiago.eu'
+            ],
+            allow_headers=['Content-Type', 'Authorization'],
+            expose_headers=['ETag', 'X-Next-Cursor'],
+            allow_methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS']
+        )],
+        exception_handlers={404: not_found, 500: internal_error},
+        lifespan=lifespan
+    )
+
+app = create_asgi_app()
@@ -0,0 +1,262 @@
+"""Reproducible load test of the main API routes at growing RSVP volumes.
+
+For every volume in --rows the database is topped up to that many RSVPs and
+each route is driven two ways: in process through the Flask test client, one
+request at a time (the app's own cost), and over HTTP by benchmarks.http_load
+against a real server on the same database at every --clients level. Each
+cell records p50/p95/p99 latency, throughput and peak RSS: of this process for
+the test client, summed over the server's processes for HTTP.
+
+Results are printed and written as JSON (by default to
+benchmarks/results/api_load-<commit>.json); --compare prints the change
+against the results of an earlier run, cell by cell.
+
+    python -m benchmarks.api_load [--rows 1000 100000 1000000] [--clients 1 50] [--duration 5]
+    python -m benchmarks.api_load --modes test_client --rows 1000 --compare benchmarks/results/api_load-ebfd7dc.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from benchmarks.common import SERVER_COMMANDS, SERVER_DIR, print_table, seed_rsvps, serve, use_temp_database
+from benchmarks.http_load import run_load, summary
+
+use_temp_database()
+os.environ['RATE_LIMIT_PER_MINUTE'] = '0'
+os.environ['EMAIL_WORKERS'] = '0'
+os.environ['GUNICORN_MAX_REQUESTS'] = '0'  # no worker recycling in the middle of a run
+os.environ.pop('NOTIFICATION_EMAIL', None)
+os.environ['LOG_LEVEL'] = 'ERROR'
+
+from app import ConfirmationCodeGenerator, Party, RSVP, create_app, db, get_active_party  # noqa: E402
+from app import rebuild_party_counter  # noqa: E402
+
+MODES = ('test_client', 'http')
+
+
+def routes(party_id, rows, rng, label):
+    """Route name -> (make_request(n), heavy). Heavy routes (the whole guest
+    list) get --heavy-requests requests and at most --heavy-clients clients.
+    Submitted emails are `label`.<sequence>, unique for the whole run."""
+    codes = ConfirmationCodeGenerator()
+    emails = itertools.count()
+
+    def rsvp_code(n):
+        # seed_rsvps derives row i's code from (party_id << 24) + i
+        return 'GET', f'/api/rsvp/{codes.encode((party_id << 24) + rng.randrange(rows))}', None, None
+
+    def submit(n):
+        body = json.dumps({'name': f'Carga {n}', 'email': f'{label}.{next(emails)}@example.com',
+                           'attending': ('yes', 'no')[n % 2], 'number_of_guests': 1}).encode()
+        return 'POST', '/api/rsvp', body, None
+
+    return {
+        'GET /api/party': (lambda n: ('GET', '/api/party', None, None), False),
+        'GET /api/party/stats': (lambda n: ('GET', '/api/party/stats', None, None), False),
+        'GET /api/rsvp/<code>': (rsvp_code, False),
+        'GET /api/guests?limit=50': (lambda n: ('GET', '/api/guests?limit=50', None, None), False),
+        'GET /api/guests': (lambda n: ('GET', '/api/guests', None, None), True),
+        'POST /api/rsvp': (submit, False),
+    }
+
+
+def read_status(pid, field):
+    """A kB value from /proc/<pid>/status (Linux), or 0"""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree(pid):
+    """pid and all of its descendants"""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f'/proc/{current}/task/{current}/children') as children:
+                pids += [int(child) for child in children.read().split()]
+        except OSError:
+            pass
+    return pids
+
+
+def reset_peak_rss(pids):
+    """Start a new VmHWM measurement (Linux >= 4.0); ignored elsewhere"""
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/clear_refs', 'w') as clear_refs:
+                clear_refs.write('5')
+        except OSError:
+            pass
+
+
+def peak_rss_kib(pids):
+    return sum(read_status(pid, 'VmHWM') for pid in pids) or None
+
+
+def drive_test_client(client, make_request, count, warmup):
+    """Sequential requests through the test client; http_load's summary of them"""
+    latencies, statuses = [], {}
+    for n in range(warmup + count):
+        method, path, body, headers = make_request(n)
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=body, headers=headers,
+                               content_type='application/json' if body else None, buffered=False)
+        for _ in response.response:  # consume streamed bodies chunk by chunk
+            pass
+        response.close()
+        if n >= warmup:
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return summary(latencies, statuses, {}, sum(latencies))
+
+
+def seed_to(app, party_id, seeded, rows):
+    """Top the party up to `rows` seeded RSVPs and bring its aggregates up to date"""
+    with app.app_context():
+        seed_rsvps(db, RSVP, party_id, rows - seeded, start=seeded)
+        rebuild_party_counter(party_id)
+        db.session.commit()
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVER_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD', '--', '.'], cwd=SERVER_DIR).returncode
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def cell_key(result):
+    return (result['mode'], result['server'], result['rows'], result['route'], result['clients'])
+
+
+def compare(results, path):
+    with open(path) as previous:
+        before = {cell_key(result): result for result in json.load(previous)['results']}
+    change = lambda old, new: f'{(new - old) / old * 100:+.0f}%' if old and new is not None else '-'  # noqa: E731
+    rows = []
+    for result in results:
+        old = before.get(cell_key(result))
+        if old:
+            rows.append([result['mode'], result['server'] or '-', result['rows'], result['route'],
+                         result['clients'], change(old['throughput_rps'], result['throughput_rps']),
+                         change(old['p50_ms'], result['p50_ms']), change(old['p99_ms'], result['p99_ms']),
+                         change(old['peak_rss_kib'], result['peak_rss_kib'])])
+    print(f'\nChange against {path}')
+    if not rows:
+        print('no cells in common')
+        return
+    print_table(['mode', 'server', 'rows', 'route', 'clients', 'req/s', 'p50', 'p99', 'peak RSS'], rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    parser.add_argument('--server', default='wsgi', choices=list(SERVER_COMMANDS), help='server for --modes http')
+    parser.add_argument('--workers', type=int, default=1, help='server worker processes')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 50], help='HTTP concurrency levels')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per HTTP cell')
+    parser.add_argument('--requests', type=int, default=500, help='test client requests per route')
+    parser.add_argument('--heavy-requests', type=int, default=3, help='test client requests for the full guest list')
+    parser.add_argument('--heavy-clients', type=int, default=2, help='HTTP clients cap for the full guest list')
+    parser.add_argument('--routes', nargs='+', help='only these route names, e.g. "GET /api/party"')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the request mix')
+    parser.add_argument('--port', type=int, default=5100)
+    parser.add_argument('--output', help='results file (default benchmarks/results/api_load-<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare with')
+    args = parser.parse_args()
+
+    if 'http' in args.modes and not shutil.which(SERVER_COMMANDS[args.server](args.port, 1)[0]):
+        parser.error(f'--modes http needs the {args.server} server installed')
+
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        party_id = get_active_party().id
+        # Room for every 'yes' submitted during the run
+        db.session.execute(db.update(Party).where(Party.id == party_id).values(max_guests=10 ** 9))
+        db.session.commit()
+        database = db.engine.url.database
+
+    results = []
+    seeded = 0
+    for rows in sorted(args.rows):
+        start = time.perf_counter()
+        seed_to(app, party_id, seeded, rows)
+        seeded = rows
+        print(f'{rows:,} RSVPs seeded in {time.perf_counter() - start:.0f}s', flush=True)
+
+        def record(mode, server, clients, name, result, rss):
+            results.append({'mode': mode, 'server': server, 'rows': rows, 'route': name, 'clients': clients,
+                            **result, 'peak_rss_kib': rss})
+            print(f"  {mode:<11} {clients:>3} {name:<24} {result['throughput_rps']:>8.1f} req/s  "
+                  f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  statuses {result['statuses']}", flush=True)
+
+        cells = routes(party_id, rows, random.Random(args.seed), f'load{rows}')
+        cells = {name: cell for name, cell in cells.items() if not args.routes or name in args.routes}
+
+        if 'test_client' in args.modes:
+            for name, (make_request, heavy) in cells.items():
+                count = args.heavy_requests if heavy else args.requests
+                reset_peak_rss([os.getpid()])
+                result = drive_test_client(client, make_request, count, warmup=1 if heavy else 20)
+                record('test_client', None, 1, name, result, peak_rss_kib([os.getpid()]))
+
+        if 'http' in args.modes:
+            command = SERVER_COMMANDS[args.server](args.port, args.workers)
+            with serve(command, args.port, {'DATABASE_URL': f'sqlite:///{database}'}) as server:
+                for clients in args.clients:
+                    for name, (make_request, heavy) in cells.items():
+                        pids = process_tree(server.pid)
+                        reset_peak_rss(pids)
+                        result = asyncio.run(run_load('127.0.0.1', args.port, make_request,
+                                                      min(clients, args.heavy_clients) if heavy else clients,
+                                                      args.duration))
+                        record('http', args.server, clients, name, result, peak_rss_kib(pids))
+
+    commit = git_commit()
+    output = args.output or os.path.join(SERVER_DIR, 'benchmarks', 'results', f'api_load-{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as out:
+        json.dump({
+            'benchmark': 'api_load',
+            'commit': commit,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'argv': sys.argv[1:],
+            'settings': vars(args),
+            'results': results
+        }, out, indent=2)
+        out.write('\n')
+
+    print_table(['mode', 'rows', 'route', 'clients', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'peak RSS MiB'], [
+        [r['mode'] if not r['server'] else f"http/{r['server']}", f"{r['rows']:,}", r['route'], r['clients'],
+         f"{r['throughput_rps']:.1f}", r['p50_ms'], r['p95_ms'], r['p99_ms'],
+         f"{r['peak_rss_kib'] / 1024:.0f}" if r['peak_rss_kib'] else '-'] for r in results
+    ])
+    print(f'\nresults written to {output}')
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Throughput and latency of the WSGI app (gunicorn, gthread) against the ASGI
+variant (uvicorn, asyncio database drivers) at 1, 50 and 500 concurrent clients.
+
+Each server gets its own copy of the same seeded SQLite database and the same
+number of worker processes, and is driven over keep-alive connections by
+benchmarks.http_load from this process. The load generator shares the
+machine with the server, so compare the two servers with each other rather
+than with production numbers.
+
+    pip install -r requirements-asgi.txt
+    python -m benchmarks.asgi_vs_wsgi [--clients 1 50 500] [--duration 5] [--rows 1000] [--workers 1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+
+from benchmarks.common import SERVER_COMMANDS, print_table, seed_rsvps, serve, use_temp_database
+from benchmarks.http_load import run_load
+
+directory = use_temp_database()
+os.environ['RATE_LIMIT_PER_MINUTE'] = '0'
+os.environ['EMAIL_WORKERS'] = '0'
+os.environ['GUNICORN_MAX_REQUESTS'] = '0'  # no worker recycling in the middle of a run
+os.environ.pop('NOTIFICATION_EMAIL', None)
+os.environ['LOG_LEVEL'] = 'ERROR'
+
+from app import RSVP, create_app, db, get_active_party  # noqa: E402
+
+
+def endpoints(codes, label):
+    """name -> make_request(n) for http_load; POSTs use emails unique to `label`"""
+    def submit(n):
+        body = json.dumps({'name': f'Carga {n}', 'email': f'{label}.{n}@example.com',
+                           'attending': 'no', 'number_of_guests': 1}).encode()
+        return 'POST', '/api/rsvp', body, None
+
+    return {
+        'GET /api/party': lambda n: ('GET', '/api/party', None, None),
+        'GET /api/party/stats': lambda n: ('GET', '/api/party/stats', None, None),
+        'GET /api/guests?limit=50': lambda n: ('GET', '/api/guests?limit=50', None, None),
+        'GET /api/rsvp/<code>': lambda n: ('GET', f'/api/rsvp/{codes[n % len(codes)]}', None, None),
+        'POST /api/rsvp': submit,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 50, 500])
+    parser.add_argument('--duration', type=float, default=5, help='seconds per endpoint and client count')
+    parser.add_argument('--rows', type=int, default=1000, help='seeded RSVPs')
+    parser.add_argument('--workers', type=int, default=1, help='server worker processes')
+    parser.add_argument('--servers', nargs='+', default=list(SERVER_COMMANDS), choices=list(SERVER_COMMANDS))
+    parser.add_argument('--port', type=int, default=5100)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        seed_rsvps(db, RSVP, get_active_party().id, args.rows)
+        codes = db.session.execute(db.select(RSVP.confirmation_code)).scalars().all()
+        source = db.engine.url.database
+        db.session.remove()
+        db.engine.dispose()  # last connection closed: the WAL is checkpointed into the file
+
+    results = []
+    for server in args.servers:
+        command = SERVER_COMMANDS[server](args.port, args.workers)
+        if not shutil.which(command[0]):
+            print(f'{command[0]} is not installed, skipping {server} (pip install -r requirements-asgi.txt)')
+            continue
+        database = os.path.join(directory, f'{server}.db')
+        shutil.copy(source, database)
+        with serve(command, args.port, {'DATABASE_URL': f'sqlite:///{database}'}):
+            for clients in args.clients:
+                for name, make_request in endpoints(codes, f'{server}{clients}').items():
+                    result = asyncio.run(run_load('127.0.0.1', args.port, make_request, clients, args.duration))
+                    failed = result['requests'] - sum(count for status, count in result['statuses'].items()
+                                                      if status.startswith('2'))
+                    results.append([server, clients, name, f"{result['throughput_rps']:.0f}",
+                                    result['p50_ms'], result['p99_ms'],
+                                    failed + sum(result['errors'].values())])
+                    print('  '.join(map(str, results[-1])), flush=True)
+
+    print(f'\n{args.rows:,} RSVPs, {args.workers} worker(s), {args.duration:g}s per cell')
+    print_table(['server', 'clients', 'request', 'req/s', 'p50 ms', 'p99 ms', 'errors'], results)
+
+
+if __name__ == '__main__':
+    main()
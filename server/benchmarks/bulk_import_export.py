@@ -0,0 +1,99 @@
+"""Throughput and peak memory of POST /api/guests/bulk and GET /api/guests/export.
+
+The upload is generated on the fly and the export is consumed chunk by chunk,
+so the peak traced memory is what the server side holds. It should stay flat
+as the row count grows.
+
+    python -m benchmarks.bulk_import_export [--rows 10000 100000]
+"""
+import argparse
+import io
+import time
+import tracemalloc
+
+from benchmarks.common import ATTENDING_CYCLE, print_table, use_temp_database
+
+use_temp_database()
+
+from app import RSVP, create_app, db  # noqa: E402
+
+
+class CsvUpload(io.RawIOBase):
+    """Readable stream producing `count` CSV rows without building the body"""
+
+    def __init__(self, count, start):
+        self.rows = self._rows(count, start)
+        self.pending = b''
+
+    @staticmethod
+    def _rows(count, start):
+        yield b'name,email,attending,number_of_guests,phone\n'
+        for i in range(start, start + count):
+            attending = ATTENDING_CYCLE[i % len(ATTENDING_CYCLE)]
+            yield f'Convidado {i},guest{i}@example.com,{attending},{1 + i % 3},+351 9{i:08d}\n'.encode()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while len(self.pending) < len(buffer):
+            chunk = next(self.rows, None)
+            if chunk is None:
+                break
+            self.pending += chunk
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+def traced(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    results = []
+    for count in args.rows:
+        with app.app_context():
+            db.session.execute(db.delete(RSVP))
+            db.session.commit()
+
+        def upload():
+            # Hand the stream to the app as-is; data= would be read into memory by the test client
+            environ = {'wsgi.input': CsvUpload(count, 0), 'wsgi.input_terminated': True}
+            return client.post('/api/guests/bulk', content_type='text/csv', environ_overrides=environ).json
+
+        imported, import_seconds, import_peak = traced(upload)
+        assert imported['inserted'] == count, imported
+
+        def download():
+            response = client.get('/api/guests/export', buffered=False)
+            size = sum(len(chunk) for chunk in response.response)
+            response.close()
+            return size
+
+        size, export_seconds, export_peak = traced(download)
+        results.append([
+            count,
+            f'{count / import_seconds:,.0f}', f'{import_peak / 2**20:.1f}',
+            f'{count / export_seconds:,.0f}', f'{export_peak / 2**20:.1f}', f'{size / 2**20:.1f}'
+        ])
+
+    print_table(['rows', 'import rows/s', 'import peak MiB', 'export rows/s', 'export peak MiB', 'export MiB'],
+                results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Latency of GET /api/rsvp/<code> for unknown codes with and without the
+issued code Bloom filter, next to the hit path and the rate limiter's cost.
+
+    python -m benchmarks.code_lookup_miss [--rows 100000] [--requests 2000]
+"""
+import argparse
+import os
+
+from benchmarks.common import measure, print_table, seed_rsvps, use_temp_database
+
+use_temp_database()
+os.environ['RATE_LIMIT_PER_MINUTE'] = '0'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from sqlalchemy import event  # noqa: E402
+
+from app import RSVP, create_app, db, get_active_party, issued_codes, rate_limiter  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        party_id = get_active_party().id
+        seed_rsvps(db, RSVP, party_id, args.rows)
+        known = db.session.execute(db.select(RSVP.confirmation_code).limit(args.requests)).scalars().all()
+        queries = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: queries.append(1))
+
+    codes = app.extensions['confirmation_codes']
+    unknown = [codes.generate() for _ in range(args.requests)]
+    client.get(f'/api/rsvp/{known[0]}')  # builds the filter
+
+    def run(paths, status):
+        def requests():
+            for path in paths:
+                assert client.get(path).status_code == status
+        return requests
+
+    scenarios = []
+    for name, paths, status, use_filter, rate in (
+        ('miss, no filter', unknown, 404, False, 0),
+        ('miss, Bloom filter', unknown, 404, True, 0),
+        ('miss, filter + rate limiter', unknown, 404, True, 1e9),
+        ('hit', known, 200, True, 0),
+    ):
+        issued_codes.enabled = use_filter
+        rate_limiter.rate, rate_limiter.burst = rate, 10 ** 9
+        paths = [f'/api/rsvp/{code}' for code in paths]
+        queries.clear()
+        best, median = measure(run(paths, status), repeat=3)
+        scenarios.append([name, f'{best / len(paths) * 1e6:.0f}', f'{median / len(paths) * 1e6:.0f}',
+                          f'{len(queries) / (3 * len(paths)):.2f}'])
+
+    print(f'{args.rows:,} RSVPs, {args.requests:,} requests per run')
+    print_table(['scenario', 'best us/req', 'median us/req', 'queries/req'], scenarios)
+    stats = issued_codes.stats()
+    print(f"\nfilter: {stats['size_bytes'] / 1024:.0f} KiB, {stats['hashes']} hashes, "
+          f"capacity {stats['capacity']:,}, {stats['rejected']:,} rejected, {stats['passed']:,} passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Cold start of a worker: what `import app` costs (python -X importtime) and
+how long a new process takes to its first 200, with the schema bootstrap in
+create_app() (DB_BOOTSTRAP_ON_STARTUP=True, the default) and without it
+(False: tables, the default party and counters left to `python migrate.py`).
+
+Every sample is a new Python process on the same database, migrated once
+beforehand. In process: import app, create_app() and the first GET /api/party
+through the test client. Over HTTP, when the server is installed: from
+spawning a one-worker server to its first 200 on /api/party. This runs on
+SQLite; against a remote PostgreSQL every table create_all() checks is a
+network round trip, so the bootstrap share of a cold start is larger there.
+
+    python -m benchmarks.cold_start [--repeat 5] [--top 15] [--server wsgi]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.common import SERVER_COMMANDS, SERVER_DIR, print_table, use_temp_database
+
+use_temp_database()
+os.environ['RATE_LIMIT_PER_MINUTE'] = '0'
+os.environ['EMAIL_WORKERS'] = '0'
+os.environ.pop('NOTIFICATION_EMAIL', None)
+os.environ['LOG_LEVEL'] = 'ERROR'
+
+MODES = {
+    'bootstrap on startup': {'DB_BOOTSTRAP_ON_STARTUP': 'True'},
+    'migrate.py only': {'DB_BOOTSTRAP_ON_STARTUP': 'False'},
+}
+
+# Run with `python -c` in a new process; prints its phase timings as JSON
+IN_PROCESS = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+status = flask_app.test_client().get('/api/party').status_code
+print(json.dumps({'import': imported - started, 'create_app': created - imported,
+                  'first_request': time.perf_counter() - created, 'status': status,
+                  'mail_loaded': 'flask_mail' in sys.modules}))
+"""
+
+
+def run_python(args, env=None):
+    return subprocess.run([sys.executable, *args], cwd=SERVER_DIR, env={**os.environ, **(env or {})},
+                          capture_output=True, text=True, check=True)
+
+
+def import_tree(repeat):
+    """(median microseconds of `import app`, [(module, median cumulative us)]
+    for the modules app imports directly), from python -X importtime"""
+    totals, children = [], {}
+    for _ in range(repeat):
+        pending = []
+        for line in run_python(['-X', 'importtime', '-c', 'import app']).stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            _, cumulative, name = line.split('|')
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            if depth == 1:
+                pending.append((name.strip(), int(cumulative)))
+            elif depth == 0:
+                if name.strip() == 'app':
+                    totals.append(int(cumulative))
+                    for module, us in pending:
+                        children.setdefault(module, []).append(us)
+                pending = []
+    modules = sorted(((module, statistics.median(us)) for module, us in children.items()), key=lambda m: -m[1])
+    return statistics.median(totals), modules
+
+
+def in_process(env):
+    started = time.perf_counter()
+    timings = json.loads(run_python(['-c', IN_PROCESS], env).stdout)
+    timings['process'] = time.perf_counter() - started
+    assert timings['status'] == 200, timings
+    return timings
+
+
+def time_to_first_200(command, port, env, timeout=30):
+    """Seconds from spawning the server to its first 200 on /api/party"""
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=SERVER_DIR, env={**os.environ, **env, 'PORT': str(port)},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/party', timeout=5) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                if process.poll() is not None or time.perf_counter() - started > timeout:
+                    raise RuntimeError(f'{command[0]} did not answer on port {port}')
+            time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5, help='processes per case')
+    parser.add_argument('--top', type=int, default=15, help='modules listed from the import tree')
+    parser.add_argument('--server', default='wsgi', choices=list(SERVER_COMMANDS), help='server for the HTTP case')
+    parser.add_argument('--port', type=int, default=5100)
+    args = parser.parse_args()
+
+    run_python(['migrate.py'])  # the schema, the default party and its counters
+    run_python(['-c', 'import app'])  # bytecode is compiled before anything is timed
+
+    total, modules = import_tree(args.repeat)
+    print(f'import app: {total / 1000:.0f} ms (median of {args.repeat}, python -X importtime)')
+    print_table(['module', 'cumulative ms', 'share'],
+                [[module, f'{us / 1000:.1f}', f'{us / total:.0%}'] for module, us in modules[:args.top]])
+
+    command = SERVER_COMMANDS[args.server](args.port, 1)
+    http = shutil.which(command[0]) is not None
+    if not http:
+        print(f'\n{command[0]} is not installed: no HTTP case')
+
+    results = []
+    for mode, env in MODES.items():
+        samples = [in_process(env) for _ in range(args.repeat)]
+        median = lambda key: statistics.median(s[key] for s in samples) * 1000  # noqa: E731
+        first_200 = statistics.median(time_to_first_200(command, args.port, env)
+                                      for _ in range(args.repeat)) if http else None
+        results.append([mode, f"{median('import'):.0f}", f"{median('create_app'):.1f}",
+                        f"{median('first_request'):.1f}", f"{median('process'):.0f}",
+                        f'{first_200 * 1000:.0f}' if first_200 is not None else '-',
+                        'yes' if any(s['mail_loaded'] for s in samples) else 'no'])
+
+    print()
+    print_table(['mode', 'import ms', 'create_app ms', 'first request ms', 'process ms',
+                 f'{args.server} first 200 ms', 'Flask-Mail loaded'], results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Shared helpers for the benchmark scripts.
+
+Run them from the server directory, for example:
+
+    python -m benchmarks.notification_render
+"""
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def use_temp_database():
+    """Point the app at a throwaway SQLite file. Call before importing app."""
+    directory = tempfile.mkdtemp(prefix='party-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+    return directory
+
+
+def measure(fn, repeat=5):
+    """Run fn `repeat` times and return (best, median) wall time in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), statistics.median(timings)
+
+
+# Server commands for the HTTP benchmarks, by name: command(port, workers)
+SERVER_COMMANDS = {
+    'wsgi': lambda port, workers: ['gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers),
+                                   '--bind', f'127.0.0.1:{port}', 'wsgi:app'],
+    'asgi': lambda port, workers: ['uvicorn', 'asgi:app', '--port', str(port), '--workers', str(workers),
+                                   '--log-level', 'warning', '--no-access-log'],
+}
+
+
+@contextmanager
+def serve(command, port, env=None, timeout=30):
+    """Run a server command from the server directory until /api/health answers on `port`"""
+    process = subprocess.Popen(command, cwd=SERVER_DIR, env={**os.environ, **(env or {}), 'PORT': str(port)},
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f'{command[0]} did not start on port {port}')
+                time.sleep(0.2)
+        yield process
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print('  '.join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print('  '.join(str(c).ljust(w) for c, w in zip(row, widths)))
+
+
+ATTENDING_CYCLE = ('yes', 'yes', 'no', 'maybe')
+
+
+def seed_rsvps(db, RSVP, party_id, count, chunk_size=10000, start=0):
+    """Bulk insert `count` synthetic RSVPs for a party (executemany in chunks)"""
+    from app import ConfirmationCodeGenerator  # app reads DATABASE_URL at import
+
+    codes = ConfirmationCodeGenerator()
+    base = datetime(2024, 6, 1, 12, 0)
+    for offset in range(start, start + count, chunk_size):
+        rows = [{
+            'party_id': party_id,
+            'name': f'Convidado {i}',
+            'email': f'guest{i}.p{party_id}@example.com',
+            'phone': f'+351 9{i % 100000000:08d}',
+            'attending': ATTENDING_CYCLE[i % len(ATTENDING_CYCLE)],
+            'number_of_guests': 1 + i % 3,
+            'confirmation_code': codes.encode((party_id << 24) + i),
+            'submitted_at': base + timedelta(seconds=i)
+        } for i in range(offset, min(offset + chunk_size, start + count))]
+        db.session.execute(db.insert(RSVP), rows)
+        db.session.commit()
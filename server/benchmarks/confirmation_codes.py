@@ -0,0 +1,51 @@
+"""Confirmation code generation and validation throughput.
+
+Compares the old per-character secrets.choice loop with
+ConfirmationCodeGenerator, times normalize() on valid and mistyped codes (the
+check that now runs before any database query) and counts duplicates.
+
+    python -m benchmarks.confirmation_codes [--codes 200000]
+"""
+import argparse
+import secrets
+import string
+
+from benchmarks.common import measure, print_table, use_temp_database
+
+use_temp_database()
+
+from app import ConfirmationCodeGenerator  # noqa: E402
+
+
+def legacy_code():
+    return ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--codes', type=int, default=200000)
+    args = parser.parse_args()
+    count = args.codes
+
+    codes = ConfirmationCodeGenerator()
+    issued = [codes.generate() for _ in range(count)]
+    # One substituted character per code: every one must be rejected
+    mistyped = [code[:-2] + ('0' if code[-2] != '0' else '1') + code[-1] for code in issued]
+
+    timings = {
+        'secrets.choice loop (old)': measure(lambda: [legacy_code() for _ in range(count)], repeat=3),
+        'generate()': measure(lambda: [codes.generate() for _ in range(count)], repeat=3),
+        'normalize() valid': measure(lambda: [codes.normalize(code) for code in issued], repeat=3),
+        'normalize() mistyped': measure(lambda: [codes.normalize(code) for code in mistyped], repeat=3),
+    }
+    print_table(['operation', 'codes/s', 'us/code'], [
+        [name, f'{count / best:,.0f}', f'{best / count * 1e6:.2f}'] for name, (best, _) in timings.items()
+    ])
+
+    accepted = sum(1 for code in mistyped if codes.normalize(code))
+    print(f'\n{count - len(set(issued))} duplicates in {count:,} codes, '
+          f'{accepted} of {count:,} mistyped codes accepted')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Peak memory and time of the streamed guest listings against building one
+jsonify payload, as /api/guests and /api/debug/all-guests used to.
+
+    python -m benchmarks.guest_list_stream [--rows 10000 100000]
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.common import print_table, seed_rsvps, use_temp_database
+
+use_temp_database()
+
+from flask import jsonify  # noqa: E402
+
+from app import GUEST_FIELDS, RSVP, create_app, db, get_active_party, serialize_guest_row  # noqa: E402
+
+
+def legacy_guests(party):
+    rows = db.session.execute(
+        db.select(*(getattr(RSVP, f) for f in GUEST_FIELDS))
+        .where(RSVP.party_id == party.id)
+        .order_by(RSVP.submitted_at.desc(), RSVP.id.desc())
+    ).all()
+    return jsonify([serialize_guest_row(row, GUEST_FIELDS) for row in rows]).get_data()
+
+
+def legacy_debug(party):
+    all_guests = RSVP.query.filter_by(party_id=party.id).order_by(RSVP.submitted_at.desc()).all()
+    guests_by_status = {'yes': [], 'no': [], 'maybe': []}
+    for guest in all_guests:
+        status = guest.attending if guest.attending in ['yes', 'no', 'maybe'] else 'unknown'
+        guests_by_status.setdefault(status, []).append(guest.to_dict())
+    body = jsonify({
+        'total_guests': len(all_guests),
+        'guests_by_status': guests_by_status,
+        'summary': {
+            'attending_yes': len(guests_by_status['yes']),
+            'attending_no': len(guests_by_status['no']),
+            'attending_maybe': len(guests_by_status['maybe'])
+        },
+        'raw_guest_list': [guest.to_dict() for guest in all_guests]
+    }).get_data()
+    db.session.expunge_all()
+    return body
+
+
+def traced(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        party_id = get_active_party().id
+
+    def streamed(path):
+        def run():
+            response = client.get(path, buffered=False)
+            size = sum(len(chunk) for chunk in response.response)
+            response.close()
+            return size
+        return run
+
+    def legacy(build):
+        def run():
+            with app.test_request_context():
+                return len(build(get_active_party()))
+        return run
+
+    results = []
+    seeded = 0
+    for count in args.rows:
+        with app.app_context():
+            seed_rsvps(db, RSVP, party_id, count - seeded, start=seeded)
+        seeded = count
+        for name, path, build in (('/api/guests', '/api/guests', legacy_guests),
+                                  ('/api/debug/all-guests', '/api/debug/all-guests', legacy_debug)):
+            legacy_size, legacy_seconds, legacy_peak = traced(legacy(build))
+            size, seconds, peak = traced(streamed(path))
+            assert size == legacy_size, (size, legacy_size)
+            results.append([
+                name, count, f'{size / 2**20:.1f}',
+                f'{legacy_peak / 2**20:.1f}', f'{peak / 2**20:.1f}',
+                f'{legacy_seconds * 1000:.0f}', f'{seconds * 1000:.0f}'
+            ])
+
+    print_table(['endpoint', 'rows', 'body MiB', 'jsonify peak MiB', 'stream peak MiB',
+                 'jsonify ms', 'stream ms'], results)
+
+
+if __name__ == '__main__':
+    main()
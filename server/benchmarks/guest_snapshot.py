@@ -0,0 +1,89 @@
+"""CPU per GET /api/guests request with the list streamed from the database
+(the previous behaviour, and still the answer for clients that take no
+compression) against the precompressed snapshot, at growing guest counts.
+
+CPU is time.process_time() of the whole process around each request made
+through the test client, with the snapshot builder idle; the cost of one
+rebuild is reported separately.
+
+    python -m benchmarks.guest_snapshot [--rows 10000 100000] [--requests 20]
+"""
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.common import print_table, seed_rsvps, use_temp_database
+
+use_temp_database()
+os.environ['GUEST_SNAPSHOT_DELAY'] = '0'
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+from app import (  # noqa: E402
+    COMPRESS_ENCODINGS, RSVP, create_app, db, get_active_party, guest_snapshots, rebuild_party_counter
+)
+
+
+def run(client, headers, requests):
+    """Median CPU and wall time per request, and the response size"""
+    cpu, wall = [], []
+    for _ in range(requests):
+        started_cpu, started = time.process_time(), time.perf_counter()
+        response = client.get('/api/guests', headers=headers, buffered=False)
+        size = sum(len(chunk) for chunk in response.response)
+        response.close()
+        cpu.append(time.process_time() - started_cpu)
+        wall.append(time.perf_counter() - started)
+    return statistics.median(cpu), statistics.median(wall), size, response.headers.get('Content-Encoding')
+
+
+def wait_for_build(builds):
+    while guest_snapshots.builds < builds:
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--requests', type=int, default=20, help='requests per case')
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    max_parties = guest_snapshots.max_parties
+    with app.app_context():
+        party_id = get_active_party().id
+
+    results = []
+    seeded = 0
+    for rows in sorted(args.rows):
+        with app.app_context():
+            seed_rsvps(db, RSVP, party_id, rows - seeded, start=seeded)
+            rebuild_party_counter(party_id)  # new guest list version: the snapshot is stale
+            db.session.commit()
+        seeded = rows
+
+        guest_snapshots.max_parties = 0
+        cases = [('streamed', run(client, {}, args.requests))]
+
+        guest_snapshots.max_parties = max_parties
+        builds = guest_snapshots.builds
+        build_seconds = guest_snapshots.build_seconds
+        client.get('/api/guests', headers={'Accept-Encoding': 'gzip'}).close()  # queues the build
+        wait_for_build(builds + 1)
+        rebuild = guest_snapshots.build_seconds - build_seconds
+        for encoding in COMPRESS_ENCODINGS:
+            cases.append((f'snapshot {encoding}', run(client, {'Accept-Encoding': encoding}, args.requests)))
+
+        baseline = cases[0][1][0]
+        for name, (cpu, wall, size, content_encoding) in cases:
+            results.append([f'{rows:,}', name, content_encoding or 'identity', f'{cpu * 1000:.2f}',
+                            f'{wall * 1000:.2f}', f'{size / 1024:.0f}', f'{baseline / cpu:.0f}x' if cpu else '-',
+                            f'{rebuild * 1000:.0f}' if name != 'streamed' else '-'])
+
+    print_table(['rows', 'case', 'encoding', 'CPU ms/req', 'wall ms/req', 'KiB', 'CPU saved', 'rebuild ms'],
+                results)
+
+
+if __name__ == '__main__':
+    main()
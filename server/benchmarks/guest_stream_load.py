@@ -0,0 +1,106 @@
+"""Idle /api/guests/stream subscribers held by one worker, and the cost of
+fanning a change out to all of them.
+
+Every stream is opened through the test client and read up to the end of its
+snapshot, which leaves it parked the way an idle browser connection is: no
+app context, no database connection, an empty queue. The script reports the
+memory per idle subscriber, the time POST /api/rsvp takes to publish to all
+of them and checks that every stream received the event. Under gunicorn's
+gevent worker each stream also costs one parked greenlet (a few KiB).
+
+    python -m benchmarks.guest_stream_load [--subscribers 1000 5000] [--rows 50]
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+from benchmarks.common import print_table, seed_rsvps, use_temp_database
+
+use_temp_database()
+os.environ['RATE_LIMIT_PER_MINUTE'] = '0'
+os.environ['GUEST_STREAM_HEARTBEAT'] = '3600'
+os.environ['GUEST_STREAM_MAX_SUBSCRIBERS'] = '100000'
+os.environ.setdefault('MAIL_SUPPRESS_SEND', 'true')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from app import RSVP, create_app, db, get_active_party, guest_events  # noqa: E402
+
+STREAM_PATH = '/api/guests/stream?attending=yes&fields=id,name,attending,submitted_at'
+
+
+def rss_kib():
+    """Resident set size from /proc (Linux), or None"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def open_stream(client):
+    response = client.get(STREAM_PATH, buffered=False)
+    assert response.status_code == 200, response.status_code
+    chunks = iter(response.response)
+    received = b''
+    while not received.endswith(b'\n\n') or received == b'retry: 3000\n\n':
+        received += next(chunks)
+    return response, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--subscribers', type=int, nargs='+', default=[1000, 5000])
+    parser.add_argument('--rows', type=int, default=50, help='guests in each snapshot')
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        seed_rsvps(db, RSVP, get_active_party().id, args.rows)
+
+    results = []
+    for count in args.subscribers:
+        rss_before = rss_kib()
+        tracemalloc.start()
+        start = time.perf_counter()
+        streams = [open_stream(client) for _ in range(count)]
+        open_seconds = time.perf_counter() - start
+        traced = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        rss_after = rss_kib()
+        assert guest_events.stats()['subscribers'] == count
+
+        start = time.perf_counter()
+        response = client.post('/api/rsvp', json={
+            'name': f'Convidado extra {count}', 'email': f'extra{count}@example.com',
+            'attending': 'yes', 'number_of_guests': 1
+        })
+        publish_seconds = time.perf_counter() - start
+        assert response.status_code == 201, response.json
+
+        start = time.perf_counter()
+        received = sum(next(chunks).startswith(b'event: add') for _, chunks in streams)
+        drain_seconds = time.perf_counter() - start
+        for stream, _ in streams:
+            stream.close()
+        assert guest_events.stats()['subscribers'] == 0
+
+        results.append([
+            count, f'{open_seconds / count * 1000:.2f}',
+            f'{traced / count / 1024:.1f}',
+            f'{(rss_after - rss_before) / count:.1f}' if rss_before is not None else '-',
+            f'{publish_seconds * 1000:.1f}', f'{drain_seconds / count * 1e6:.1f}',
+            f'{received}/{count}'
+        ])
+
+    print(f'{args.rows} guests per snapshot')
+    print_table(['subscribers', 'open ms/stream', 'traced KiB/sub', 'RSS KiB/sub',
+                 'POST /api/rsvp ms', 'read us/sub', 'received'], results)
+    print(f'\n{guest_events.stats()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""Closed-loop HTTP/1.1 load generator on asyncio, with no dependencies.
+
+Each client holds one keep-alive connection and sends its next request as soon
+as the previous response has been read, for `duration` seconds after a short
+warm-up. A client's first request (connection setup, cold caches) is never
+measured, and every client gets at least one measured request in, so slow
+routes report real latencies rather than nothing. Used by the server
+benchmarks; it can also be pointed at any running server:
+
+    python -m benchmarks.http_load http://127.0.0.1:5000/api/party [--clients 50] [--duration 10]
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+
+class Connection:
+    """One keep-alive connection; reopened when the server closes it.
+
+    With keep_body=False response bodies are read and dropped in 64 KiB
+    pieces, so large responses cost the client no memory.
+    """
+
+    READ_SIZE = 65536
+
+    def __init__(self, host, port, keep_body=True):
+        self.host = host
+        self.port = port
+        self.keep_body = keep_body
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        """Send a request and read the whole response: (status, headers, body)"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        if body is not None:
+            lines += ['Content-Type: application/json', f'Content-Length: {len(body)}']
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + (body or b''))
+        try:
+            return await self._read_response(method)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.close()
+            raise
+
+    async def _read_response(self, method):
+        head = (await self.reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+        status = int(head[0].split()[1])
+        headers = {}
+        for line in head[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+        pieces = []
+        if method == 'HEAD' or status in (204, 304):
+            pass
+        elif 'content-length' in headers:
+            await self._read_exactly(int(headers['content-length']), pieces)
+        elif headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                await self._read_exactly(size, pieces)
+                await self.reader.readexactly(2)
+                if not size:
+                    break
+        else:
+            while piece := await self.reader.read(self.READ_SIZE):
+                self._keep(piece, pieces)
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, headers, b''.join(pieces)
+
+    async def _read_exactly(self, size, pieces):
+        while size:
+            piece = await self.reader.readexactly(min(size, self.READ_SIZE))
+            self._keep(piece, pieces)
+            size -= len(piece)
+
+    def _keep(self, piece, pieces):
+        if self.keep_body:
+            pieces.append(piece)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else None
+
+
+async def run_load(host, port, make_request, clients, duration, warmup=1.0):
+    """Drive `clients` concurrent connections for `duration` seconds.
+
+    make_request(n) returns (method, path, body bytes or None, headers or None)
+    for the n-th request overall. Returns the summary() of what was measured;
+    throughput is over the time from the end of the warm-up to the last
+    measured response.
+    """
+    latencies = []
+    statuses = Counter()
+    errors = Counter()
+    counter = iter(range(10 ** 12))
+    measure_from = time.perf_counter() + warmup
+    stop_at = measure_from + duration
+    finished_at = measure_from
+
+    async def client():
+        nonlocal finished_at
+        connection = Connection(host, port, keep_body=False)
+        primed = False
+        measured = 0
+        while True:
+            started = time.perf_counter()
+            if started >= stop_at and measured:
+                break
+            method, path, body, headers = make_request(next(counter))
+            try:
+                status, _, _ = await connection.request(method, path, body, headers)
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                if started >= measure_from:
+                    errors[type(e).__name__] += 1
+                    measured += 1
+                await asyncio.sleep(0.01)
+                continue
+            if primed and started >= measure_from:
+                now = time.perf_counter()
+                latencies.append(now - started)
+                finished_at = max(finished_at, now)
+                statuses[status] += 1
+                measured += 1
+            primed = True
+        connection.close()
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return summary(latencies, statuses, errors, max(finished_at - measure_from, duration))
+
+
+def summary(latencies, statuses, errors, seconds):
+    ordered = sorted(latencies)
+    ms = lambda value: round(value * 1000, 2) if value is not None else None  # noqa: E731
+    return {
+        'requests': len(ordered),
+        'throughput_rps': round(len(ordered) / seconds, 1),
+        'p50_ms': ms(percentile(ordered, 0.50)),
+        'p95_ms': ms(percentile(ordered, 0.95)),
+        'p99_ms': ms(percentile(ordered, 0.99)),
+        'max_ms': ms(ordered[-1] if ordered else None),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'errors': dict(errors)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('url')
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--body', help='JSON request body')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    path = url.path + (f'?{url.query}' if url.query else '')
+    body = args.body.encode() if args.body else None
+    result = asyncio.run(run_load(url.hostname, url.port or 80, lambda n: (args.method, path, body, None),
+                                  args.clients, args.duration))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Bytes on the wire and serialization time per endpoint: the json module
+against orjson (FastJSONProvider with JSON_ENCODER=json / orjson), and the
+response size uncompressed, gzip and (with brotli installed) br.
+
+Encoding time is measured on each endpoint's own payload, outside the
+request, so it is the serializer's share of the request alone; compression
+time is that of one compress() of the uncompressed body.
+
+    python -m benchmarks.json_compression [--rows 10000] [--repeat 5]
+"""
+import argparse
+import json
+import os
+
+from benchmarks.common import measure, print_table, seed_rsvps, use_temp_database
+
+use_temp_database()
+os.environ['RATE_LIMIT_PER_MINUTE'] = '0'
+os.environ['EMAIL_WORKERS'] = '0'
+os.environ['GUEST_SNAPSHOT_PARTIES'] = '0'  # every /api/guests is encoded, not served from a snapshot
+os.environ.pop('NOTIFICATION_EMAIL', None)
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+from app import (  # noqa: E402
+    COMPRESS_ENCODINGS, FastJSONProvider, RSVP, compress, create_app, db, get_active_party, rebuild_party_counter
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=10000, help='seeded RSVPs')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    level = app.config['COMPRESS_LEVEL']
+    with app.app_context():
+        party_id = get_active_party().id
+        seed_rsvps(db, RSVP, party_id, args.rows)
+        rebuild_party_counter(party_id)
+        db.session.commit()
+        code = db.session.execute(db.select(RSVP.confirmation_code).limit(1)).scalar()
+
+    encoders = {}
+    for backend in ('json', 'orjson'):
+        app.config['JSON_ENCODER'] = backend
+        provider = FastJSONProvider(app)
+        if provider.backend == backend:
+            encoders[backend] = provider.encode_compact
+
+    paths = ['/api/party', '/api/party/stats', f'/api/rsvp/{code}', '/api/guests?limit=50', '/api/guests',
+             '/api/debug/all-guests', '/api/guests/export', '/api/metrics']
+    results = []
+    for path in paths:
+        response = client.get(path)
+        body = response.get_data()
+        assert response.status_code == 200, (path, response.status_code)
+        row = [path, f'{len(body):,}']
+
+        sizes = {}
+        for encoding in COMPRESS_ENCODINGS:
+            compressed = client.get(path, headers={'Accept-Encoding': encoding})
+            sizes[encoding] = len(compressed.get_data()) if compressed.headers.get('Content-Encoding') else len(body)
+        row += [f"{sizes['gzip']:,}", f"{sizes['br']:,}" if 'br' in sizes else '-',
+                f'{len(body) / sizes["gzip"]:.1f}x']
+
+        timings = {}
+        if response.mimetype == 'application/json':
+            payload = json.loads(body)
+            with app.app_context():
+                for backend, encode in encoders.items():
+                    timings[backend] = measure(lambda: encode(payload), args.repeat)[0]
+        row += [f"{timings[backend] * 1000:.3f}" if backend in timings else '-' for backend in ('json', 'orjson')]
+        row.append(f"{timings['json'] / timings['orjson']:.1f}x" if len(timings) == 2 else '-')
+        row.append(f"{measure(lambda: compress(body, 'gzip', level), args.repeat)[0] * 1000:.3f}")
+        results.append(row)
+
+    print(f'{args.rows:,} RSVPs; compression from {app.config["COMPRESS_MIN_SIZE"]} bytes at level {level}')
+    print_table(['endpoint', 'bytes', 'gzip', 'br', 'ratio', 'json ms', 'orjson ms', 'speed-up', 'gzip ms'], results)
+
+
+if __name__ == '__main__':
+    main()
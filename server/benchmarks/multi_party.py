@@ -0,0 +1,111 @@
+"""Per-request cost of the party-scoped routes as the number of parties grows.
+
+Parties are added in steps (each with --rsvps RSVPs) and after every step the
+same requests are made against randomly chosen parties. With party_id-leading
+indexes and per-party caches the latency and the queries per request should
+stay flat from the first step to the last.
+
+    python -m benchmarks.multi_party [--parties 10 100 1000 10000] [--rsvps 1000]
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from collections import Counter
+from datetime import datetime
+
+from benchmarks.common import ATTENDING_CYCLE, print_table, seed_rsvps, use_temp_database
+
+use_temp_database()
+os.environ['RATE_LIMIT_PER_MINUTE'] = '0'
+os.environ['EMAIL_WORKERS'] = '0'
+os.environ.pop('NOTIFICATION_EMAIL', None)
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+from sqlalchemy import event  # noqa: E402
+
+from app import Party, PartyCounter, RSVP, create_app, db  # noqa: E402
+
+
+def add_parties(first_id, count, rsvps):
+    """Insert `count` parties with `rsvps` RSVPs each, and their party_counters rows"""
+    db.session.execute(db.insert(Party), [{
+        'id': party_id, 'title': f'Festa {party_id}', 'max_guests': rsvps * 10,
+        'rsvp_deadline': datetime(2100, 1, 1)
+    } for party_id in range(first_id, first_id + count)])
+    db.session.commit()
+    for party_id in range(first_id, first_id + count):
+        seed_rsvps(db, RSVP, party_id, rsvps)
+
+    # Every party gets the same synthetic RSVPs, so the aggregates are identical
+    statuses = Counter(ATTENDING_CYCLE[i % len(ATTENDING_CYCLE)] for i in range(rsvps))
+    attending = sum(1 + i % 3 for i in range(rsvps) if ATTENDING_CYCLE[i % len(ATTENDING_CYCLE)] == 'yes')
+    db.session.execute(db.insert(PartyCounter), [{
+        'party_id': party_id, 'guests_version': 1, 'total_rsvps': rsvps, 'total_attending': attending,
+        'attending_yes': statuses['yes'], 'attending_no': statuses['no'], 'attending_maybe': statuses['maybe']
+    } for party_id in range(first_id, first_id + count)])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--parties', type=int, nargs='+', default=[10, 100, 1000, 10000])
+    parser.add_argument('--rsvps', type=int, default=1000, help='RSVPs per party')
+    parser.add_argument('--requests', type=int, default=300, help='requests per endpoint and step')
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    codes = app.extensions['confirmation_codes']
+    with app.app_context():
+        queries = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: queries.append(1))
+        db.session.execute(db.delete(RSVP))
+        db.session.execute(db.delete(PartyCounter))
+        db.session.execute(db.delete(Party))
+        db.session.commit()
+
+    endpoints = {
+        'GET party': lambda pid, i: client.get(f'/api/parties/{pid}'),
+        'GET stats': lambda pid, i: client.get(f'/api/parties/{pid}/stats'),
+        'GET guests?limit=50': lambda pid, i: client.get(f'/api/parties/{pid}/guests?limit=50'),
+        'GET rsvp/<code>': lambda pid, i: client.get(
+            f'/api/parties/{pid}/rsvp/{codes.encode((pid << 24) + i % args.rsvps)}'),
+        'POST rsvp': lambda pid, i: client.post(f'/api/parties/{pid}/rsvp', json={
+            'name': f'Extra {i}', 'email': f'extra{i}.{time.monotonic_ns()}@example.com',
+            'attending': 'yes', 'number_of_guests': 1
+        }),
+    }
+
+    results = []
+    seeded = 0
+    for total in args.parties:
+        start = time.perf_counter()
+        with app.app_context():
+            add_parties(seeded + 1, total - seeded, args.rsvps)
+        seeded = total
+        print(f'{total:,} parties x {args.rsvps:,} RSVPs seeded in {time.perf_counter() - start:.0f}s', flush=True)
+
+        rng = random.Random(total)
+        for name, call in endpoints.items():
+            targets = [rng.randint(1, total) for _ in range(args.requests)]
+            for i, party_id in enumerate(targets):  # warm-up: fills caches and the code filter
+                call(party_id, i)
+            timings = []
+            queries.clear()
+            for i, party_id in enumerate(targets):
+                started = time.perf_counter()
+                response = call(party_id, i + args.requests)
+                timings.append(time.perf_counter() - started)
+                assert response.status_code in (200, 201), (name, response.status_code, response.json)
+            timings.sort()
+            results.append([f'{total:,}', name, f'{statistics.median(timings) * 1e6:.0f}',
+                            f'{timings[int(len(timings) * 0.95)] * 1e6:.0f}',
+                            f'{len(queries) / len(targets):.2f}'])
+
+    print_table(['parties', 'request', 'p50 us', 'p95 us', 'queries/req'], results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Render time of the guest notification email: precompiled templates vs the
+original string-concatenation implementation.
+
+"templates" renders every guest given, in one pass that extends a list with
+each row's pieces and joins it once; "legacy" grows the bodies with +=.
+The "capped" column renders what a real notification contains, i.e. the
+newest NOTIFICATION_GUEST_LIST_LIMIT guests plus the exact total.
+
+    python -m benchmarks.notification_render [--sizes 10,1000,100000]
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from benchmarks.common import measure, print_table, use_temp_database
+
+use_temp_database()
+
+from app import Party, create_app, render_notification_bodies  # noqa: E402
+
+
+def legacy_render(new_guest_name, all_guests):
+    """Body building from the original send_notification_email (+= in a loop)"""
+    html_body = f"""
+        <html>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 20px; border-radius: 10px; color: white; text-align: center;">
+                <h1>🎉 Festa de Aniversário do Darius!</h1>
+                <h2>{new_guest_name} confirmou presença!</h2>
+            </div>
+            
+            <div style="padding: 20px;">
+                <h3 style="color: #667eea;">📝 Lista Atualizada de Convidados ({len(all_guests)} pessoas):</h3>
+                <div style="background-color: #f8f9fa; padding: 15px; border-radius: 8px; border-left: 4px solid #667eea;">
+                    <ul style="list-style: none; padding: 0;">
+        """
+    for i, guest in enumerate(all_guests, 1):
+        guest_name = guest.get('name', 'Desconhecido')
+        submitted_time = guest.get('submitted_at', '')
+        html_body += f"""
+                        <li style="padding: 8px 0; border-bottom: 1px solid #eee;">
+                            <span style="font-weight: bold; color: #667eea;">#{i}</span> 
+                            🎈 {guest_name}
+                            <span style="color: #6c757d; font-size: 0.9em; margin-left: 10px;">
+                                ({submitted_time[:10] if submitted_time else 'Data desconhecida'})
+                            </span>
+                        </li>
+            """
+    html_body += """
+                    </ul>
+                </div>
+                
+                <div style="margin-top: 30px; padding: 15px; background-color: #e8f4f8; border-radius: 8px;">
+                    <p style="margin: 0; color: #0c63e4;">
+                        <strong>🎊 Detalhes da Festa:</strong><br>
+                        📅 27 de Julho, 2024 às 17:00<br>
+                        📍 Urbanização Quinta do Eucalipto nº4, 8005-227 Faro<br>
+                        👥 Total de Convidados: """ + str(len(all_guests)) + """
+                    </p>
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+    text_body = f"""
+        🎉 Nova Confirmação de Presença!
+        
+        {new_guest_name} confirmou presença na festa!
+        
+        📝 Lista Atualizada de Convidados ({len(all_guests)} pessoas):
+        """
+    for i, guest in enumerate(all_guests, 1):
+        guest_name = guest.get('name', 'Desconhecido')
+        text_body += f"\n#{i} 🎈 {guest_name}"
+    text_body += f"""
+        
+        👥 Total de Convidados: {len(all_guests)}
+        """
+    return text_body, html_body
+
+
+def make_guests(count):
+    start = datetime(2024, 6, 1, 12, 0)
+    return [{'name': f'Convidado {i}', 'submitted_at': (start + timedelta(minutes=i)).isoformat()}
+            for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,1000,100000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    party = Party(title='Festa de Aniversário do Darius', date=datetime(2024, 7, 27, 17, 0), time='17:00',
+                  address='Urbanização Quinta do Eucalipto nº4, 8005-227 Faro')
+    app = create_app()
+    limit = app.config['NOTIFICATION_GUEST_LIST_LIMIT']
+    rows = []
+    with app.app_context():
+        for size in (int(s) for s in args.sizes.split(',')):
+            guests = make_guests(size)
+            _, legacy = measure(lambda: legacy_render('Novo', guests), args.repeat)
+            _, full = measure(lambda: render_notification_bodies(party, ['Novo'], guests, size), args.repeat)
+            _, capped = measure(
+                lambda: render_notification_bodies(party, ['Novo'], guests[:limit], size), args.repeat)
+            rows.append((size, f'{legacy * 1000:.2f}', f'{full * 1000:.2f}', f'{capped * 1000:.2f}',
+                         f'{legacy / full:.1f}x', f'{legacy / capped:.1f}x'))
+    print_table(('guests', 'legacy ms', 'templates ms', f'capped ({limit}) ms', 'legacy/templates',
+                 'legacy/capped'), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Hydrating RSVP/Party ORM objects against the Core read path the read-only
+routes use (selected columns into rows, PartyRow for parties).
+
+Three cases per --rows volume: the whole guest list as dicts (ORM select +
+to_dict() against a column select + serialize_guest_row), the /api/rsvp/<code>
+lookup (ORM object and its lazy-loaded party against one row and the cached
+party) and loading a party. Times, peak traced memory and queries per lookup.
+
+    python -m benchmarks.orm_bypass [--rows 10000 100000] [--lookups 2000]
+"""
+import argparse
+import os
+import random
+import time
+import tracemalloc
+
+from benchmarks.common import measure, print_table, seed_rsvps, use_temp_database
+
+use_temp_database()
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+from sqlalchemy import event  # noqa: E402
+
+from app import (  # noqa: E402
+    GUEST_FIELDS, RSVP, Party, PartyRow, create_app, db, get_active_party, get_cached_party, party_query,
+    rsvp_lookup_query, serialize_guest_row
+)
+
+
+def orm_guests(party_id):
+    rsvps = db.session.execute(
+        db.select(RSVP).where(RSVP.party_id == party_id).order_by(RSVP.submitted_at.desc(), RSVP.id.desc())
+    ).scalars().all()
+    guests = [rsvp.to_dict() for rsvp in rsvps]
+    db.session.expunge_all()
+    return guests
+
+
+def core_guests(party_id):
+    rows = db.session.execute(
+        db.select(*(getattr(RSVP, f) for f in GUEST_FIELDS))
+        .where(RSVP.party_id == party_id)
+        .order_by(RSVP.submitted_at.desc(), RSVP.id.desc())
+    )
+    return [serialize_guest_row(row, GUEST_FIELDS) for row in rows]
+
+
+def orm_lookup(code):
+    rsvp = RSVP.query.filter_by(confirmation_code=code).first()
+    body = {'rsvp': rsvp.to_dict(), 'party': rsvp.party.to_dict()}
+    db.session.expunge_all()  # a request starts with an empty session
+    return body
+
+
+def core_lookup(code):
+    row = db.session.execute(rsvp_lookup_query(code)).first()
+    return {'rsvp': serialize_guest_row(row, GUEST_FIELDS), 'party': get_cached_party(row.party_id).to_dict()}
+
+
+def orm_party(party_id):
+    loaded = db.session.get(Party, party_id)
+    party = Party(**{c.key: getattr(loaded, c.key) for c in Party.__table__.columns})  # the old detached copy
+    db.session.expunge_all()
+    return party
+
+
+def core_party(party_id):
+    return PartyRow(*db.session.execute(party_query(party_id)).first())
+
+
+def traced(fn, *args):
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--lookups', type=int, default=2000, help='code lookups and party loads per case')
+    args = parser.parse_args()
+
+    app = create_app()
+    codes = app.extensions['confirmation_codes']
+    results = []
+    with app.app_context():
+        queries = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: queries.append(1))
+        party_id = get_active_party().id
+        assert orm_guests(party_id) == core_guests(party_id)
+
+        seeded = 0
+        for rows in sorted(args.rows):
+            seed_rsvps(db, RSVP, party_id, rows - seeded, start=seeded)
+            seeded = rows
+            rng = random.Random(rows)
+            lookup_codes = [codes.encode((party_id << 24) + rng.randrange(rows)) for _ in range(args.lookups)]
+            assert orm_lookup(lookup_codes[0]) == core_lookup(lookup_codes[0])
+
+            orm_time = measure(lambda: orm_guests(party_id), repeat=3)[1]
+            core_time = measure(lambda: core_guests(party_id), repeat=3)[1]
+            results.append([f'{rows:,}', 'guest list', f'{orm_time * 1000:.0f} ms', f'{core_time * 1000:.0f} ms',
+                            f'{orm_time / core_time:.1f}x', f'{traced(orm_guests, party_id) / 2 ** 20:.1f} MiB',
+                            f'{traced(core_guests, party_id) / 2 ** 20:.1f} MiB', '-', '-'])
+
+            for name, orm, core, keys in (('rsvp lookup', orm_lookup, core_lookup, lookup_codes),
+                                          ('party load', orm_party, core_party, [party_id] * args.lookups)):
+                cells = []
+                for fn in (orm, core):
+                    fn(keys[0])  # warm-up: statement caches, the party cache
+                    queries.clear()
+                    started = time.perf_counter()
+                    for key in keys:
+                        fn(key)
+                    cells.append(((time.perf_counter() - started) / len(keys), len(queries) / len(keys)))
+                (orm_time, orm_queries), (core_time, core_queries) = cells
+                results.append([f'{rows:,}', name, f'{orm_time * 1e6:.0f} us', f'{core_time * 1e6:.0f} us',
+                                f'{orm_time / core_time:.1f}x', '-', '-', f'{orm_queries:.2f}', f'{core_queries:.2f}'])
+            db.session.remove()
+
+    print_table(['rows', 'case', 'ORM', 'Core', 'speed-up', 'ORM peak', 'Core peak', 'ORM queries',
+                 'Core queries'], results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Query plans and timings for the hot RSVP lookups with and without the
+uq_rsvps_party_email / ix_rsvps_party_attending_submitted indexes.
+
+    python -m benchmarks.rsvp_indexes [--rows 100000]
+"""
+import argparse
+
+from benchmarks.common import measure, print_table, seed_rsvps, use_temp_database
+
+use_temp_database()
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.schema import CreateIndex, DropIndex  # noqa: E402
+
+from app import RSVP, create_app, db, get_active_party, rebuild_party_counter  # noqa: E402
+
+INDEXES = ('uq_rsvps_party_email', 'ix_rsvps_party_attending_submitted')
+
+
+def queries(party_id, rows):
+    probe = f'GUEST{rows // 2}.P{party_id}@EXAMPLE.COM'
+    return {
+        'duplicate email': db.select(RSVP.id).where(
+            RSVP.party_id == party_id, db.func.lower(RSVP.email) == probe.lower()),
+        'attending, newest 200': db.select(RSVP.name, RSVP.submitted_at).where(
+            RSVP.party_id == party_id, RSVP.attending == 'yes'
+        ).order_by(RSVP.submitted_at.desc()).limit(200),
+        'attending page (keyset)': db.select(RSVP.id, RSVP.name, RSVP.submitted_at).where(
+            RSVP.party_id == party_id, RSVP.attending == 'yes'
+        ).order_by(RSVP.submitted_at.desc(), RSVP.id.desc()).limit(50),
+    }
+
+
+def explain(statement):
+    sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    plan = db.session.execute(text(prefix + sql)).all()
+    return ' | '.join(str(row[-1]) for row in plan)
+
+
+def run(label, party_id, rows, repeat):
+    results = []
+    for name, statement in queries(party_id, rows).items():
+        _, median = measure(lambda: db.session.execute(statement).all(), repeat)
+        results.append((label, name, f'{median * 1000:.3f}', explain(statement)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        party = get_active_party()
+        seed_rsvps(db, RSVP, party.id, args.rows)
+        rebuild_party_counter(party.id)
+        db.session.commit()
+
+        indexes = [index for index in RSVP.__table__.indexes if index.name in INDEXES]
+        for index in indexes:
+            db.session.execute(DropIndex(index))
+        db.session.execute(text('ANALYZE'))
+        results = run('without', party.id, args.rows, args.repeat)
+
+        for index in indexes:
+            db.session.execute(CreateIndex(index))
+        db.session.execute(text('ANALYZE'))
+        results += run('with', party.id, args.rows, args.repeat)
+        db.session.commit()
+
+    print(f'{args.rows} RSVPs, median of {args.repeat} runs')
+    print_table(('indexes', 'query', 'ms', 'plan'), results)
+
+
+if __name__ == '__main__':
+    main()
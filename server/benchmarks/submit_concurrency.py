@@ -0,0 +1,117 @@
+"""Concurrency stress test for POST /api/rsvp.
+
+Fires parallel submits from a thread pool: every email is submitted several
+times (with different casing) and the 'yes' guests add up to more than the
+party's max_guests. Afterwards it checks that there is one RSVP per email,
+that max_guests was never exceeded and that party_counters matches a recount.
+
+    python -m benchmarks.submit_concurrency [--emails 200] [--copies 3] [--threads 16]
+    python -m benchmarks.submit_concurrency --database-url postgresql://...  # uses that database's active party
+
+Exits with status 1 if any check fails.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import print_table, use_temp_database
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--emails', type=int, default=200, help='distinct guests')
+    parser.add_argument('--copies', type=int, default=3, help='submits per guest')
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--capacity', type=int, default=150, help='max_guests for the run')
+    parser.add_argument('--database-url', help='database to test against (default: temp SQLite)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        use_temp_database()
+
+    from app import RSVP, Party, create_app, db, get_active_party, get_party_counter, rebuild_party_counter
+
+    os.environ.setdefault('MAIL_SUPPRESS_SEND', 'true')
+    app = create_app()
+    with app.app_context():
+        party = db.session.get(Party, get_active_party().id)
+        party.max_guests = args.capacity
+        db.session.commit()
+        party_id = party.id
+        run = int(time.time())
+
+    requests = []
+    for i in range(args.emails):
+        for copy in range(args.copies):
+            email = f'stress{run}.{i}@example.com'
+            requests.append({
+                'name': f'Convidado {i}',
+                'email': email.upper() if copy % 2 else email,
+                'attending': 'yes' if i % 4 else 'no',
+                'number_of_guests': 1 + i % 2
+            })
+    # Interleave the copies so duplicates race each other
+    requests.sort(key=lambda r: (hash(r['email'].lower()) % 7, r['email']))
+
+    client = app.test_client()
+
+    def submit(payload):
+        start = time.perf_counter()
+        response = client.post('/api/rsvp', json=payload)
+        return response.status_code, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(submit, requests))
+    elapsed = time.perf_counter() - start
+
+    statuses = Counter(status for status, _ in results)
+    latencies = sorted(latency for _, latency in results)
+    print_table(['submits', 'threads', 'seconds', 'req/s', 'p50 ms', 'p99 ms', 'statuses'], [[
+        len(results), args.threads, f'{elapsed:.2f}', f'{len(results) / elapsed:.0f}',
+        f'{latencies[len(latencies) // 2] * 1000:.1f}', f'{latencies[int(len(latencies) * 0.99)] * 1000:.1f}',
+        ' '.join(f'{code}x{count}' for code, count in sorted(statuses.items()))
+    ]])
+
+    failures = []
+    with app.app_context():
+        prefix = f'stress{run}.%'
+        per_email = db.session.execute(
+            db.select(db.func.lower(RSVP.email), db.func.count())
+            .where(RSVP.party_id == party_id, RSVP.email.ilike(prefix))
+            .group_by(db.func.lower(RSVP.email))
+        ).all()
+        duplicated = [email for email, count in per_email if count > 1]
+        if duplicated:
+            failures.append(f'{len(duplicated)} emails have more than one RSVP')
+        if statuses.get(500):
+            failures.append(f'{statuses[500]} submits failed with 500')
+        if statuses.get(201, 0) != len(per_email):
+            failures.append(f'{statuses.get(201, 0)} submits returned 201 but {len(per_email)} RSVPs were stored')
+
+        counter = get_party_counter(party_id).to_dict()
+        if counter['total_attending'] > args.capacity:
+            failures.append(f"total_attending {counter['total_attending']} exceeds max_guests {args.capacity}")
+        recount = rebuild_party_counter(party_id).to_dict()
+        db.session.rollback()
+        if counter != recount:
+            failures.append(f'party_counters is {counter}, recount gives {recount}')
+
+    print(f"stored {len(per_email)} RSVPs, {counter['total_attending']}/{args.capacity} guests attending")
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    if not failures:
+        print('OK: no duplicates, capacity respected, counters consistent')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
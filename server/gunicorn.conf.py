@@ -0,0 +1,62 @@
+"""Gunicorn settings for the production server.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Each worker process runs `threads` request threads (gthread), so the
+SQLAlchemy pool (DB_POOL_SIZE + DB_MAX_OVERFLOW) should be at least
+GUNICORN_THREADS per worker.
+
+Every open /api/guests/stream holds its request for as long as the browser
+stays connected, which under gthread means one thread per viewer. So under
+gthread GUEST_STREAM_MAX_SUBSCRIBERS defaults to half the threads: further
+streams get a 503 and the client polls /api/guests (ETag, 304) instead, and
+the other threads keep serving the API. With
+GUNICORN_WORKER_CLASS=gevent (pip install -r requirements-gevent.txt) an idle
+stream is a parked greenlet instead and a worker holds up to
+GUNICORN_WORKER_CONNECTIONS of them; streams give their database connection
+back after the initial snapshot.
+
+gevent is opt-in because it only helps where the code yields. psycopg2 yields
+once psycogreen is installed (patched in post_fork below); sqlite3 never does,
+and CPU-bound work such as a guest list snapshot rebuild runs without a
+switch. Either one stalls every request of the worker while it runs, so use
+gevent with PostgreSQL only.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Set here rather than in load_config: only the server knows its threads
+if worker_class == 'gthread':
+    os.environ.setdefault('GUEST_STREAM_MAX_SUBSCRIBERS', str(threads // 2))
+
+# Recycle workers now and then to bound memory growth; jitter avoids all
+# workers restarting at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = 100
+
+# Every worker builds its own app, engine and email workers after the fork
+preload_app = False
+
+# The app writes its own JSON access log line per request
+accesslog = None
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # gevent patches the standard library, not C database drivers
+    if server.cfg.worker_class_str != 'gevent':
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        server.log.warning("psycogreen is not installed: PostgreSQL queries block the whole gevent worker")
+        return
+    patch_psycopg()
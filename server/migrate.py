@@ -0,0 +1,162 @@
+"""Schema migrations for databases created before a change to the models.
+
+db.create_all() only creates missing tables, so new indexes or columns on an
+existing table have to be added here. Each migration runs once; applied
+versions are recorded in the schema_migrations table.
+
+app.init_database() creates missing tables and runs the pending migrations
+when a worker starts (DB_BOOTSTRAP_ON_STARTUP, the default), so both run
+under a write lock, and a migration another worker has just applied is
+skipped. With DB_BOOTSTRAP_ON_STARTUP=False this script is the bootstrap
+step: missing tables are created first and the default party and aggregates
+last, so the app workers do no schema work when they start.
+
+    python migrate.py          # create tables, apply pending migrations, create the default party
+    python migrate.py --list   # show applied/pending migrations
+"""
+import argparse
+import sys
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, func, inspect, select
+from sqlalchemy.schema import CreateIndex
+
+from app import RSVP, EmailOutbox, Party, create_app, db, ensure_default_party, logger
+
+MIGRATION_LOCK_ID = 0x7061727479  # pg_advisory_xact_lock key ('party')
+
+schema_migrations = Table(
+    'schema_migrations', MetaData(),
+    Column('version', String(100), primary_key=True),
+    Column('applied_at', DateTime, server_default=func.now())
+)
+
+
+def rsvp_indexes(connection):
+    """Unique (party_id, lower(email)) and (party_id, attending, submitted_at) on rsvps"""
+    duplicates = connection.execute(
+        select(RSVP.party_id, func.lower(RSVP.email), func.count())
+        .group_by(RSVP.party_id, func.lower(RSVP.email))
+        .having(func.count() > 1)
+    ).all()
+    if duplicates:
+        raise RuntimeError(
+            f'{len(duplicates)} emails have more than one RSVP for the same party; '
+            'remove the duplicates before creating uq_rsvps_party_email: '
+            + ', '.join(f'party {party_id}: {email} ({count}x)' for party_id, email, count in duplicates[:10])
+        )
+    # IF NOT EXISTS: databases created after this change already have them
+    for index in RSVP.__table__.indexes:
+        if index.name in ('uq_rsvps_party_email', 'ix_rsvps_party_attending_submitted'):
+            connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+def multi_party(connection):
+    """parties.notification_email and the party_id-leading indexes for party-scoped routes"""
+    columns = {column['name'] for column in inspect(connection).get_columns('parties')}
+    if 'notification_email' not in columns:
+        column = Party.__table__.c.notification_email
+        connection.exec_driver_sql(
+            f'ALTER TABLE parties ADD COLUMN notification_email {column.type.compile(connection.dialect)}'
+        )
+    for table, name in ((RSVP.__table__, 'ix_rsvps_party_submitted'),
+                        (EmailOutbox.__table__, 'ix_email_outbox_party_status_due')):
+        index = next(index for index in table.indexes if index.name == name)
+        connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+def rsvps_autoincrement(connection):
+    """SQLite: rebuild rsvps as AUTOINCREMENT so the ids of deleted RSVPs are never handed out again"""
+    if connection.dialect.name != 'sqlite':
+        return  # PostgreSQL sequences never reuse an id
+    ddl = connection.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'rsvps'").scalar()
+    if 'AUTOINCREMENT' in ddl.upper():
+        return
+    table = RSVP.__table__
+    columns = ', '.join(column.name for column in table.columns)
+    # pysqlite only opens a transaction before DML; open it now so that the
+    # rebuild, DDL included, is all or nothing
+    if not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN')
+    # Legacy rename: nothing else may be rewritten to point at rsvps_old
+    connection.exec_driver_sql('PRAGMA legacy_alter_table = ON')
+    connection.exec_driver_sql('ALTER TABLE rsvps RENAME TO rsvps_old')
+    indexes = connection.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'rsvps_old' AND sql IS NOT NULL"
+    ).scalars().all()
+    for name in indexes:
+        connection.exec_driver_sql(f'DROP INDEX "{name}"')
+    table.create(connection)
+    # Copying the ids explicitly also sets sqlite_sequence to the largest one
+    connection.exec_driver_sql(f'INSERT INTO rsvps ({columns}) SELECT {columns} FROM rsvps_old')
+    connection.exec_driver_sql('DROP TABLE rsvps_old')
+    connection.exec_driver_sql('PRAGMA legacy_alter_table = OFF')
+
+
+MIGRATIONS = [
+    ('0001_rsvp_indexes', rsvp_indexes),
+    ('0002_multi_party', multi_party),
+    ('0003_rsvps_autoincrement', rsvps_autoincrement),
+]
+
+
+def lock(connection):
+    """Hold the database's write lock (SQLite) or the migration lock
+    (PostgreSQL) until the transaction ends"""
+    if connection.dialect.name == 'sqlite':
+        if not connection.connection.driver_connection.in_transaction:
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+    elif connection.dialect.name == 'postgresql':
+        connection.execute(select(func.pg_advisory_xact_lock(MIGRATION_LOCK_ID)))
+
+
+def applied_versions(connection):
+    schema_migrations.create(connection, checkfirst=True)
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def migrate(connection=None):
+    """Create missing tables and apply the pending migrations on `connection`
+    (asgi.py passes its own through run_sync) or on a new db.engine connection"""
+    if connection is None:
+        with db.engine.connect() as connection:
+            return migrate(connection)
+    with connection.begin():
+        lock(connection)
+        db.metadata.create_all(connection)
+        applied = applied_versions(connection)
+    for version, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        with connection.begin():
+            lock(connection)
+            if version in applied_versions(connection):
+                continue  # another worker got here first
+            migration(connection)
+            connection.execute(schema_migrations.insert().values(version=version))
+        logger.info("Migration applied", extra={'version': version})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create tables and apply database schema migrations')
+    parser.add_argument('--list', action='store_true', help='list migrations and exit')
+    args = parser.parse_args()
+
+    app = create_app(bootstrap=False)
+    with app.app_context():
+        if args.list:
+            with db.engine.begin() as connection:
+                applied = applied_versions(connection)
+            for version, _ in MIGRATIONS:
+                print(f"{'applied' if version in applied else 'pending'}  {version}")
+            return 0
+        try:
+            migrate()
+            ensure_default_party()
+        except Exception:
+            logger.exception("Migration failed")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
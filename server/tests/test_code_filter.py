@@ -0,0 +1,151 @@
+"""IssuedCodeFilter: the Bloom filter in front of the confirmation code
+routes may let unknown codes through, but must never reject a code that is
+in the rsvps table, however and whenever it got there.
+
+Rows inserted here without IssuedCodeFilter.add() stand for codes committed
+by another worker; explicit ids stand for PostgreSQL transactions committing
+out of id order.
+
+    cd server && python -m pytest tests
+"""
+import os
+import tempfile
+
+import pytest
+
+if os.getenv('TEST_DATABASE_URL'):
+    os.environ['DATABASE_URL'] = os.environ['TEST_DATABASE_URL']
+else:
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='party-test-'), 'test.db')}"
+os.environ['RATE_LIMIT_PER_MINUTE'] = '0'
+os.environ['EMAIL_WORKERS'] = '0'
+os.environ['MAIL_SUPPRESS_SEND'] = 'true'
+os.environ['LOG_LEVEL'] = 'ERROR'
+
+from app import (  # noqa: E402
+    RSVP, IssuedCodeFilter, create_app, db, generate_confirmation_code, get_active_party, issued_codes, utcnow
+)
+
+FIRST_ID = 1000000  # above any id the other tests' inserts get
+
+
+@pytest.fixture(scope='module')
+def app():
+    return create_app()
+
+
+@pytest.fixture
+def party_id(app):
+    """The active party, without RSVPs"""
+    with app.app_context():
+        party_id = get_active_party().id
+        db.session.execute(db.delete(RSVP).where(RSVP.party_id == party_id))
+        db.session.commit()
+        return party_id
+
+
+@pytest.fixture
+def codes(app):
+    """A new filter and an app context to use it in"""
+    with app.app_context():
+        yield IssuedCodeFilter()
+
+
+def insert_rsvp_row(party_id, rsvp_id=None):
+    """Commit an RSVP the way another worker would, behind the filter's back"""
+    code = generate_confirmation_code()
+    values = {'party_id': party_id, 'name': 'Convidado', 'email': f'{code.lower()}@example.com',
+              'attending': 'yes', 'number_of_guests': 1, 'confirmation_code': code, 'submitted_at': utcnow()}
+    if rsvp_id is not None:
+        values['id'] = rsvp_id
+    db.session.execute(db.insert(RSVP).values(values))
+    db.session.commit()
+    return code
+
+
+def test_rejects_unknown_codes_and_passes_issued_ones(party_id, codes):
+    issued = [insert_rsvp_row(party_id) for _ in range(20)]
+    assert all(codes.might_contain(code) for code in issued)
+    unknown = [generate_confirmation_code() for _ in range(200)]
+    assert sum(codes.might_contain(code) for code in unknown) <= 2  # error rate 0.001
+    assert codes.stats()['rejected'] >= 198
+
+
+def test_code_committed_right_after_a_catch_up_is_found(party_id, codes):
+    insert_rsvp_row(party_id)
+    assert not codes.might_contain(generate_confirmation_code())  # builds, then catches up
+    fresh = insert_rsvp_row(party_id)
+    assert codes.might_contain(fresh)
+
+
+def test_codes_added_by_this_process_are_found_without_a_query(party_id, codes):
+    insert_rsvp_row(party_id)
+    codes.rebuild()
+    code = generate_confirmation_code()
+    codes.add([code])
+    catch_ups = codes.catch_ups
+    assert codes.might_contain(code)
+    assert codes.catch_ups == catch_ups
+
+
+def test_out_of_order_commit_is_found(party_id, codes):
+    insert_rsvp_row(party_id, FIRST_ID)
+    codes.rebuild()
+    insert_rsvp_row(party_id, FIRST_ID + 2)  # FIRST_ID + 1 is still committing
+    assert not codes.might_contain(generate_confirmation_code())
+    assert FIRST_ID + 1 in codes._gaps
+    late = insert_rsvp_row(party_id, FIRST_ID + 1)
+    assert codes.might_contain(late)
+    assert FIRST_ID + 1 not in codes._gaps
+
+
+def test_commit_below_the_highest_id_at_rebuild_is_found(party_id, codes):
+    insert_rsvp_row(party_id, FIRST_ID)
+    insert_rsvp_row(party_id, FIRST_ID + 5)
+    codes.rebuild()
+    late = insert_rsvp_row(party_id, FIRST_ID + 3)
+    assert codes.might_contain(late)
+
+
+def test_gaps_expire(party_id, codes):
+    insert_rsvp_row(party_id, FIRST_ID)
+    codes.rebuild()
+    codes.GAP_SECONDS = 0
+    insert_rsvp_row(party_id, FIRST_ID + 10)
+    codes.might_contain(generate_confirmation_code())
+    assert len(codes._gaps) == 9
+    codes.might_contain(generate_confirmation_code())
+    assert codes._gaps == {}
+
+
+def test_concurrent_misses_share_a_catch_up(party_id, codes):
+    insert_rsvp_row(party_id)
+    codes.rebuild()
+    before = codes._caught_up_at - 1  # a miss observed before the last catch-up started
+    catch_ups = codes.catch_ups
+    codes._catch_up(before)
+    assert codes.catch_ups == catch_ups
+    codes._catch_up(codes._caught_up_at)
+    assert codes.catch_ups == catch_ups + 1
+
+
+def test_over_capacity_rebuilds_larger(party_id, codes):
+    insert_rsvp_row(party_id)
+    codes.rebuild()
+    codes.add(generate_confirmation_code() for _ in range(codes.capacity))
+    assert codes.stats()['size_bytes'] == 0
+    code = insert_rsvp_row(party_id)
+    assert codes.might_contain(code)
+    assert codes.rebuilds == 2
+
+
+def test_lookup_route_finds_a_code_committed_by_another_worker(app, party_id):
+    client = app.test_client()
+    with app.app_context():
+        insert_rsvp_row(party_id)
+        unknown = generate_confirmation_code()
+    assert client.get(f'/api/rsvp/{unknown}').status_code == 404
+    with app.app_context():
+        fresh = insert_rsvp_row(party_id)
+    assert client.get(f'/api/rsvp/{fresh}').status_code == 200
+    assert issued_codes.stats()['rejected'] >= 1
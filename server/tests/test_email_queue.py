@@ -0,0 +1,205 @@
+"""EmailQueue: claims, leases, backoff and dead letters in the email_outbox
+table, against a fake SMTP transport that fails a set number of times.
+
+    cd server && python -m pytest tests
+"""
+import os
+import tempfile
+from datetime import timedelta
+
+import pytest
+
+if os.getenv('TEST_DATABASE_URL'):
+    os.environ['DATABASE_URL'] = os.environ['TEST_DATABASE_URL']
+else:
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='party-test-'), 'test.db')}"
+os.environ['RATE_LIMIT_PER_MINUTE'] = '0'
+os.environ['EMAIL_WORKERS'] = '0'
+os.environ['MAIL_SUPPRESS_SEND'] = 'true'
+os.environ['LOG_LEVEL'] = 'ERROR'
+
+import app as party_app  # noqa: E402
+from app import EmailOutbox, EmailQueue, create_app, db, utcnow  # noqa: E402
+
+RETRY_BASE = 30
+
+
+class FakeTransport:
+    """mail.connect() stand-in: the first `failures` sends raise, the rest are recorded"""
+
+    def __init__(self, failures=0, refuse_connections=False):
+        self.failures = failures
+        self.refuse_connections = refuse_connections
+        self.sent = []
+
+    def __call__(self):
+        if self.refuse_connections:
+            raise ConnectionRefusedError('SMTP server unavailable')
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def send(self, message):
+        if self.failures > 0:
+            self.failures -= 1
+            raise OSError('451 try again later')
+        self.sent.append(message)
+
+
+@pytest.fixture(scope='module')
+def app():
+    return create_app()
+
+
+@pytest.fixture
+def queue(app):
+    """A queue with no worker threads (drain_once is called directly), on an empty outbox"""
+    with app.app_context():
+        db.session.execute(db.delete(EmailOutbox))
+        db.session.commit()
+        queue = EmailQueue()
+        queue.init_app(app)
+        queue.max_attempts = 3
+        queue.retry_base = RETRY_BASE
+        yield queue
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    def install(**kwargs):
+        fake = FakeTransport(**kwargs)
+        monkeypatch.setattr(party_app.mail, 'connect', fake)
+        return fake
+    return install
+
+
+def add_email(subject='Nova confirmação'):
+    item = EmailOutbox(subject=subject, recipients='owner@example.com', body='corpo')
+    db.session.add(item)
+    db.session.commit()
+    return item.id
+
+
+def outbox_row(outbox_id):
+    db.session.expire_all()
+    return db.session.get(EmailOutbox, outbox_id)
+
+
+def make_due(outbox_id):
+    """Let the backoff or lease of a row run out"""
+    db.session.execute(db.update(EmailOutbox).where(EmailOutbox.id == outbox_id)
+                       .values(next_attempt_at=utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+
+
+def assert_due_in(row, seconds):
+    delay = (row.next_attempt_at - utcnow()).total_seconds()
+    assert seconds - 5 < delay <= seconds
+
+
+def test_sends_pending_email(queue, transport):
+    fake = transport()
+    outbox_id = add_email()
+    assert queue.drain_once() == 1
+    row = outbox_row(outbox_id)
+    assert (row.status, row.attempts, row.last_error) == ('sent', 1, None)
+    assert row.sent_at is not None
+    assert [message.subject for message in fake.sent] == ['Nova confirmação']
+    assert queue.drain_once() == 0
+
+
+def test_failures_back_off_exponentially_then_succeed(queue, transport):
+    fake = transport(failures=2)
+    outbox_id = add_email()
+
+    assert queue.drain_once() == 1
+    row = outbox_row(outbox_id)
+    assert (row.status, row.attempts) == ('pending', 1)
+    assert '451' in row.last_error
+    assert_due_in(row, RETRY_BASE)
+    assert queue.drain_once() == 0  # not due yet
+
+    make_due(outbox_id)
+    assert queue.drain_once() == 1
+    row = outbox_row(outbox_id)
+    assert (row.status, row.attempts) == ('pending', 2)
+    assert_due_in(row, 2 * RETRY_BASE)
+
+    make_due(outbox_id)
+    assert queue.drain_once() == 1
+    row = outbox_row(outbox_id)
+    assert (row.status, row.attempts, row.last_error) == ('sent', 3, None)
+    assert len(fake.sent) == 1
+    assert queue.retried == 2
+
+
+def test_backoff_is_capped(queue, transport):
+    transport(failures=1)
+    queue.retry_base = EmailQueue.MAX_BACKOFF_SECONDS
+    outbox_id = add_email()
+    db.session.execute(db.update(EmailOutbox).where(EmailOutbox.id == outbox_id).values(attempts=1))
+    db.session.commit()
+    queue.drain_once()
+    assert_due_in(outbox_row(outbox_id), EmailQueue.MAX_BACKOFF_SECONDS)
+
+
+def test_dead_letter_after_max_attempts(queue, transport):
+    fake = transport(failures=10)
+    outbox_id = add_email()
+    for attempt in range(1, queue.max_attempts + 1):
+        make_due(outbox_id)
+        assert queue.drain_once() == 1
+        assert outbox_row(outbox_id).attempts == attempt
+
+    row = outbox_row(outbox_id)
+    assert row.status == 'failed'
+    make_due(outbox_id)
+    assert queue.drain_once() == 0  # dead letters are never claimed again
+    assert fake.sent == []
+    stats = queue.stats()
+    assert (stats['dead_letters'], stats['failed'], stats['queue_depth']) == (1, 1, 0)
+
+
+def test_connection_failure_retries_the_whole_batch(queue, transport):
+    transport(refuse_connections=True)
+    outbox_ids = [add_email(f'Email {i}') for i in range(3)]
+    assert queue.drain_once() == 3
+    for outbox_id in outbox_ids:
+        row = outbox_row(outbox_id)
+        assert (row.status, row.attempts) == ('pending', 1)
+        assert 'unavailable' in row.last_error
+
+
+def test_claimed_rows_are_leased(queue, transport):
+    fake = transport()
+    outbox_id = add_email()
+    claimed = queue._claim()  # a worker that claims and then dies before sending
+    assert [item.id for item in claimed] == [outbox_id]
+    row = outbox_row(outbox_id)
+    assert (row.status, row.attempts) == ('sending', 1)
+    assert_due_in(row, EmailQueue.LEASE_SECONDS)
+
+    assert queue._claim() == []  # another worker cannot take it while the lease runs
+    assert queue.drain_once() == 0
+
+    make_due(outbox_id)  # the lease expires
+    assert queue.drain_once() == 1
+    row = outbox_row(outbox_id)
+    assert (row.status, row.attempts) == ('sent', 2)
+    assert len(fake.sent) == 1
+
+
+def test_batches_take_turns_between_parties(queue):
+    now = utcnow()
+    db.session.add_all(EmailOutbox(party_id=party_id, subject=f'{party_id}-{i}', recipients='x@example.com',
+                                   next_attempt_at=now - timedelta(seconds=10 - i))
+                       for party_id in (1, 2) for i in range(3))
+    db.session.commit()
+    due = db.session.execute(queue.due_emails(now, 4)).scalars().all()
+    subjects = [db.session.get(EmailOutbox, outbox_id).subject for outbox_id in due]
+    assert sorted(subjects[:2]) == ['1-0', '2-0']
+    assert sorted(subjects[2:]) == ['1-1', '2-1']
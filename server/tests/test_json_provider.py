@@ -0,0 +1,100 @@
+"""FastJSONProvider: orjson must write what the json module writes.
+
+    cd server && python -m pytest tests
+"""
+import dataclasses
+import decimal
+import json
+import random
+import uuid
+from datetime import date, datetime, timezone
+
+import pytest
+
+pytest.importorskip('orjson')
+
+from flask import Flask  # noqa: E402
+
+from app import FastJSONProvider, load_config  # noqa: E402
+
+
+@dataclasses.dataclass
+class Guest:
+    id: int
+    name: str
+    ratio: float
+
+
+def provider(encoder, debug=False):
+    app = Flask('test')
+    load_config(app)
+    app.config['JSON_ENCODER'] = encoder
+    app.debug = debug
+    return app, FastJSONProvider(app)
+
+
+@pytest.fixture(scope='module')
+def encoders():
+    app, fast = provider('orjson')
+    _, slow = provider('json')
+    assert (fast.backend, slow.backend) == ('orjson', 'json')
+    with app.app_context():
+        yield fast.encode_compact, slow.encode_compact
+
+
+def random_text(rng, length):
+    return ''.join(chr(rng.choice([rng.randrange(0, 128), rng.randrange(128, 0xD800), rng.randrange(0xE000, 0x110000)]))
+                   for _ in range(length))
+
+
+PAYLOADS = [
+    {'b': 1, 'a': [1, 2.5, None, True, False], 'ç': 'Confirmação 🎉 \x7f \x01 "q" \\ /'},
+    {'submitted_at': datetime(2024, 7, 27, 17, 0), 'utc': datetime(2024, 7, 27, tzinfo=timezone.utc),
+     'day': date(2024, 1, 2)},
+    {'id': uuid.UUID(int=5), 'guest': Guest(1, 'Zé', 0.5), 'amount': decimal.Decimal('1.10')},
+    {'nested': [{'z': 1, 'y': {'x': []}}], 'empty': {}},
+    [2 ** 70, -2 ** 63, 2 ** 64 - 1, 'big'],
+    {'hit_ratio': 0.6875, 'negative_zero': -0.0, 'tenth': 0.1},
+    {'nan': float('nan'), 'inf': [float('inf'), -float('inf')], 'guest': Guest(2, 'x', float('nan'))},
+    {10: 'ten', 2: 'two', 1: 'one'},
+    {2.5: 'a', 1: 'b', False: 'c'},
+    {'long': 'é' * 5000, 'ascii': 'a' * 5000},
+    'plain', 12, None, [], {},
+]
+
+
+@pytest.mark.parametrize('payload', PAYLOADS, ids=range(len(PAYLOADS)))
+def test_orjson_writes_what_json_writes(encoders, payload):
+    fast, slow = encoders
+    assert fast(payload) == slow(payload)
+
+
+def test_random_unicode_keys_and_values(encoders):
+    fast, slow = encoders
+    rng = random.Random(1)
+    for _ in range(500):
+        payload = {random_text(rng, 5): random_text(rng, 20) for _ in range(3)}
+        assert fast(payload) == slow(payload)
+
+
+def test_float_exponents_only_differ_in_spelling(encoders):
+    fast, slow = encoders
+    payload = {'big': 1e16, 'small': 1.5e-7, 'max': 1.7976931348623157e308}
+    assert json.loads(fast(payload)) == json.loads(slow(payload)) == payload
+
+
+def test_unsortable_keys_fail_like_json(encoders):
+    fast, slow = encoders
+    payload = {True: 1, 'a': 2}
+    with pytest.raises(TypeError):
+        slow(payload)
+    with pytest.raises(TypeError):
+        fast(payload)
+
+
+def test_jsonify_debug_output_is_unchanged():
+    app, fast = provider('orjson', debug=True)
+    _, slow = provider('json', debug=True)
+    with app.app_context():
+        payload = {'b': 1, 'a': ['é', 2]}
+        assert fast.response(payload).get_data() == slow.response(payload).get_data()
@@ -0,0 +1,157 @@
+"""RSVP submission under concurrency: the ON CONFLICT upsert and the
+conditional capacity UPDATE, with two database sessions in flight at once.
+
+Runs on a throwaway SQLite database, or on TEST_DATABASE_URL (e.g. a
+PostgreSQL scratch database, whose active party is used):
+
+    cd server && python -m pytest tests
+"""
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+if os.getenv('TEST_DATABASE_URL'):
+    os.environ['DATABASE_URL'] = os.environ['TEST_DATABASE_URL']
+else:
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='party-test-'), 'test.db')}"
+os.environ['RATE_LIMIT_PER_MINUTE'] = '0'
+os.environ['EMAIL_WORKERS'] = '0'
+os.environ['MAIL_SUPPRESS_SEND'] = 'true'
+os.environ['LOG_LEVEL'] = 'ERROR'
+
+from app import (  # noqa: E402
+    RSVP, Party, create_app, db, generate_confirmation_code, get_active_party, get_party_counter, insert_rsvp,
+    rebuild_party_counter, reserve_guest_spots, utcnow
+)
+
+HOLD_SECONDS = 0.3  # how long the first session keeps its transaction open
+
+
+@pytest.fixture(scope='module')
+def app():
+    return create_app()
+
+
+@pytest.fixture
+def party_id(app):
+    """The active party with no RSVPs from earlier tests and room for 3 guests"""
+    with app.app_context():
+        party = db.session.get(Party, get_active_party().id)
+        db.session.execute(db.delete(RSVP).where(RSVP.party_id == party.id))
+        party.max_guests = 3
+        rebuild_party_counter(party.id)
+        db.session.commit()
+        return party.id
+
+
+def rsvp_values(party_id, email, attending='yes', number_of_guests=1):
+    return {
+        'party_id': party_id, 'name': email.split('@')[0], 'email': email, 'phone': '',
+        'attending': attending, 'number_of_guests': number_of_guests, 'dietary_restrictions': '', 'message': '',
+        'confirmation_code': generate_confirmation_code(), 'submitted_at': utcnow()
+    }
+
+
+def submit(party_id, email, number_of_guests=1):
+    """What POST /api/rsvp does for a 'yes' before its commit: (created, fits)"""
+    rsvp_id, _, created = insert_rsvp(rsvp_values(party_id, email, number_of_guests=number_of_guests))
+    return created, created and reserve_guest_spots(party_id, number_of_guests)
+
+
+def in_two_sessions(app, first, second):
+    """Run first() and leave its transaction open, run second() in another
+    session meanwhile, then commit both. Each transaction is rolled back
+    instead when its function returns a falsy second item."""
+    results = {}
+    first_ran = threading.Event()
+
+    def run(name, fn, before=None, after=None):
+        with app.app_context():
+            if before:
+                before.wait(5)
+            try:
+                results[name] = fn()
+                if after:
+                    after.set()
+                    time.sleep(HOLD_SECONDS)  # the second session now waits on (or races) this transaction
+                if results[name][1]:
+                    db.session.commit()
+                else:
+                    db.session.rollback()
+            except Exception as e:
+                results[name] = e
+                db.session.rollback()
+            finally:
+                if after:
+                    after.set()
+
+    threads = [threading.Thread(target=run, args=('first', first, None, first_ran)),
+               threading.Thread(target=run, args=('second', second, first_ran))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for result in results.values():
+        if isinstance(result, Exception):
+            raise result
+    return results['first'], results['second']
+
+
+def assert_counters_match_recount(party_id):
+    counter = get_party_counter(party_id).to_dict()
+    recount = rebuild_party_counter(party_id).to_dict()
+    db.session.rollback()
+    assert counter == recount
+    return counter
+
+
+def test_duplicate_email_in_two_sessions_is_stored_once(app, party_id):
+    first, second = in_two_sessions(app, lambda: submit(party_id, 'ana@example.com'),
+                                    lambda: submit(party_id, 'ANA@example.com'))
+    assert first == (True, True)
+    assert second == (False, False)
+    with app.app_context():
+        emails = db.session.execute(
+            db.select(RSVP.email).where(RSVP.party_id == party_id)
+        ).scalars().all()
+        assert emails == ['ana@example.com']
+        assert assert_counters_match_recount(party_id)['total_attending'] == 1
+
+
+def test_capacity_is_checked_against_the_other_session(app, party_id):
+    first, second = in_two_sessions(app, lambda: submit(party_id, 'bia@example.com', 2),
+                                    lambda: submit(party_id, 'caio@example.com', 2))
+    assert first == (True, True)
+    assert second == (True, False)  # inserted, then rolled back: 2 + 2 > 3
+    with app.app_context():
+        names = db.session.execute(db.select(RSVP.name).where(RSVP.party_id == party_id)).scalars().all()
+        assert names == ['bia']
+        assert assert_counters_match_recount(party_id)['total_attending'] == 2
+
+
+def test_parallel_submits_keep_one_row_per_email_and_respect_capacity(app, party_id):
+    with app.app_context():
+        db.session.get(Party, party_id).max_guests = 40
+        db.session.commit()
+    client = app.test_client()
+    payloads = [{'name': f'Convidado {i}', 'email': f'guest{i}@example.com'.upper() if copy else f'guest{i}@example.com',
+                 'attending': 'yes' if i % 4 else 'no', 'number_of_guests': 1 + i % 2}
+                for i in range(60) for copy in range(2)]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(lambda payload: client.post('/api/rsvp', json=payload).status_code, payloads))
+
+    assert 500 not in statuses
+    with app.app_context():
+        rows = db.session.execute(
+            db.select(db.func.lower(RSVP.email), db.func.count()).where(RSVP.party_id == party_id)
+            .group_by(db.func.lower(RSVP.email))
+        ).all()
+        assert all(count == 1 for _, count in rows)
+        assert statuses.count(201) == len(rows)
+        counter = assert_counters_match_recount(party_id)
+        assert counter['total_attending'] <= 40